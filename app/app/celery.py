@@ -23,4 +23,40 @@ app.conf.beat_schedule = {
         'task': 'ecommerce.tasks.users.delete_old_guest_users',
         'schedule': crontab(minute=0, hour=0),
     },
+    'rebuild_product_indexes-every-day': {
+        'task': 'ecommerce.tasks.products.rebuild_product_indexes_task',
+        'schedule': crontab(minute=30, hour=3),
+    },
+    'refresh_product_prices-every-day': {
+        'task': 'ecommerce.tasks.products.refresh_product_prices_task',
+        'schedule': crontab(minute=5, hour=0),
+    },
+    'reconcile_stock_holds-every-5-minutes': {
+        'task': 'ecommerce.tasks.shopping_carts.reconcile_stock_holds_task',
+        'schedule': crontab(minute='*/5'),
+    },
+    'delete_old_idempotency_keys-every-day': {
+        'task': 'ecommerce.tasks.idempotency.delete_old_idempotency_keys_task',
+        'schedule': crontab(minute=15, hour=0),
+    },
+    'expire_unpaid_orders-every-5-minutes': {
+        'task': 'ecommerce.tasks.orders.expire_unpaid_orders_task',
+        'schedule': crontab(minute='*/5'),
+    },
+    'process_webhook_events-every-minute': {
+        'task': 'ecommerce.tasks.payments.process_webhook_events_task',
+        'schedule': crontab(minute='*'),
+    },
+    'delete_old_webhook_events-every-day': {
+        'task': 'ecommerce.tasks.payments.delete_old_webhook_events_task',
+        'schedule': crontab(minute=20, hour=0),
+    },
+    'rollup_sales-every-day': {
+        'task': 'ecommerce.tasks.reports.rollup_sales_task',
+        'schedule': crontab(minute=30, hour=1),
+    },
+    'create_order_partitions-every-day': {
+        'task': 'ecommerce.tasks.orders.create_order_partitions_task',
+        'schedule': crontab(minute=45, hour=0),
+    },
 }
@@ -14,6 +14,7 @@ import os
 
 from datetime import timedelta
 from pathlib import Path
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -45,6 +46,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # libs
     'rest_framework',
@@ -136,7 +138,17 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.SessionAuthentication',
     ),
 
-    # 'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+    'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+    # 'orjson' is used when it is installed (see 'ecommerce.utils.renderers')
+    'DEFAULT_RENDERER_CLASSES': [
+        'ecommerce.utils.renderers.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'ecommerce.utils.renderers.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'COERCE_DECIMAL_TO_STRING': False,
     # 'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
@@ -246,6 +258,8 @@ EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 STRIPE_SECRET_KEY = os.environ.get("STRIPE_SECRET_KEY", 0)
 STRIPE_DEVICE_NAME = os.environ.get("STRIPE_DEVICE_NAME", 0)
 STRIPE_WEBHOOK_SECRET = os.environ.get("STRIPE_WEBHOOK_SECRET", 0)
+# Points the Stripe library to another server, e.g. the stand-in started by 'run_fake_stripe_command'
+STRIPE_API_BASE = os.environ.get("STRIPE_API_BASE", 'https://api.stripe.com')
 
 # Coverage
 # https://docs.djangoproject.com/en/4.2/topics/testing/advanced/#measuring-code-coverage
@@ -271,6 +285,10 @@ CELERY_TIMEZONE = 'Europe/Kyiv'
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
+CELERY_TASK_ROUTES = {
+    # Orders accepted in async intake mode are placed by a dedicated worker (see 'ORDERS_ASYNC_INTAKE')
+    'ecommerce.tasks.orders.place_order_task': {'queue': 'orders'},
+}
 
 # CORS
 
@@ -281,6 +299,11 @@ CORS_ALLOWED_ORIGINS = [
     # "http://localhost:8000",  # Адрес вашего API
 ]
 
+CORS_ALLOW_HEADERS = (
+    *default_headers,
+    'idempotency-key',
+)
+
 # CORS_ORIGIN_WHITELIST = [
 #      'http://localhost:3000'
 # ]
@@ -330,6 +353,126 @@ RESET_PASSWORD_COUNTER_TIMEOUT = int(os.environ.get('RESET_PASSWORD_COUNTER_TIME
 
 RESET_PASSWORD_MAX_ATTEMPTS = int(os.environ.get('RESET_PASSWORD_MAX_ATTEMPTS', 0))
 
+# ----------
+# PAGINATION
+
+KEYSET_PAGE_SIZE = int(os.environ.get('KEYSET_PAGE_SIZE', 50))
+KEYSET_MAX_PAGE_SIZE = int(os.environ.get('KEYSET_MAX_PAGE_SIZE', 100))
+
+PRODUCTS_PAGE_SIZE = int(os.environ.get('PRODUCTS_PAGE_SIZE', 24))
+
+ORDERS_PAGE_SIZE = int(os.environ.get('ORDERS_PAGE_SIZE', 20))
+
+# --------------
+# PRODUCT_FACETS
+
+# Width of price buckets in facet counts (in cents).
+PRODUCTS_PRICE_FACET_STEP = int(os.environ.get('PRODUCTS_PRICE_FACET_STEP', 2000))
+
+# ---------------
+# PRODUCTS_SEARCH
+
+# PostgreSQL text search configuration used for search vectors and queries.
+PRODUCTS_SEARCH_CONFIG = os.environ.get('PRODUCTS_SEARCH_CONFIG', 'english')
+
+# --------------
+# PRODUCTS_CACHE
+
+# Lifetime of cached product list and detail responses (in seconds).
+# Responses are invalidated by signals, timeout only limits memory usage.
+PRODUCTS_CACHE_TIMEOUT = int(os.environ.get('PRODUCTS_CACHE_TIMEOUT', 60 * 60))
+
+# ----------
+# CART_HOLDS
+
+# Shopping cart items hold their quantity in stock for this time (in seconds) after they are changed.
+CART_HOLD_TIMEOUT = int(os.environ.get('CART_HOLD_TIMEOUT', 60 * 15))
+
+# ------
+# ORDERS
+
+# Unpaid orders without an open checkout session are expired
+# and their items are returned to stock after this time.
+ORDERS_EXPIRATION_MINUTES = int(os.environ.get('ORDERS_EXPIRATION_MINUTES', 120))
+
+# In async intake mode order create views validate the request, put it in 'orders' Celery queue
+# and respond '202 Accepted' with a ticket. Order status is reported by the ticket endpoint.
+ORDERS_ASYNC_INTAKE = bool(int(os.environ.get('ORDERS_ASYNC_INTAKE', 0)))
+
+# Lifetime of order tickets (in seconds).
+ORDERS_TICKET_TIMEOUT = int(os.environ.get('ORDERS_TICKET_TIMEOUT', 60 * 60))
+
+# Order export reads rows with a server-side cursor in chunks of this size.
+ORDERS_EXPORT_CHUNK_SIZE = int(os.environ.get('ORDERS_EXPORT_CHUNK_SIZE', 2000))
+
+# -----------------
+# ORDERS_PARTITIONS
+
+# Monthly partitions of order tables are created this many months ahead (see 'utils.orders.partitions').
+ORDERS_PARTITIONS_AHEAD = int(os.environ.get('ORDERS_PARTITIONS_AHEAD', 3))
+
+# Partitions older than this many months (besides the current one) are moved to the archive tier.
+ORDERS_LIVE_MONTHS = int(os.environ.get('ORDERS_LIVE_MONTHS', 12))
+
+# --------
+# PAYMENTS
+
+# State of a checkout session is cached for this time (in seconds) when it's created,
+# Stripe expires sessions after 24 hours.
+PAYMENTS_CHECKOUT_SESSION_CACHE_TIMEOUT = int(os.environ.get('PAYMENTS_CHECKOUT_SESSION_CACHE_TIMEOUT', 24 * 60 * 60))
+
+# Completed payments are published to Redis, long-polling requests of the payment status wait on it.
+PAYMENTS_PUBSUB_URL = os.environ.get('PAYMENTS_PUBSUB_URL', 'redis://redis:6379/0')
+
+# Long-polling request of the payment status is answered after this time (in seconds) if the order isn't paid.
+PAYMENTS_LONG_POLL_TIMEOUT = int(os.environ.get('PAYMENTS_LONG_POLL_TIMEOUT', 25))
+
+# --------
+# WEBHOOKS
+
+# Stripe events are stored by the webhook and processed by a Celery consumer in batches of this size.
+WEBHOOKS_BATCH_SIZE = int(os.environ.get('WEBHOOKS_BATCH_SIZE', 100))
+
+# A failed event is retried after this delay (in seconds), doubled by every attempt,
+# and is marked as failed after the max amount of attempts.
+WEBHOOKS_RETRY_DELAY = int(os.environ.get('WEBHOOKS_RETRY_DELAY', 30))
+WEBHOOKS_MAX_ATTEMPTS = int(os.environ.get('WEBHOOKS_MAX_ATTEMPTS', 8))
+
+# Only one consumer processes events, its lock expires after this time (in seconds)
+# unless it's extended by the consumer before every batch.
+WEBHOOKS_LOCK_TIMEOUT = int(os.environ.get('WEBHOOKS_LOCK_TIMEOUT', 5 * 60))
+
+# Processed events are deleted after this amount of days.
+WEBHOOKS_RETENTION_DAYS = int(os.environ.get('WEBHOOKS_RETENTION_DAYS', 30))
+
+# --------------
+# STRIPE CATALOG
+
+# Product items changed since the last sync are pushed to Stripe by this many threads.
+STRIPE_SYNC_WORKERS = int(os.environ.get('STRIPE_SYNC_WORKERS', 8))
+
+# Rate limited and failed Stripe calls are retried after this delay (in milliseconds),
+# doubled by every attempt, at most this many times.
+STRIPE_SYNC_RETRY_DELAY = int(os.environ.get('STRIPE_SYNC_RETRY_DELAY', 500))
+STRIPE_SYNC_MAX_RETRIES = int(os.environ.get('STRIPE_SYNC_MAX_RETRIES', 5))
+
+# -------
+# REPORTS
+
+# Orders change status after they are created, so this many last rolled up days
+# are rolled up again by every run (see 'utils.reports.rollups').
+REPORTS_ROLLUP_LOOKBACK_DAYS = int(os.environ.get('REPORTS_ROLLUP_LOOKBACK_DAYS', 7))
+
+# -----------
+# IDEMPOTENCY
+
+# Responses to requests with 'Idempotency-Key' header are replayed for this time (in seconds).
+IDEMPOTENCY_KEY_TIMEOUT = int(os.environ.get('IDEMPOTENCY_KEY_TIMEOUT', 60 * 60 * 24))
+
+# Requests with the same key get '409 Conflict' while the first one is executed,
+# lock is released earlier when the first request is finished.
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.environ.get('IDEMPOTENCY_LOCK_TIMEOUT', 30))
+
 
 
 if DEBUG:
@@ -18,6 +18,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
+from django.contrib.staticfiles.urls import staticfiles_urlpatterns
 
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
@@ -33,4 +34,6 @@ if settings.DEBUG:
     urlpatterns += static(
         settings.MEDIA_URL,
         document_root=settings.MEDIA_ROOT,
-    )
\ No newline at end of file
+    )
+    # Static files were served by 'runserver', the ASGI server doesn't serve them
+    urlpatterns += staticfiles_urlpatterns()
\ No newline at end of file
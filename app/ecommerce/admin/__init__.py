@@ -5,3 +5,4 @@ from .shopping_carts import *
 from .orders import *
 from .payments import *
 from .reviews import *
+from .reports import *
@@ -1,7 +1,12 @@
 from django.contrib import admin
+from django.contrib.admin.utils import unquote
+from django.shortcuts import redirect
+from django.urls import reverse
 from django.utils import formats
 
-from ecommerce.models.orders import Order, OrderItem
+from ecommerce.models.orders import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+from ecommerce.utils.orders.export import get_export_response
+from ecommerce.utils.orders.partitions import get_archive_boundary, is_partitioned
 
 
 class OrderItemInline(admin.StackedInline):
@@ -58,6 +63,7 @@ class OrderAdmin(admin.ModelAdmin):
     exclude = ('shipping_address', 'order_price')
     search_fields = ('pk', 'user__email', 'shipping_address__phone_number', )
     inlines = [OrderItemInline]
+    actions = ('export_csv', 'export_ndjson')
 
     def get_queryset(self, request):
         return Order.objects.select_related(
@@ -92,6 +98,63 @@ class OrderAdmin(admin.ModelAdmin):
             dt = formats.date_format(obj.date_created, 'j N Y, H:i')
             return dt
 
+    @admin.action(description='Export selected orders to CSV')
+    def export_csv(self, request, queryset):
+        return get_export_response(OrderItem.objects.filter(order__in=queryset.values('id')), 'csv')
+
+    @admin.action(description='Export selected orders to NDJSON')
+    def export_ndjson(self, request, queryset):
+        return get_export_response(OrderItem.objects.filter(order__in=queryset.values('id')), 'ndjson')
+
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        # Orders of old months are moved to the archive tier (see 'utils.orders.partitions')
+        if self.model is Order and get_archive_boundary() is not None \
+                and not Order.objects.filter(pk=unquote(object_id)).exists():
+            if ArchivedOrder.objects.filter(pk=unquote(object_id)).exists():
+                return redirect(reverse('admin:ecommerce_archivedorder_change', args=(object_id, )))
+
+        return super().change_view(request, object_id, form_url, extra_context)
+
+
+class ArchivedOrderItemInline(OrderItemInline):
+    model = ArchivedOrderItem
+    readonly_fields = ('pk', 'product_variation_id', 'product_name', 'product_size', 'quantity', 'item_price')
+    exclude = ('price', 'product_variation')
+
+    def get_queryset(self, request):
+        return ArchivedOrderItem.objects.all()
+
+
+class ArchivedOrderAdmin(OrderAdmin):
+    """
+    Read-only orders from the archive tier.
+    Archive tables exist only after 'partition_order_tables', until then the admin is hidden.
+    """
+    inlines = [ArchivedOrderItemInline]
+    actions = None
+
+    def get_queryset(self, request):
+        if not is_partitioned():
+            return ArchivedOrder.objects.none()
+
+        return ArchivedOrder.objects.select_related(
+            'user',
+            'shipping_address',
+        )
+
+    def has_view_permission(self, request, obj=None):
+        return is_partitioned() and super().has_view_permission(request, obj)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 
 admin.site.register(Order, OrderAdmin)
 admin.site.register(OrderItem)
+admin.site.register(ArchivedOrder, ArchivedOrderAdmin)
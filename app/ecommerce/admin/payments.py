@@ -1,4 +1,45 @@
 from django.contrib import admin
-from ecommerce.models.payments import Payment
+from django.db import transaction
+from django.utils import timezone
 
-admin.site.register(Payment)
+from ecommerce.models.payments import Payment, WebhookEvent
+from ecommerce.tasks.payments import process_webhook_events_task
+
+
+class PaymentAdmin(admin.ModelAdmin):
+    list_display = ('id', 'order', 'payment_bool', 'refund_required')
+    # Payments completed after their orders were cancelled or expired must be refunded in Stripe
+    list_filter = ('payment_bool', 'refund_required')
+    search_fields = ('order__id', 'stripe_session_id')
+
+
+admin.site.register(Payment, PaymentAdmin)
+
+
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ('event_id', 'event_type', 'ordering_key', 'status', 'attempts', 'stripe_created', 'processed_at')
+    list_filter = ('status', 'event_type')
+    search_fields = ('event_id', 'ordering_key')
+    readonly_fields = [field.name for field in WebhookEvent._meta.fields]
+    actions = ('retry_events', 'resolve_events')
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description='Retry selected failed events')
+    def retry_events(self, request, queryset):
+        queryset \
+            .filter(status=WebhookEvent.EventStatus.FAILED.value) \
+            .update(status=WebhookEvent.EventStatus.PENDING.value, attempts=0, next_attempt_at=None)
+        transaction.on_commit(process_webhook_events_task.delay)
+
+    @admin.action(description='Mark selected failed events as resolved')
+    def resolve_events(self, request, queryset):
+        # Failed events block later events of their order until they are retried or resolved
+        queryset \
+            .filter(status=WebhookEvent.EventStatus.FAILED.value) \
+            .update(status=WebhookEvent.EventStatus.PROCESSED.value, processed_at=timezone.now())
+        transaction.on_commit(process_webhook_events_task.delay)
+
+
+admin.site.register(WebhookEvent, WebhookEventAdmin)
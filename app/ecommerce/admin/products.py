@@ -1,8 +1,9 @@
 from django import forms
 from django.contrib import admin
-from django.db.models import Prefetch, Avg
+from django.db.models import Prefetch
 
 from ecommerce.models.products import *
+from ecommerce.utils.products.search import search_products
 
 
 class ChoicesFormSet(forms.BaseInlineFormSet):
@@ -85,28 +86,48 @@ class ProductAdmin(admin.ModelAdmin):
                 'is_active',
             )
         }),
+        ('Rating', {
+            'fields': (
+                'rating_sum',
+                'rating_count',
+                'rating_count_1',
+                'rating_count_2',
+                'rating_count_3',
+                'rating_count_4',
+                'rating_count_5',
+            )
+        }),
+    )
+    readonly_fields = (
+        'pk',
+        'rating_sum',
+        'rating_count',
+        'rating_count_1',
+        'rating_count_2',
+        'rating_count_3',
+        'rating_count_4',
+        'rating_count_5',
     )
-    readonly_fields = ('pk', )
     search_fields = ('name', 'category__name', 'brand__name', )
     inlines = [ProductItemInline]
 
     def product_rating(self, obj):
-        if obj.product_rating:
-            return round(obj.product_rating, 1)
-        else:
-            return 0
+        return obj.get_rating() or 0
 
     product_rating.short_description = 'Rating'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Full-text search by indexed 'search_vector' instead of 'ILIKE' scans over 'search_fields'
+        if not search_term:
+            return queryset, False
+
+        return search_products(queryset, search_term), False
+
     def get_queryset(self, request):
 
         queryset = Product.objects.select_related(
             'category',
             'brand'
-        ).prefetch_related(
-            'review'
-        ).annotate(
-            product_rating=Avg('review__rating')
         )
 
         return queryset
@@ -187,6 +208,8 @@ class ProductItemAdmin(admin.ModelAdmin):
                 'price',
                 'product_code',
                 'discount',
+                'discount_rate',
+                'discount_price',
                 'stripe_product_id',
                 'stripe_price_id',
                 'is_active',
@@ -202,6 +225,8 @@ class ProductItemAdmin(admin.ModelAdmin):
         'brand',
         'attribute_option',
         'product_is_active',
+        'discount_rate',
+        'discount_price',
     )
     search_fields = ('product_code', 'product__name', 'color__name')
     exclude = ()
@@ -0,0 +1,72 @@
+from django.contrib import admin
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from ecommerce.models.reports import DailyProductSales, DailySales
+from ecommerce.serializers.reports import SalesReportQuerySerializer
+from ecommerce.utils.reports.rollups import get_sales_report
+
+
+class ReadOnlyRollupAdmin(admin.ModelAdmin):
+    """
+    Rollup rows are written only by 'rollup_sales'.
+    """
+    date_hierarchy = 'date'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def revenue_amount(self, obj):
+        return obj.revenue / 100
+
+
+class DailySalesAdmin(ReadOnlyRollupAdmin):
+    list_display = ('date', 'order_status', 'order_count', 'units_sold', 'revenue_amount')
+    list_filter = ('order_status', )
+
+    def get_urls(self):
+        urls = [
+            path('report/', self.admin_site.admin_view(self.report_view), name='ecommerce_dailysales_report'),
+        ]
+        return urls + super().get_urls()
+
+    def report_view(self, request):
+        """
+        Sales report of a date range, same as 'SalesReportAPIView'.
+        """
+        serializer = SalesReportQuerySerializer(data=request.GET)
+        report = None
+        if serializer.is_valid():
+            params = serializer.validated_data
+            report = get_sales_report(
+                date_from=params['date_after'],
+                date_to=params['date_before'],
+                category_id=params.get('category'),
+                brand_id=params.get('brand'),
+                limit=params['limit'],
+            )
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Sales report',
+            'report': report,
+            'errors': serializer.errors,
+        }
+        return TemplateResponse(request, 'admin/ecommerce/dailysales/report.html', context)
+
+
+class DailyProductSalesAdmin(ReadOnlyRollupAdmin):
+    list_display = ('date', 'product', 'category', 'brand', 'units_sold', 'revenue_amount')
+    list_filter = ('category', 'brand')
+    list_select_related = ('product', 'category', 'brand')
+
+
+admin.site.register(DailySales, DailySalesAdmin)
+admin.site.register(DailyProductSales, DailyProductSalesAdmin)
@@ -8,4 +8,6 @@ class EcommerceConfig(AppConfig):
     def ready(self):
         import ecommerce.signals.shopping_carts
         import ecommerce.signals.payments
-        import ecommerce.signals.stripe
\ No newline at end of file
+        import ecommerce.signals.stripe
+        import ecommerce.signals.reviews
+        import ecommerce.signals.products
\ No newline at end of file
@@ -0,0 +1 @@
+from .products import *
@@ -0,0 +1,42 @@
+from django_filters import rest_framework as filters
+
+from ecommerce.filters.products import NumberInFilter
+from ecommerce.models.orders import ArchivedOrder, Order, OrderItem
+
+
+class OrderFilter(filters.FilterSet):
+    """
+    Filters order history by status and date,
+    e.g. '?order_status=1,2&date_created_after=2024-01-01&date_created_before=2024-01-31'.
+    """
+
+    order_status = NumberInFilter(field_name='order_status')
+    date_created = filters.DateFromToRangeFilter(field_name='date_created')
+
+    class Meta:
+        model = Order
+        fields = ['order_status', 'date_created']
+
+
+class ArchivedOrderFilter(OrderFilter):
+    """
+    Same filters for order history read from the archive tier.
+    """
+
+    class Meta(OrderFilter.Meta):
+        model = ArchivedOrder
+
+
+class OrderExportFilter(filters.FilterSet):
+    """
+    Filters exported order items by status, shipping method and date of their orders,
+    e.g. '?order_status=2&shipping_method=1&date_created_after=2024-01-01'.
+    """
+
+    order_status = NumberInFilter(field_name='order__order_status')
+    shipping_method = NumberInFilter(field_name='order__shipping_method')
+    date_created = filters.DateFromToRangeFilter(field_name='order__date_created')
+
+    class Meta:
+        model = OrderItem
+        fields = ['order_status', 'shipping_method', 'date_created']
@@ -0,0 +1,101 @@
+from django_filters import rest_framework as filters
+from django_filters.constants import EMPTY_VALUES
+
+from ecommerce.models.products import Product, ProductFacet
+from ecommerce.utils.products.facets import get_facet_counts
+
+Facet = ProductFacet.Facet
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    """ Takes comma separated numbers, e.g. '?brand=1,2'. """
+    pass
+
+
+class ProductFilter(filters.FilterSet):
+    """
+    Filters the catalog using 'ProductFacet' index.
+
+    Values of one filter are combined with OR, different filters are combined with AND.
+    Every filter takes values of its facet, e.g. '?gender=1' ('GENDER_VALUES').
+    Category filter also selects products of every subcategory.
+    """
+
+    gender = NumberInFilter(method='filter_facet')
+    category = NumberInFilter(method='filter_facet')
+    brand = NumberInFilter(method='filter_facet')
+    color = NumberInFilter(method='filter_facet')
+    size = NumberInFilter(method='filter_facet')
+    attribute_option = NumberInFilter(method='filter_facet')
+    price = filters.RangeFilter(method='filter_price') # '?price_min=1000&price_max=5000'
+
+    # Facet which is counted for every filter.
+    FACETS = {
+        'gender': Facet.GENDER,
+        'category': Facet.CATEGORY,
+        'brand': Facet.BRAND,
+        'color': Facet.COLOR,
+        'size': Facet.SIZE,
+        'attribute_option': Facet.ATTRIBUTE_OPTION,
+        'price': Facet.PRICE_RANGE,
+    }
+
+    class Meta:
+        model = Product
+        fields = ['gender', 'category', 'brand', 'color', 'size', 'attribute_option', 'price']
+
+    def filter_facet(self, queryset, name, value):
+        product_ids = ProductFacet.objects \
+            .filter(facet=self.FACETS[name].value, value__in=value) \
+            .values('product_id')
+
+        return queryset.filter(pk__in=product_ids)
+
+    def filter_price(self, queryset, name, value):
+        # Both bounds are applied to the same product item price
+        price_filter = {}
+        if value.start is not None:
+            price_filter['value__gte'] = value.start
+        if value.stop is not None:
+            price_filter['value__lte'] = value.stop
+
+        product_ids = ProductFacet.objects \
+            .filter(facet=Facet.PRICE.value, **price_filter) \
+            .values('product_id')
+
+        return queryset.filter(pk__in=product_ids)
+
+    def get_active_filters(self) -> list[str]:
+        if not self.is_valid():
+            return []
+
+        return [
+            name for name, value in self.form.cleaned_data.items()
+            if value not in EMPTY_VALUES
+        ]
+
+    def get_facet_counts(self) -> dict:
+        """
+        Counts products for every value of every filter.
+
+        Counts of a filter are calculated without the filter itself,
+        so a client sees how many products every other value of the filter gives.
+        Costs one query for all inactive filters and one query for every active filter.
+
+        :return: {filter_name: [{'value': int, 'name': str, 'count': int}]}
+        """
+        active_filters = self.get_active_filters()
+        inactive_facets = [facet for name, facet in self.FACETS.items() if name not in active_filters]
+
+        facet_counts = get_facet_counts(self.qs, inactive_facets)
+
+        for name in active_filters:
+            data = self.data.copy()
+            for key in list(data.keys()):
+                if key == name or key.startswith(name + '_'):
+                    del data[key]
+
+            filterset = self.__class__(data=data, queryset=self.queryset, request=self.request)
+            facet_counts.update(get_facet_counts(filterset.qs, [self.FACETS[name]]))
+
+        return {name: facet_counts[facet] for name, facet in self.FACETS.items()}
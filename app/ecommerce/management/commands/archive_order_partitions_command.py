@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ecommerce.utils.orders.partitions import archive_order_partitions
+
+
+class Command(BaseCommand):
+    help = 'Moves partitions of old months from live order tables to archive tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--live-months',
+            type=int,
+            default=settings.ORDERS_LIVE_MONTHS,
+            help='Amount of months before the current one which are kept in live tables.'
+        )
+        parser.add_argument(
+            '--silence',
+            action='store_true',
+            help='Silences the output.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            months = archive_order_partitions(live_months=options['live_months'])
+
+            silence = options['silence']
+            if not silence:
+                archived = ', '.join(month.strftime('%Y-%m') for month in months) or 'nothing'
+                self.stdout.write(self.style.SUCCESS(f'Archived months: {archived}'))
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(str(e)))
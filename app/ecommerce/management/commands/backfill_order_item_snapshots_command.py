@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from ecommerce.utils.orders.snapshots import backfill_order_item_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Copies products to order items which were created without product snapshots.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Amount of order items updated with one query.'
+        )
+        parser.add_argument(
+            '--silence',
+            action='store_true',
+            help='Silences the output.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            updated = backfill_order_item_snapshots(batch_size=options['batch_size'])
+
+            silence = options['silence']
+            if not silence:
+                self.stdout.write(self.style.SUCCESS(f'Snapshots of {updated} order items are successfully created'))
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(str(e)))
@@ -0,0 +1,67 @@
+import io
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from ecommerce.models.orders import Order
+from ecommerce.serializers.products import ProductSerializer
+from ecommerce.utils.renderers.parsers import FastJSONParser
+from ecommerce.utils.renderers.renderers import CompactJSONRenderer, FastJSONRenderer
+from ecommerce.views.orders import OrderViewSet
+from ecommerce.views.products import ProductViewSet
+
+
+class Command(BaseCommand):
+    help = 'Compares JSON renderers and parsers on product list and order detail payloads.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=24,
+            help='Amount of products in the product list payload (one catalog page by default).'
+        )
+        parser.add_argument(
+            '--number',
+            type=int,
+            default=1000,
+            help='Amount of runs of every renderer and parser.'
+        )
+
+    def get_payloads(self, limit: int) -> dict:
+        products = ProductViewSet().get_queryset()[:limit]
+        payloads = {'product list': ProductSerializer(products, many=True).data}
+
+        # Order detail is taken from the view, its serializer needs request and action
+        order = Order.objects.filter(user__isnull=False).order_by('-id').first()
+        if order is not None:
+            request = APIRequestFactory().get('/')
+            force_authenticate(request, user=order.user)
+            response = OrderViewSet.as_view({'get': 'retrieve'})(request, pk=order.pk)
+            payloads['order detail'] = response.data
+
+        return payloads
+
+    def handle(self, *args, **options):
+        try:
+            number = options['number']
+
+            for name, payload in self.get_payloads(options['limit']).items():
+                content = JSONRenderer().render(payload)
+                self.stdout.write(self.style.SUCCESS(f'{name} ({len(content)} bytes)'))
+
+                for renderer_class in (JSONRenderer, CompactJSONRenderer, FastJSONRenderer):
+                    renderer = renderer_class()
+                    seconds = timeit.timeit(lambda: renderer.render(payload), number=number) / number
+                    self.stdout.write(f'  render {renderer_class.__name__}: {seconds * 10 ** 6:.1f} us')
+
+                for parser_class in (JSONParser, FastJSONParser):
+                    parser = parser_class()
+                    seconds = timeit.timeit(lambda: parser.parse(io.BytesIO(content)), number=number) / number
+                    self.stdout.write(f'  parse {parser_class.__name__}: {seconds * 10 ** 6:.1f} us')
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(str(e)))
@@ -0,0 +1,54 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from rest_framework.renderers import JSONRenderer
+
+from ecommerce.serializers.products import ProductSerializer
+from ecommerce.serializers.products_flat import ProductFlatSerializer
+from ecommerce.views.products import ProductViewSet
+
+
+class Command(BaseCommand):
+    help = 'Compares serialization time of the product list with DRF and flat serializers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=24,
+            help='Amount of products serialized at once (one catalog page by default).'
+        )
+        parser.add_argument(
+            '--number',
+            type=int,
+            default=100,
+            help='Amount of runs of every serializer.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            # Products are fetched once, only serialization and rendering are measured
+            products = list(ProductViewSet().get_queryset()[:options['limit']])
+            renderer = JSONRenderer()
+
+            def render(serializer_class):
+                return renderer.render(serializer_class(products, many=True).data)
+
+            if render(ProductSerializer) != render(ProductFlatSerializer):
+                self.stdout.write(self.style.ERROR('Flat serializer output differs from ProductSerializer'))
+                return None
+
+            number = options['number']
+            results = {
+                serializer_class.__name__: timeit.timeit(lambda: render(serializer_class), number=number) / number
+                for serializer_class in (ProductSerializer, ProductFlatSerializer)
+            }
+
+            for name, seconds in results.items():
+                self.stdout.write(f'{name}: {seconds * 1000:.3f} ms per {len(products)} products')
+
+            speedup = results['ProductSerializer'] / results['ProductFlatSerializer']
+            self.stdout.write(self.style.SUCCESS(f'Flat serializer is {speedup:.1f}x faster'))
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(str(e)))
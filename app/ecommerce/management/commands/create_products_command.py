@@ -12,6 +12,7 @@ from ecommerce.models import Brand, Color, AttributeType, SizeCategory, ProductC
 
 from slugify import slugify
 
+from ecommerce.utils.products.indexes import rebuild_product_indexes
 from ecommerce.utils.products.sizes import sizes
 
 
@@ -252,6 +253,9 @@ class Command(BaseCommand):
 
             _create_product_variations()
 
+            # Product items and variations are created with 'bulk_create' which skips signals
+            rebuild_product_indexes()
+
             silence = options['silence']
             if not silence:
                 self.stdout.write(self.style.SUCCESS(f'All products are successfully created'))
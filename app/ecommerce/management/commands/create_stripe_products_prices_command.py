@@ -4,27 +4,53 @@ from django.core.management.base import BaseCommand
 
 from app import settings
 
-from ecommerce.models import ProductItem
+from ecommerce.utils.payments.catalog import sync_stripe_catalog
 
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
+stripe.api_base = settings.STRIPE_API_BASE
 
 
 class Command(BaseCommand):
-    help = 'Creates sizes for developing and testing purposes.'
+    help = 'Creates and updates Stripe products and prices of product items changed since the last sync.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Amount of product items read and saved at once.'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Amount of threads calling Stripe (STRIPE_SYNC_WORKERS by default).'
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Pushes every product item regardless of its sync hash.'
+        )
+        parser.add_argument(
+            '--silence',
+            action='store_true',
+            help='Silences the output.'
+        )
 
     def handle(self, *args, **options):
-        product_items_qs = ProductItem.objects.select_related('product').all()
-        for product_item in product_items_qs:
-            stripe_product = stripe.Product.create(
-                name=product_item.product.name,
-                description=product_item.product.description,
+        try:
+            stats = sync_stripe_catalog(
+                batch_size=options['batch_size'],
+                workers=options['workers'],
+                full=options['full'],
             )
-            stripe_price = stripe.Price.create(
-                product=stripe_product.id,
-                unit_amount=product_item.price,
-                currency='eur',
-            )
-            product_item.stripe_product_id = stripe_product.id
-            product_item.stripe_price_id = stripe_price.id
-            product_item.save()
+
+            silence = options['silence']
+            if not silence:
+                self.stdout.write(self.style.SUCCESS(
+                    f'{stats["synced"]} product items are successfully synced with Stripe '
+                    f'({stats["unchanged"]} unchanged, {stats["failed"]} failed)'
+                ))
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(str(e)))
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ecommerce.utils.orders.partitions import partition_order_tables
+
+
+class Command(BaseCommand):
+    help = 'Converts order and order item tables to monthly partitioned tables with archive tables (PostgreSQL).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ahead',
+            type=int,
+            default=settings.ORDERS_PARTITIONS_AHEAD,
+            help='Amount of months after the current one to create partitions for.'
+        )
+        parser.add_argument(
+            '--silence',
+            action='store_true',
+            help='Silences the output.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            partitions = partition_order_tables(ahead=options['ahead'])
+
+            silence = options['silence']
+            if not silence:
+                self.stdout.write(self.style.SUCCESS(f'Order tables are partitioned, {len(partitions)} partitions are created'))
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(str(e)))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from ecommerce.utils.products.indexes import rebuild_product_indexes
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds facet index (ProductFacet) and search vectors of every product.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Amount of products indexed in one transaction.'
+        )
+        parser.add_argument(
+            '--silence',
+            action='store_true',
+            help='Silences the output.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            indexed = rebuild_product_indexes(batch_size=options['batch_size'])
+
+            silence = options['silence']
+            if not silence:
+                self.stdout.write(self.style.SUCCESS(f'Indexes of {indexed} products are successfully rebuilt'))
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(str(e)))
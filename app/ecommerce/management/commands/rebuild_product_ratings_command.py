@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from ecommerce.utils.products.ratings import rebuild_product_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recalculates denormalized rating aggregates of every product from reviews.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Amount of products updated with one query.'
+        )
+        parser.add_argument(
+            '--silence',
+            action='store_true',
+            help='Silences the output.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            updated = rebuild_product_ratings(batch_size=options['batch_size'])
+
+            silence = options['silence']
+            if not silence:
+                self.stdout.write(self.style.SUCCESS(f'Ratings of {updated} products are successfully rebuilt'))
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(str(e)))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from ecommerce.models.reports import RollupWatermark
+from ecommerce.utils.reports.rollups import SALES_ROLLUP, rollup_sales
+
+
+class Command(BaseCommand):
+    help = 'Rolls up daily sales after the watermark (from the first order with --rebuild).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lookback-days',
+            type=int,
+            default=None,
+            help='Amount of last rolled up days which are rolled up again (REPORTS_ROLLUP_LOOKBACK_DAYS by default).'
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Deletes the watermark, every day is rolled up again.'
+        )
+        parser.add_argument(
+            '--silence',
+            action='store_true',
+            help='Silences the output.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            if options['rebuild']:
+                RollupWatermark.objects.filter(name=SALES_ROLLUP).delete()
+
+            days = rollup_sales(lookback_days=options['lookback_days'])
+
+            silence = options['silence']
+            if not silence:
+                self.stdout.write(self.style.SUCCESS(f'Sales of {len(days)} days are successfully rolled up'))
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(str(e)))
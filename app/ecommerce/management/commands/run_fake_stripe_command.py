@@ -0,0 +1,107 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ecommerce.utils.payments.fake_stripe import FakeStripe, FakeStripeServer, WebhookSender
+
+
+class Command(BaseCommand):
+    help = 'Runs a local stand-in of the Stripe API for load testing (set STRIPE_API_BASE to its address).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', type=str, default='127.0.0.1', help='Host of the server.')
+        parser.add_argument('--port', type=int, default=12111, help='Port of the server.')
+        parser.add_argument(
+            '--latency',
+            type=int,
+            default=0,
+            help='Delay of every response in milliseconds.'
+        )
+        parser.add_argument(
+            '--jitter',
+            type=int,
+            default=0,
+            help='Max random delay in milliseconds added to the latency.'
+        )
+        parser.add_argument(
+            '--error-rate',
+            type=float,
+            default=0,
+            help='Share of requests (0 - 1) which fail with --error-status.'
+        )
+        parser.add_argument(
+            '--error-status',
+            type=int,
+            default=500,
+            help='Status of injected errors, e.g. 500 or 429.'
+        )
+        parser.add_argument(
+            '--webhook-url',
+            type=str,
+            default=None,
+            help='Webhook of the shop, e.g. http://localhost:8000/api/v1/stripe_webhook/. '
+                 'Events aren\'t sent without it.'
+        )
+        parser.add_argument(
+            '--webhook-rate',
+            type=float,
+            default=10,
+            help='Amount of open checkout sessions finished per second, an event is sent for each.'
+        )
+        parser.add_argument(
+            '--expire-rate',
+            type=float,
+            default=0,
+            help='Share of sessions (0 - 1) which are expired instead of completed.'
+        )
+        parser.add_argument(
+            '--webhook-secret',
+            type=str,
+            default=None,
+            help='Secret of event signatures (STRIPE_WEBHOOK_SECRET by default).'
+        )
+        parser.add_argument(
+            '--silence',
+            action='store_true',
+            help='Silences the output and request logs.'
+        )
+
+    def handle(self, *args, **options):
+        silence = options['silence']
+        sender = None
+
+        try:
+            fake_stripe = FakeStripe(
+                latency=options['latency'] / 1000,
+                jitter=options['jitter'] / 1000,
+                error_rate=options['error_rate'],
+                error_status=options['error_status'],
+            )
+            server = FakeStripeServer(options['host'], options['port'], fake_stripe, verbose=not silence)
+
+            if options['webhook_url']:
+                sender = WebhookSender(
+                    fake_stripe,
+                    url=options['webhook_url'],
+                    secret=options['webhook_secret'] or str(settings.STRIPE_WEBHOOK_SECRET),
+                    rate=options['webhook_rate'],
+                    expire_rate=options['expire_rate'],
+                )
+                sender.start()
+
+            if not silence:
+                self.stdout.write(self.style.SUCCESS(f'Fake Stripe is running at {fake_stripe.base_url}'))
+
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                if sender is not None:
+                    sender.stop()
+                server.server_close()
+
+            if not silence:
+                stats = ', '.join(f'{key}: {value}' for key, value in sorted(fake_stripe.stats.items()))
+                self.stdout.write(self.style.SUCCESS(f'Fake Stripe is stopped ({stats})'))
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(str(e)))
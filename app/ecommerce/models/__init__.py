@@ -5,3 +5,5 @@ from .shopping_carts import *
 from .orders import *
 from .payments import *
 from .reviews import *
+from .idempotency import *
+from .reports import *
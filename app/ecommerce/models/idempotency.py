@@ -0,0 +1,27 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+
+class IdempotencyKey(models.Model):
+    """
+    First response to a request sent with 'Idempotency-Key' header.
+    Repeated requests with the same key get this response instead of being executed again.
+    """
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotencykey_user_key_unique'),
+        ]
+
+    user = models.ForeignKey('UserProfile', on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    # Digest of method, path and body, the key can't be reused for other requests
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    response = models.JSONField(encoder=DjangoJSONEncoder, null=True)
+    # Headers of the response such as 'Location' of created objects
+    headers = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.key} ({self.user_id})'
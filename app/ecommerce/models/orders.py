@@ -3,13 +3,18 @@ from django.core.validators import MinValueValidator
 
 import enum
 
-from django.utils import formats
+from django.utils import formats, timezone
 
 
 class Order(models.Model):
 
     class Meta:
-        ordering = ('-date_created',)
+        ordering = ('-date_created', '-id')
+        indexes = [
+            # Keyset pagination of order history (see 'OrderPagination').
+            models.Index(fields=['user', '-date_created', '-id'], name='order_user_date_created_idx'),
+            models.Index(fields=['guest', '-date_created', '-id'], name='order_guest_date_created_idx'),
+        ]
 
     class OrderStatus(enum.Enum):
         NEW = 1
@@ -17,6 +22,8 @@ class Order(models.Model):
         SHIPPED = 3
         DONE = 4
         RETURN = 5
+        CANCELLED = 6
+        EXPIRED = 7  # not paid in time (see 'ORDERS_EXPIRATION_MINUTES')
 
     class OrderMethods(enum.Enum):
         CARD = 1
@@ -43,11 +50,78 @@ class Order(models.Model):
 
 
 class OrderItem(models.Model):
+    # Foreign key constraint is dropped when order tables are partitioned (see 'partition_order_tables')
     order = models.ForeignKey('Order', related_name='order_item', on_delete=models.CASCADE)
     product_variation = models.ForeignKey('ProductVariation', related_name='order_item', on_delete=models.PROTECT)
     quantity = models.PositiveIntegerField(validators=[MinValueValidator(1), ])
     price = models.PositiveIntegerField()
-    date_created = models.DateTimeField(auto_now_add=True)
+    # Same as 'date_created' of the order (see 'place_order'), so the order and its items share a partition
+    date_created = models.DateTimeField(default=timezone.now, editable=False)
+
+    # Product at the time of purchase (see 'utils.orders.snapshots'), order is shown without catalog joins
+    product_name = models.CharField(max_length=255, blank=True)
+    product_slug = models.SlugField(max_length=255, blank=True)
+    product_code = models.CharField(max_length=32, blank=True)
+    product_gender = models.CharField(max_length=15, blank=True)
+    product_size = models.CharField(max_length=20, blank=True)
+    product_price = models.PositiveIntegerField(null=True, blank=True)
+    main_image = models.JSONField(null=True, blank=True)
 
     def __str__(self):
         return f"№{self.pk} / Order: {self.order} -> {self.product_variation}"
+
+
+class ArchivedOrder(models.Model):
+    """
+    Order from the archive tier: partitions of old months moved out of the live table
+    (see 'archive_order_partitions'). Read-only, the table exists only after partitioning.
+    """
+
+    class Meta:
+        managed = False
+        db_table = 'ecommerce_order_archive'
+        ordering = ('-date_created', '-id')
+
+    user = models.ForeignKey('UserProfile', on_delete=models.DO_NOTHING, related_name='+', db_constraint=False)
+    guest = models.ForeignKey('UserProfile', on_delete=models.DO_NOTHING, blank=True, null=True, related_name='+',
+                              db_constraint=False)
+    payment_method = models.PositiveSmallIntegerField(choices=[(x.value, x.name) for x in Order.OrderMethods])
+    shipping_address = models.ForeignKey('Address', on_delete=models.DO_NOTHING, related_name='+', db_constraint=False)
+    shipping_method = models.PositiveSmallIntegerField(choices=[(x.value, x.name) for x in Order.ShippingMethods])
+    order_price = models.PositiveIntegerField()
+    order_status = models.PositiveSmallIntegerField(choices=[(x.value, x.name) for x in Order.OrderStatus])
+    date_created = models.DateTimeField()
+
+    def __str__(self):
+        return Order.__str__(self)
+
+
+class ArchivedOrderItem(models.Model):
+    """
+    Order item from the archive tier (see 'ArchivedOrder'). Archived items can't be reviewed.
+    """
+
+    class Meta:
+        managed = False
+        db_table = 'ecommerce_orderitem_archive'
+
+    order = models.ForeignKey('ArchivedOrder', related_name='order_item', on_delete=models.DO_NOTHING,
+                              db_constraint=False)
+    product_variation = models.ForeignKey('ProductVariation', related_name='+', on_delete=models.DO_NOTHING,
+                                          db_constraint=False)
+    quantity = models.PositiveIntegerField()
+    price = models.PositiveIntegerField()
+    date_created = models.DateTimeField()
+
+    product_name = models.CharField(max_length=255, blank=True)
+    product_slug = models.SlugField(max_length=255, blank=True)
+    product_code = models.CharField(max_length=32, blank=True)
+    product_gender = models.CharField(max_length=15, blank=True)
+    product_size = models.CharField(max_length=20, blank=True)
+    product_price = models.PositiveIntegerField(null=True, blank=True)
+    main_image = models.JSONField(null=True, blank=True)
+
+    review = None
+
+    def __str__(self):
+        return f"№{self.pk} / Archived order: {self.order_id} -> {self.product_variation_id}"
@@ -1,8 +1,47 @@
+import enum
+
 from django.db import models
 
 
 class Payment(models.Model):
+    # Foreign key constraint is dropped when order tables are partitioned (see 'partition_order_tables')
     order = models.OneToOneField('Order', related_name='payment', on_delete=models.CASCADE)
     # user = models.ForeignKey('UserProfile', on_delete=models.CASCADE)
     payment_bool = models.BooleanField(default=False)
     stripe_session_id = models.CharField(max_length=500, blank=True)
+    # Paid after the order was cancelled or expired and its items are out of stock
+    refund_required = models.BooleanField(default=False)
+
+
+class WebhookEvent(models.Model):
+    """
+    Stripe event received by the webhook. The webhook only stores the event,
+    events are processed in order by 'process_webhook_events'.
+    """
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'stripe_created', 'id'], name='webhookevent_status_idx'),
+        ]
+
+    class EventStatus(enum.Enum):
+        PENDING = 1
+        PROCESSED = 2
+        FAILED = 3  # not processed after 'WEBHOOKS_MAX_ATTEMPTS' attempts
+
+    # Stripe delivers an event at least once, repeated deliveries are dropped by the unique id
+    event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=100)
+    # Events with the same key (order or checkout session) are processed in the order they were created
+    ordering_key = models.CharField(max_length=255)
+    payload = models.JSONField()
+    status = models.PositiveSmallIntegerField(choices=[(x.value, x.name) for x in EventStatus], default=1)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    stripe_created = models.DateTimeField()
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.event_id} ({self.event_type}) / Status: {WebhookEvent.EventStatus(self.status).name}'
@@ -1,6 +1,12 @@
+import enum
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db.models import Q
+from django.db.models.functions import Length
 
 from rest_framework.reverse import reverse
 
@@ -10,7 +16,12 @@ class Product(models.Model):
     """ Model describes products. """
 
     class Meta:
-        ordering = ('-date_created',)
+        ordering = ('-date_created', '-id')
+        indexes = [
+            # Keyset pagination of the catalog (see 'ProductPagination').
+            models.Index(fields=['-date_created', '-id'], name='product_date_created_id_idx'),
+            GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+        ]
 
     GENDER_CHOICES = [
         ('M', 'Man'),
@@ -25,11 +36,45 @@ class Product(models.Model):
     brand = models.ForeignKey('Brand', on_delete=models.CASCADE)
     attribute_option = models.ManyToManyField('AttributeOption')
     date_created = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
 
+    # Rating aggregates are denormalized from 'Review' (see 'signals.reviews').
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_count_1 = models.PositiveIntegerField(default=0)
+    rating_count_2 = models.PositiveIntegerField(default=0)
+    rating_count_3 = models.PositiveIntegerField(default=0)
+    rating_count_4 = models.PositiveIntegerField(default=0)
+    rating_count_5 = models.PositiveIntegerField(default=0)
+
+    # Weighted full-text search vector (see 'utils.products.search').
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    RATING_HISTOGRAM_FIELDS = {
+        1: 'rating_count_1',
+        2: 'rating_count_2',
+        3: 'rating_count_3',
+        4: 'rating_count_4',
+        5: 'rating_count_5',
+    }
+
     def __str__(self):
         return self.name.capitalize()
 
+    def get_rating(self):
+        """ Returns average rating of the product rounded to one decimal place. """
+
+        if not self.rating_count:
+            return None
+
+        return round(self.rating_sum / self.rating_count, 1)
+
+    def get_rating_histogram(self) -> dict:
+        """ Returns amount of reviews for every rating (star). """
+
+        return {star: getattr(self, field) for star, field in self.RATING_HISTOGRAM_FIELDS.items()}
+
     def gender_display(self):
         if self.gender == 'M':
             return "Man"
@@ -58,9 +103,53 @@ class ProductCategory(models.Model):
     size_category = models.ForeignKey('SizeCategory', on_delete=models.CASCADE)
     parent_category = models.ForeignKey('ProductCategory', on_delete=models.CASCADE, blank=True, null=True)
 
+    # Materialized path of ids from the root category, e.g. '/6/7/' (see 'utils.products.categories').
+    path = models.CharField(max_length=255, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # 'varchar_pattern_ops' lets 'path LIKE '/6/%'' use the index
+            models.Index(fields=['path'], name='productcategory_path_idx', opclasses=['varchar_pattern_ops']),
+        ]
+
     def __str__(self):
         return self.name.capitalize()
 
+    def clean(self):
+        if self.pk and self.parent_category_id:
+            parent_path = ProductCategory.objects \
+                .filter(pk=self.parent_category_id) \
+                .values_list('path', flat=True) \
+                .first()
+
+            if self.parent_category_id == self.pk or f'/{self.pk}/' in (parent_path or ''):
+                raise ValidationError({'parent_category': 'Category can\'t be placed under itself.'})
+
+    @staticmethod
+    def get_path_ids(path: str) -> list[int]:
+        """ Returns ids of categories in the path from the root category. """
+        return [int(pk) for pk in path.strip('/').split('/') if pk]
+
+    def get_descendants(self, include_self=True):
+        """
+        Returns queryset of categories under the category with one indexed query.
+        """
+        queryset = ProductCategory.objects.filter(path__startswith=self.path)
+        if not include_self:
+            queryset = queryset.exclude(pk=self.pk)
+
+        return queryset
+
+    def get_ancestors(self, include_self=False):
+        """
+        Returns queryset of categories above the category ordered from the root.
+        """
+        ids = self.get_path_ids(self.path)
+        if not include_self:
+            ids = ids[:-1]
+
+        return ProductCategory.objects.filter(pk__in=ids).order_by(Length('path'))
+
 
 class ProductSize(models.Model):
 
@@ -91,29 +180,30 @@ class ProductItem(models.Model):
     product_code = models.CharField(max_length=32)
     discount = models.ManyToManyField('Discount', related_name='discount', blank=True)
     created = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     stripe_product_id = models.CharField(max_length=255, blank=True, null=True)
     stripe_price_id = models.CharField(max_length=255, blank=True, null=True)
+    # Hash of the product and price synced to Stripe, see 'utils.payments.catalog'
+    stripe_sync_hash = models.CharField(max_length=64, blank=True, editable=False)
     is_active = models.BooleanField(default=True)
 
+    # Total rate of discounts active today and the price with them applied (see 'utils.products.prices').
+    discount_rate = models.PositiveIntegerField(default=0, editable=False)
+    discount_price = models.PositiveIntegerField(blank=True, null=True, editable=False)
+
     def __str__(self):
         return f'{self.product}, {self.color.name.capitalize()}'
 
     def get_discount_price(self):
-        # !
-        # Create a test for this method
-        # !
+        """
+        Returns effective price of the product item with today's discounts applied.
+        The price is precomputed by 'utils.products.prices'.
+        """
 
-        discounts = self.discount.all()
-        if not discounts:
+        if self.discount_price is None:
             return self.price
 
-        # Calculate the discount price
-        rate = 0
-        for discount in discounts:
-            rate += discount.discount_rate
-
-        discount_price = self.price * ((100 - rate) / 100)
-        return int(discount_price)
+        return self.discount_price
 
 
 class Image(models.Model):
@@ -140,6 +230,7 @@ class ProductVariation(models.Model):
     size = models.ForeignKey('ProductSize', on_delete=models.CASCADE)
     qty_in_stock = models.PositiveIntegerField()
     is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f'{self.product_item}, {self.size.name}'
@@ -182,4 +273,44 @@ class AttributeType(SimpleModel):
 
 class Brand(SimpleModel):
     """ Model contains brands. """
-    pass
\ No newline at end of file
+    pass
+
+
+class ProductFacet(models.Model):
+    """
+    Materialized facet index of the catalog.
+
+    Contains one row for every value of every filterable dimension of a product.
+    Catalog filters select products by these rows and facet counts are grouped
+    from them, so both don't depend on joins across the catalog tables.
+    Rows are maintained by 'utils.products.facets'.
+    """
+
+    class Facet(enum.Enum):
+        GENDER = 1
+        CATEGORY = 2 # product category and all its parent categories
+        BRAND = 3
+        COLOR = 4
+        SIZE = 5 # sizes which are in stock
+        ATTRIBUTE_OPTION = 6
+        PRICE = 7 # effective price of a product item, used for filtering
+        PRICE_RANGE = 8 # price bucket of a product item, used for facet counts
+
+    product = models.ForeignKey('Product', related_name='facet', on_delete=models.CASCADE)
+    facet = models.PositiveSmallIntegerField(choices=[(x.value, x.name) for x in Facet])
+    value = models.PositiveIntegerField()
+    name = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product', 'facet', 'value'],
+                name='unique_facet_value_per_product'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['facet', 'value', 'product'], name='product_facet_value_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id}: {ProductFacet.Facet(self.facet).name} = {self.value}'
@@ -0,0 +1,66 @@
+from django.db import models
+
+from ecommerce.models.orders import Order
+
+
+class DailySales(models.Model):
+    """
+    Orders created on a day with the given status (see 'utils.reports.rollups').
+    Reports read these rows instead of aggregating orders.
+    """
+
+    class Meta:
+        verbose_name_plural = 'daily sales'
+        ordering = ('-date', 'order_status')
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'order_status'], name='dailysales_date_order_status_unique'),
+        ]
+
+    date = models.DateField()
+    order_status = models.PositiveSmallIntegerField(choices=[(x.value, x.name) for x in Order.OrderStatus])
+    order_count = models.PositiveIntegerField(default=0)
+    units_sold = models.PositiveIntegerField(default=0)
+    revenue = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.date} / {self.get_order_status_display()}: {self.order_count}'
+
+
+class DailyProductSales(models.Model):
+    """
+    Units and revenue of a product on a day, counted only for paid orders ('SALES_STATUSES').
+    Category and brand are copied from the product, so they are grouped without catalog joins.
+    """
+
+    class Meta:
+        verbose_name_plural = 'daily product sales'
+        ordering = ('-date', '-revenue')
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product'], name='dailyproductsales_date_product_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'category'], name='dailyproductsales_category_idx'),
+            models.Index(fields=['date', 'brand'], name='dailyproductsales_brand_idx'),
+        ]
+
+    date = models.DateField()
+    product = models.ForeignKey('Product', on_delete=models.CASCADE, related_name='daily_sales')
+    category = models.ForeignKey('ProductCategory', on_delete=models.SET_NULL, null=True, related_name='+')
+    brand = models.ForeignKey('Brand', on_delete=models.SET_NULL, null=True, related_name='+')
+    units_sold = models.PositiveIntegerField(default=0)
+    revenue = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.date} / {self.product_id}: {self.units_sold}'
+
+
+class RollupWatermark(models.Model):
+    """
+    The last day rolled up by a rollup job, the next run continues from it.
+    """
+
+    name = models.CharField(max_length=50, unique=True)
+    date = models.DateField()
+
+    def __str__(self):
+        return f'{self.name}: {self.date}'
@@ -6,6 +6,7 @@ from ecommerce.models import UserProfile, Product, OrderItem
 
 class Review(models.Model):
     user = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='review')
+    # Foreign key constraint is dropped when order tables are partitioned (see 'partition_order_tables')
     order_item = models.OneToOneField(OrderItem, on_delete=models.CASCADE, related_name='review')
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='review')
     comment = models.TextField(max_length=255, blank=True)
@@ -14,3 +14,5 @@ class ShoppingCartItem(models.Model):
     cart = models.ForeignKey('ShoppingCart', related_name='shopping_cart_item', on_delete=models.CASCADE)
     product_variation = models.ForeignKey('ProductVariation', related_name='shopping_cart_item', on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+    # Stock is held for the item 'CART_HOLD_TIMEOUT' seconds after it was changed
+    updated_at = models.DateTimeField(auto_now=True)
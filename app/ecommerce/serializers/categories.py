@@ -0,0 +1,35 @@
+from rest_framework import serializers
+
+from ..models import ProductCategory
+
+
+class ProductCategoryShortSerializer(serializers.ModelSerializer):
+    """
+    Serializes 'id', 'name' and 'slug' fields from 'ProductCategory' model
+    for displaying breadcrumbs and subcategories in 'ProductCategorySerializer' serializer.
+    """
+
+    class Meta:
+        model = ProductCategory
+        fields = ['id', 'name', 'slug']
+
+
+class ProductCategorySerializer(serializers.ModelSerializer):
+    """
+    Serializer class for 'ProductCategory' model with its ancestors (breadcrumbs)
+    and direct subcategories.
+    """
+
+    ancestors = serializers.SerializerMethodField()
+    subcategories = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ProductCategory
+        fields = ['id', 'name', 'slug', 'description', 'image', 'path', 'ancestors', 'subcategories']
+
+    def get_ancestors(self, obj):
+        return ProductCategoryShortSerializer(obj.get_ancestors(), many=True).data
+
+    def get_subcategories(self, obj):
+        subcategories = ProductCategory.objects.filter(parent_category=obj).order_by('name')
+        return ProductCategoryShortSerializer(subcategories, many=True).data
@@ -7,7 +7,7 @@ from ecommerce.models.addresses import Address, UserAddress
 from ecommerce.models.orders import Order, OrderItem
 from ecommerce.models.payments import Payment
 from ecommerce.serializers.addresses import AddressSerializer
-from ecommerce.serializers.products import ImageSerializer
+from ecommerce.utils.orders.placement import place_order
 
 
 class PaymentSerializer(serializers.ModelSerializer):
@@ -21,11 +21,14 @@ class PaymentSerializer(serializers.ModelSerializer):
         if not obj.payment_bool:
             return self.context['request'].build_absolute_uri(
                 reverse('payment_checkout',
-                        kwargs={'order_id': obj.order.id}))
+                        kwargs={'order_id': obj.order_id}))
         return None
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
+    """
+    Product fields are taken from the snapshot made when the order was placed.
+    """
     product_name = serializers.SerializerMethodField()
     product_code = serializers.SerializerMethodField()
     product_gender = serializers.SerializerMethodField()
@@ -47,44 +50,45 @@ class OrderItemSerializer(serializers.ModelSerializer):
     def get_product_name(self, obj):
         action = self.context.get('action')
         if action == 'retrieve':
-            return obj.product_variation.product_item.product.name
+            return obj.product_name
 
     def get_product_code(self, obj):
         action = self.context.get('action')
         if action == 'retrieve':
-            return obj.product_variation.product_item.product_code
+            return obj.product_code
 
     def get_product_gender(self, obj):
         action = self.context.get('action')
         if action == 'retrieve':
-            return obj.product_variation.product_item.product.gender
+            return obj.product_gender
 
     def get_product_size(self, obj):
         action = self.context.get('action')
         if action == 'retrieve':
-            return obj.product_variation.size.name
+            return obj.product_size
 
     def get_product_price(self, obj):
         action = self.context.get('action')
         if action == 'retrieve':
-            return obj.product_variation.product_item.price
+            return obj.product_price
 
     def get_review_id(self, obj):
         action = self.context.get('action')
         if action == 'retrieve':
             try:
-                return obj.review.pk
+                return obj.review.pk if obj.review is not None else None
             except ObjectDoesNotExist:
                 return None
 
     def get_review_url(self, obj):
         action = self.context.get('action')
-        if action == 'retrieve' and obj.order.payment.payment_bool:
+        # Archived order items can't be reviewed
+        if action == 'retrieve' and isinstance(obj, OrderItem) and obj.order.payment.payment_bool:
             return self.context['request'].build_absolute_uri(
                 reverse('reviews_create',
                         kwargs={'order_id': obj.order.id,
                                 'order_item_id': obj.pk,
-                                'product_slug': obj.product_variation.product_item.product.slug}))
+                                'product_slug': obj.product_slug}))
 
         return None
 
@@ -93,23 +97,14 @@ class OrderItemSerializer(serializers.ModelSerializer):
         if action == 'retrieve':
             return self.context['request'].build_absolute_uri(
                 reverse('products-detail',
-                        kwargs={'slug': obj.product_variation.product_item.product.slug}))
+                        kwargs={'slug': obj.product_slug}))
 
         return None
 
     def get_main_image(self, obj):
         action = self.context.get('action')
         if action == 'retrieve':
-            # Access the prefetch related images
-            main_image = None
-            for image in obj.product_variation.product_item.image.all():
-                if image.is_main:
-                    main_image = image
-                    break
-            if main_image:
-                return ImageSerializer(main_image).data
-
-            # or just return qs[0]
+            return obj.main_image
 
         return None
 
@@ -163,10 +158,7 @@ class OrderUserCreateSerializer(OrderCreateSerializer):
                     .filter(address__user=request.user))
 
     def create(self, validated_data):
-        order_price = self.context.get('order_price', None)
-        order = Order.objects.create(order_price=order_price, **validated_data)
-        order.save()
-        return order
+        return place_order(self.context['cart_items'], **validated_data)
 
 
 class OrderGuestCreateSerializer(OrderCreateSerializer):
@@ -191,21 +183,16 @@ class OrderGuestCreateSerializer(OrderCreateSerializer):
 
         user = self.context.get('user', None)
         guest = self.context.get('guest', None)
-        order_price = self.context.get('order_price', None)
 
         shipping_address_data = validated_data.pop('shipping_address')
         shipping_address = Address.objects.create(**shipping_address_data)
 
         UserAddress.objects.create(address=shipping_address, user=user)
 
-        order = Order.objects.create(
+        return place_order(
+            self.context['cart_items'],
             shipping_address=shipping_address,
-            order_price=order_price,
             user=user,
             guest=guest,
             **validated_data
         )
-
-        order.save()
-
-        return order
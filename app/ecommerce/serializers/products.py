@@ -3,6 +3,7 @@ from rest_framework.relations import SlugRelatedField
 
 from .reviews import ReviewSerializer
 from ..models import Product, ProductVariation, ProductItem, Image, AttributeOption, Discount
+from ..utils.shopping_carts.holds import get_available_quantity
 
 
 class DiscountSerializer(serializers.ModelSerializer):
@@ -43,14 +44,21 @@ class ProductVariationSerializer(serializers.ModelSerializer):
     """
     Serializes 'id', 'size' and 'qty_in_stock' fields from 'ProductVariation'
     model for displaying them in 'ProductItemSerializer' serializer.
+
+    'qty_in_stock' is shown without quantity held in shopping carts,
+    holds are passed in 'stock_holds' context (see 'ProductViewSet.get_serializer').
     """
 
     size = serializers.SlugRelatedField(slug_field='name', read_only=True)
+    qty_in_stock = serializers.SerializerMethodField()
 
     class Meta:
         model = ProductVariation
         fields = ['id', 'size', 'qty_in_stock']
 
+    def get_qty_in_stock(self, obj) -> int:
+        return get_available_quantity(obj, self.context.get('stock_holds', {}))
+
 
 class ProductItemSerializer(serializers.ModelSerializer):
     """
@@ -62,7 +70,7 @@ class ProductItemSerializer(serializers.ModelSerializer):
     images = ImageSerializer(many=True, read_only=True, source='image')
     product_variations = ProductVariationSerializer(many=True, read_only=True, source='product_variation')
     price = serializers.IntegerField()
-    discount_price = serializers.SerializerMethodField()
+    discount_price = serializers.IntegerField(read_only=True, source='get_discount_price')
     discounts = DiscountSerializer(many=True, read_only=True, source='discount')
 
     class Meta:
@@ -70,9 +78,6 @@ class ProductItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'product_code', 'price', 'discount_price',
                   'color', 'images', 'discounts', 'product_variations']
 
-    def get_discount_price(self, obj):
-        return obj.get_discount_price()
-
 
 class ProductSerializer(serializers.ModelSerializer):
     """
@@ -83,21 +88,13 @@ class ProductSerializer(serializers.ModelSerializer):
     category = serializers.SlugRelatedField(slug_field='name', read_only=True)
     attribute_options = AttributeOptionSerializer(many=True, read_only=True, source='attribute_option')
     product_items = ProductItemSerializer(many=True, read_only=True, source='product_item')
-    product_rating = serializers.SerializerMethodField()
-    # rating = serializers.FloatField()
+    product_rating = serializers.FloatField(read_only=True, source='get_rating')
 
     class Meta:
         model = Product
         fields = ['id', 'name', 'slug', 'description', 'brand', 'category',
                   'gender', 'attribute_options', 'product_items', 'product_rating', ]
 
-    def get_product_rating(self, obj):
-        if obj.product_rating:
-            return round(obj.product_rating, 1)
-
-        return None
-
-
 
 class ProductDetailSerializer(ProductSerializer):
     """
@@ -106,11 +103,13 @@ class ProductDetailSerializer(ProductSerializer):
     """
 
     reviews = ReviewSerializer(many=True, read_only=True, source='review')
+    rating_histogram = serializers.DictField(read_only=True, source='get_rating_histogram')
 
     class Meta:
         model = Product
         fields = ['id', 'name', 'slug', 'description', 'brand', 'category',
-                  'gender', 'attribute_options', 'product_items', 'reviews']
+                  'gender', 'attribute_options', 'product_items', 'product_rating',
+                  'rating_count', 'rating_histogram', 'reviews']
 
     # def get_reviews(self, obj):
     #     reviews = []
@@ -0,0 +1,94 @@
+from ecommerce.utils.shopping_carts.holds import get_available_quantity
+
+
+def get_name(obj):
+    """ Same as 'SlugRelatedField(slug_field='name')'. """
+    return obj.name if obj is not None else None
+
+
+class ProductFlatSerializer:
+    """
+    Flat version of 'ProductSerializer' (see 'test_flat_serializer_parity').
+
+    Read-only serializer which builds plain dicts from prefetched objects
+    without DRF field machinery. It has the part of DRF serializer interface
+    used by views: 'instance', 'many', 'context' and 'data'.
+
+    Output must be identical to 'ProductSerializer', so fields are listed in the same order
+    and converted the same way DRF converts them.
+    Product must be fetched with 'ProductViewSet.get_queryset' prefetches.
+    """
+
+    def __init__(self, instance=None, many=False, context=None, **kwargs):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+
+    @property
+    def data(self):
+        if self.many:
+            return [self.to_representation(obj) for obj in self.instance]
+
+        return self.to_representation(self.instance)
+
+    def to_representation(self, obj) -> dict:
+        rating = obj.get_rating()
+
+        return {
+            'id': obj.id,
+            'name': obj.name,
+            'slug': obj.slug,
+            'description': obj.description,
+            'brand': get_name(obj.brand),
+            'category': get_name(obj.category),
+            'gender': obj.gender,
+            'attribute_options': [
+                {
+                    'id': option.id,
+                    'name': option.name,
+                    'attribute_type': get_name(option.attribute_type),
+                }
+                for option in obj.attribute_option.all()
+            ],
+            'product_items': [self.product_item_to_representation(item) for item in obj.product_item.all()],
+            'product_rating': float(rating) if rating is not None else None,
+        }
+
+    def product_item_to_representation(self, obj) -> dict:
+        holds = self.context.get('stock_holds', {})
+
+        return {
+            'id': obj.id,
+            'product_code': obj.product_code,
+            'price': int(obj.price),
+            'discount_price': int(obj.get_discount_price()),
+            'color': get_name(obj.color),
+            'images': [
+                {
+                    'id': image.id,
+                    'name': image.name,
+                    'url': image.url,
+                    'is_main': image.is_main,
+                }
+                for image in obj.image.all()
+            ],
+            'discounts': [
+                {
+                    'id': discount.id,
+                    'name': discount.name,
+                    'description': discount.description,
+                    'discount_rate': discount.discount_rate,
+                    'start_date': discount.start_date.isoformat(),
+                    'end_date': discount.end_date.isoformat(),
+                }
+                for discount in obj.discount.all()
+            ],
+            'product_variations': [
+                {
+                    'id': variation.id,
+                    'size': get_name(variation.size),
+                    'qty_in_stock': get_available_quantity(variation, holds),
+                }
+                for variation in obj.product_variation.all()
+            ],
+        }
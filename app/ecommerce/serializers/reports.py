@@ -0,0 +1,30 @@
+import datetime
+
+from django.utils import timezone
+
+from rest_framework import serializers
+
+
+class SalesReportQuerySerializer(serializers.Serializer):
+    """
+    Validates query parameters of the sales report, e.g. '?date_after=2024-01-01&date_before=2024-01-31&brand=2'.
+    The last 30 complete days are reported by default.
+    """
+
+    date_after = serializers.DateField(required=False)
+    date_before = serializers.DateField(required=False)
+    category = serializers.IntegerField(required=False, min_value=1)
+    brand = serializers.IntegerField(required=False, min_value=1)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=100, default=10)
+
+    def validate(self, attrs):
+        date_before = attrs.get('date_before') or timezone.localdate() - datetime.timedelta(days=1)
+        date_after = attrs.get('date_after') or date_before - datetime.timedelta(days=29)
+
+        if date_after > date_before:
+            raise serializers.ValidationError({'date_after': 'Must not be later than date_before'})
+
+        attrs['date_after'] = date_after
+        attrs['date_before'] = date_before
+
+        return attrs
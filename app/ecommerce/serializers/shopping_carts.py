@@ -2,6 +2,7 @@ from rest_framework import serializers
 
 from ..models.products import ProductVariation
 from ..models.shopping_carts import ShoppingCartItem
+from ..utils.shopping_carts.holds import get_available_quantity, get_held_quantity, get_stock_holds, hold_stock
 
 
 class ShoppingCartItemSerializer(serializers.ModelSerializer):
@@ -52,8 +53,9 @@ class ShoppingCartItemSerializer(serializers.ModelSerializer):
                 quantity += item.quantity
                 existing_item = item
 
-        # Step 2. Check that quantity in shopping cart isn't larger than quantity in stock.
-        quantity = quantity if quantity <= product_variation.qty_in_stock else product_variation.qty_in_stock
+        # Step 2. Check that quantity in shopping cart isn't larger than quantity in stock
+        #   which is not held in other shopping carts.
+        quantity = min(quantity, self.get_available_quantity(product_variation, get_held_quantity(existing_item)))
 
         # Step 3. If quantity is zero raise error
         if not quantity:
@@ -64,20 +66,40 @@ class ShoppingCartItemSerializer(serializers.ModelSerializer):
             validated_data = {'product_variation': product_variation, 'quantity': quantity}
             return self.update(existing_item, validated_data)
 
-        # Step 5. Create cart item and return it
-        return ShoppingCartItem.objects.create(
+        # Step 5. Create cart item, hold its quantity in stock and return it
+        instance = ShoppingCartItem.objects.create(
             cart=self.context['cart'],
             product_variation=product_variation,
             quantity=quantity,
             **validated_data
         )
+        hold_stock(product_variation.pk, quantity)
+
+        return instance
 
     def update(self, instance, validated_data):
         quantity = validated_data.pop('quantity', instance.quantity)
         product_variation = validated_data.pop('product_variation', instance.product_variation)
 
+        held_qty = get_held_quantity(instance)
+        held_product_variation_id = instance.product_variation_id
+        if product_variation.pk != held_product_variation_id:
+            # Hold of the previous product variation is released below
+            hold_stock(held_product_variation_id, -held_qty)
+            held_qty = 0
+
         instance.product_variation = product_variation
-        instance.quantity = quantity if quantity <= product_variation.qty_in_stock else product_variation.qty_in_stock
+        instance.quantity = min(quantity, self.get_available_quantity(product_variation, held_qty))
 
         instance.save()
+        hold_stock(product_variation.pk, instance.quantity - held_qty)
+
         return instance
+
+    @staticmethod
+    def get_available_quantity(product_variation, held_qty: int) -> int:
+        """
+        Returns quantity which can be put in the shopping cart
+        including quantity already held by it.
+        """
+        return get_available_quantity(product_variation, get_stock_holds([product_variation.pk]), held_qty)
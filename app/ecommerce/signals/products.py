@@ -0,0 +1,115 @@
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from ecommerce.models.products import Product, ProductItem, ProductVariation, ProductCategory, Brand, \
+    Discount, ProductFacet, Image
+from ecommerce.utils.products.cache import invalidate_products
+from ecommerce.utils.products.categories import update_category_path, invalidate_category_tree
+from ecommerce.utils.products.indexes import index_products
+
+
+@receiver(post_save, sender=Product)
+def update_indexes_on_product_save(sender, instance, **kwargs):
+    index_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def invalidate_cache_on_product_delete(sender, instance, **kwargs):
+    invalidate_products([instance.pk])
+
+
+@receiver(post_save, sender=Image)
+@receiver(post_delete, sender=Image)
+def invalidate_cache_on_image_change(sender, instance, **kwargs):
+    # Images are not indexed, only cached responses contain them
+    invalidate_products(
+        ProductItem.objects.filter(pk=instance.product_item_id).values('product_id')
+    )
+
+
+@receiver(post_save, sender=ProductItem)
+@receiver(post_delete, sender=ProductItem)
+def update_indexes_on_product_item_change(sender, instance, **kwargs):
+    index_products([instance.product_id])
+
+
+@receiver(post_save, sender=ProductVariation)
+@receiver(post_delete, sender=ProductVariation)
+def update_indexes_on_product_variation_change(sender, instance, **kwargs):
+    index_products(
+        ProductItem.objects.filter(pk=instance.product_item_id).values('product_id')
+    )
+
+
+@receiver(post_save, sender=Discount)
+def update_indexes_on_discount_save(sender, instance, created, **kwargs):
+    if not created:
+        index_products(
+            ProductItem.objects.filter(discount=instance).values('product_id')
+        )
+
+
+@receiver(pre_delete, sender=Discount)
+def store_discount_products(sender, instance, **kwargs):
+    # Links to product items are deleted without 'm2m_changed', so remember products before
+    instance._product_ids = list(
+        ProductItem.objects.filter(discount=instance).values_list('product_id', flat=True).distinct()
+    )
+
+
+@receiver(post_delete, sender=Discount)
+def update_indexes_on_discount_delete(sender, instance, **kwargs):
+    index_products(getattr(instance, '_product_ids', []))
+
+
+@receiver(post_save, sender=ProductCategory)
+def update_indexes_on_category_save(sender, instance, created, **kwargs):
+    # Facets are built from category paths, so paths are updated first
+    update_category_path(instance)
+    invalidate_category_tree()
+
+    # Parent of the category could be changed, so reindex every product under it
+    if not created:
+        index_products(
+            ProductFacet.objects
+                .filter(facet=ProductFacet.Facet.CATEGORY.value, value=instance.pk)
+                .values('product_id')
+        )
+
+
+@receiver(post_delete, sender=ProductCategory)
+def invalidate_category_tree_on_delete(sender, instance, **kwargs):
+    # Subcategories and their products are deleted by cascade
+    invalidate_category_tree()
+
+
+@receiver(post_save, sender=Brand)
+def update_indexes_on_brand_save(sender, instance, created, **kwargs):
+    if not created:
+        index_products(Product.objects.filter(brand=instance).values('pk'))
+
+
+@receiver(m2m_changed, sender=Product.attribute_option.through)
+def update_indexes_on_attribute_option_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return None
+
+    if reverse:
+        # 'instance' is AttributeOption, 'pk_set' contains products
+        index_products(list(pk_set or ()))
+    else:
+        index_products([instance.pk])
+
+
+@receiver(m2m_changed, sender=ProductItem.discount.through)
+def update_indexes_on_discount_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return None
+
+    if reverse:
+        # 'instance' is Discount, 'pk_set' contains product items
+        index_products(
+            ProductItem.objects.filter(pk__in=pk_set or ()).values('product_id')
+        )
+    else:
+        index_products([instance.product_id])
@@ -0,0 +1,42 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from ecommerce.models.reviews import Review
+from ecommerce.utils.products.cache import invalidate_products
+from ecommerce.utils.products.ratings import update_product_rating
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, **kwargs):
+    """ Stores product and rating of the review before it is updated. """
+    instance._previous = None
+    if instance.pk:
+        instance._previous = Review.objects \
+            .filter(pk=instance.pk) \
+            .values_list('product_id', 'rating') \
+            .first()
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_save(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous', None)
+
+    if created or previous is None:
+        update_product_rating(instance.product_id, new_rating=instance.rating)
+        invalidate_products([instance.product_id])
+        return None
+
+    previous_product_id, previous_rating = previous
+    if previous_product_id != instance.product_id:
+        update_product_rating(previous_product_id, old_rating=previous_rating)
+        update_product_rating(instance.product_id, new_rating=instance.rating)
+        invalidate_products([previous_product_id, instance.product_id])
+    else:
+        update_product_rating(instance.product_id, old_rating=previous_rating, new_rating=instance.rating)
+        invalidate_products([instance.product_id])
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_delete(sender, instance, **kwargs):
+    update_product_rating(instance.product_id, old_rating=instance.rating)
+    invalidate_products([instance.product_id])
@@ -8,6 +8,7 @@ from app import settings
 from ecommerce.models import ProductItem
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
+stripe.api_base = settings.STRIPE_API_BASE
 
 # @receiver(post_save, sender=ProductItem)
 # def update_stripe_price(sender, instance, created, **kwargs):
@@ -1,2 +1,8 @@
 from .users import delete_old_guest_users
 from .send_email import send_order_details_email
+from .products import rebuild_product_indexes_task, refresh_product_prices_task
+from .orders import expire_unpaid_orders_task, place_order_task, create_order_partitions_task
+from .shopping_carts import reconcile_stock_holds_task
+from .idempotency import delete_old_idempotency_keys_task
+from .reports import rollup_sales_task
+from .payments import process_webhook_events_task, delete_old_webhook_events_task
@@ -0,0 +1,8 @@
+from celery import shared_task
+
+
+@shared_task
+def delete_old_idempotency_keys_task():
+    from ecommerce.utils.idempotency.idempotency import delete_old_idempotency_keys
+
+    delete_old_idempotency_keys()
@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from celery import shared_task
+
+
+@shared_task
+def expire_unpaid_orders_task():
+    from ecommerce.models.orders import Order
+    from ecommerce.utils.orders.stock import release_order_stock
+
+    threshold_time = timezone.now() - timedelta(minutes=settings.ORDERS_EXPIRATION_MINUTES)
+
+    # Orders with an open checkout session can still be paid,
+    # they are picked up after Stripe expires the session ('checkout.session.expired' webhook clears it)
+    order_ids = Order.objects \
+        .filter(order_status=Order.OrderStatus.NEW.value, date_created__lt=threshold_time, payment__stripe_session_id='') \
+        .values_list('id', flat=True)
+
+    # Every order is released in its own transaction, paid orders are skipped by the status check
+    for order_id in order_ids:
+        release_order_stock(order_id, Order.OrderStatus.EXPIRED)
+
+
+@shared_task
+def place_order_task(ticket_id):
+    from ecommerce.utils.orders.intake import place_ticket_order
+
+    # Routed to 'orders' queue, its worker concurrency limits concurrent order writes
+    place_ticket_order(ticket_id)
+
+
+@shared_task
+def create_order_partitions_task():
+    from ecommerce.utils.orders.partitions import create_order_partitions
+
+    # Does nothing until order tables are partitioned ('partition_order_tables_command')
+    create_order_partitions(ahead=settings.ORDERS_PARTITIONS_AHEAD)
@@ -0,0 +1,16 @@
+from celery import shared_task
+
+
+@shared_task
+def process_webhook_events_task():
+    from ecommerce.utils.payments.webhooks import process_webhook_events
+
+    # Scheduled by the webhook and by beat, which picks up retries and events left by a busy consumer
+    process_webhook_events()
+
+
+@shared_task
+def delete_old_webhook_events_task():
+    from ecommerce.utils.payments.webhooks import delete_old_webhook_events
+
+    delete_old_webhook_events()
@@ -0,0 +1,18 @@
+from celery import shared_task
+
+
+@shared_task
+def rebuild_product_indexes_task():
+    from ecommerce.utils.products.indexes import rebuild_product_indexes
+
+    # Indexes are maintained by signals, daily rebuild catches
+    # changes made without them (bulk updates, stock decrements)
+    rebuild_product_indexes()
+
+
+@shared_task
+def refresh_product_prices_task():
+    from ecommerce.utils.products.indexes import refresh_product_prices
+
+    # Discount windows are dates, so prices change right after midnight
+    refresh_product_prices()
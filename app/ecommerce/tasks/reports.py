@@ -0,0 +1,9 @@
+from celery import shared_task
+
+
+@shared_task
+def rollup_sales_task():
+    from ecommerce.utils.reports.rollups import rollup_sales
+
+    # Days after the watermark are rolled up at night, reports don't aggregate orders
+    rollup_sales()
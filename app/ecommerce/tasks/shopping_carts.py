@@ -0,0 +1,10 @@
+from celery import shared_task
+
+
+@shared_task
+def reconcile_stock_holds_task():
+    from ecommerce.utils.shopping_carts.holds import reconcile_stock_holds
+
+    # Hold counters are changed in the cache only,
+    # expired holds and lost increments are fixed from shopping cart items
+    reconcile_stock_holds()
@@ -5,3 +5,7 @@ from .orders import *
 from .payments import *
 from .tasks import *
 from .reviews import *
+from .products import *
+from .categories import *
+from .renderers import *
+from .reports import *
@@ -0,0 +1,74 @@
+from django.core.exceptions import ValidationError
+
+from rest_framework.reverse import reverse
+
+from ecommerce.models import ProductCategory, Product
+from ecommerce.utils.tests.mixins import TestAPIEcommerce
+
+
+class TestCategories(TestAPIEcommerce):
+
+    def setUp(self):
+        self.create_products()
+        self.shoes = ProductCategory.objects.get(slug='shoes')
+        self.sneakers = ProductCategory.objects.get(slug='sneakers')
+
+    def test_category_path(self):
+        self.assertEqual(self.shoes.path, f'/{self.shoes.pk}/', 'Root category path must contain only its id')
+        self.assertEqual(self.sneakers.path, f'/{self.shoes.pk}/{self.sneakers.pk}/',
+                         'Subcategory path must start with the path of its parent')
+
+        self.assertEqual(set(self.shoes.get_descendants().values_list('slug', flat=True)),
+                         {'shoes', 'sneakers', 'flip-flops'},
+                         'Descendants must contain the category and its subcategories')
+        self.assertEqual(list(self.sneakers.get_ancestors()), [self.shoes],
+                         'Ancestors must contain parent categories')
+
+        products = Product.objects.filter(category__in=self.shoes.get_descendants())
+        self.assertEqual(set(products.values_list('name', flat=True)), {'running sneakers', 'beach flip flops'},
+                         'Products of subcategories must be selected by descendants')
+
+    def test_category_move(self):
+        clothes = ProductCategory.objects.create(name='clothes', slug='clothes', description='desc',
+                                                 size_category=self.shoes.size_category)
+
+        self.shoes.parent_category = clothes
+        self.shoes.save()
+
+        self.sneakers.refresh_from_db()
+        self.assertEqual(self.sneakers.path, f'/{clothes.pk}/{self.shoes.pk}/{self.sneakers.pk}/',
+                         'Paths of subcategories must be updated when their parent is moved')
+        self.assertEqual(list(self.sneakers.get_ancestors()), [clothes, self.shoes],
+                         'Ancestors must be ordered from the root category')
+
+        clothes.parent_category = self.sneakers
+        with self.assertRaises(ValidationError, msg='Category must not be placed under its subcategory'):
+            clothes.clean()
+
+    def test_category_tree(self):
+        response = self.client.get(reverse('categories-list'))
+        self.assertEqual(response.status_code, 200, 'Category tree must be displayed')
+
+        roots = {category['slug']: category for category in response.data}
+        self.assertNotIn('sneakers', roots, 'Subcategories must not be displayed as root categories')
+        self.assertEqual({category['slug'] for category in roots['shoes']['subcategories']},
+                         {'sneakers', 'flip-flops'},
+                         'Subcategories must be nested under their parent')
+
+        with self.assertNumQueries(0):
+            self.client.get(reverse('categories-list'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductCategory.objects.create(name='boots', slug='boots', description='desc',
+                                           size_category=self.shoes.size_category, parent_category=self.shoes)
+
+        response = self.client.get(reverse('categories-list'))
+        roots = {category['slug']: category for category in response.data}
+        self.assertIn('boots', [category['slug'] for category in roots['shoes']['subcategories']],
+                      'Category tree must be invalidated when a category is created')
+
+    def test_category_detail(self):
+        response = self.client.get(reverse('categories-detail', kwargs={'slug': 'sneakers'}))
+        self.assertEqual(response.status_code, 200, 'Category must be displayed')
+        self.assertEqual([category['slug'] for category in response.data['ancestors']], ['shoes'],
+                         'Category breadcrumbs must contain parent categories')
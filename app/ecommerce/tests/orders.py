@@ -1,8 +1,37 @@
+import contextlib
+import csv
+import datetime
+import io
+import json
 import uuid
 
+from unittest import skipUnless
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections, connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
 from rest_framework.reverse import reverse
 
-from ecommerce.models import UserProfile, Address, Order
+from ecommerce.models import UserProfile, Address, Order, OrderItem, Payment, Product, ProductFacet, \
+    ProductVariation, ShoppingCartItem, ArchivedOrder
+from ecommerce.tasks import expire_unpaid_orders_task
+from ecommerce.utils.idempotency.idempotency import IDEMPOTENCY_LOCK_KEY
+from ecommerce.utils.orders import export
+from ecommerce.utils.orders.intake import ORDER_TICKET_CLAIM_KEY, place_ticket_order
+from ecommerce.utils.orders.partitions import ARCHIVE_BOUNDARY_KEY, add_months, archive_order_partitions, \
+    create_order_partitions, get_archive_boundary, get_month, is_partitioned, partition_order_tables
+from ecommerce.utils.orders.placement import PLACE_ORDER_QUERIES, CartChangedError, place_order
+from ecommerce.utils.orders.snapshots import SNAPSHOT_FIELDS, with_snapshot_relations
+from ecommerce.utils.products.cache import PRODUCT_VERSION_KEY
 from ecommerce.utils.tests.mixins import TestAPIOrder
 
 
@@ -100,7 +129,7 @@ class TestOrders(TestAPIOrder):
         self.login_as_user()
 
         response = self.client.get(reverse(self.url_order_list))
-        self.assertEqual(len(response.data), 2, 'User must have 2 orders')
+        self.assertEqual(len(response.data['results']), 2, 'User must have 2 orders')
 
         response = self.client.get(reverse(self.url_order_detail, kwargs={'pk': order_id}), format='json')
         self.assertEqual(response.status_code, 200,
@@ -130,7 +159,7 @@ class TestOrders(TestAPIOrder):
         self.assertEqual(response.status_code, 201, 'Order must be created successfully')
 
         response = self.client.get(reverse(self.url_order_list))
-        self.assertEqual(len(response.data), 3, 'User must have 3 orders')
+        self.assertEqual(len(response.data['results']), 3, 'User must have 3 orders')
 
         response = self.client.get(reverse(self.url_order_detail, kwargs={'pk': order_id}), format='json')
         self.assertEqual(response.status_code, 200,
@@ -165,3 +194,513 @@ class TestOrders(TestAPIOrder):
 
     def test_order_access(self):
         pass
+
+    def get_qty_in_stock(self) -> tuple:
+        self.product_variation_1.refresh_from_db()
+        self.product_variation_2.refresh_from_db()
+        return self.product_variation_1.qty_in_stock, self.product_variation_2.qty_in_stock
+
+    def test_order_stock(self):
+        qty_1, qty_2 = self.get_qty_in_stock()
+
+        response = self.create_guest_order()
+        self.assertEqual(response.status_code, 201, 'Order must be created successfully')
+
+        self.assertEqual(self.get_qty_in_stock(),
+                         (qty_1 - self.product_data_1['quantity'], qty_2 - self.product_data_2['quantity']),
+                         'Ordered products must be taken from stock')
+
+    def test_order_out_of_stock(self):
+        self.log_in_as_guest()
+        self.fill_in_shopping_cart()
+
+        # Product was bought by someone else after it was added to the shopping cart
+        ProductVariation.objects \
+            .filter(pk=self.product_variation_1.pk) \
+            .update(qty_in_stock=self.product_data_1['quantity'] - 1)
+        qty_1, qty_2 = self.get_qty_in_stock()
+
+        response = self.client.post(reverse(self.url_order_guest), self.order_data_guest, format='json')
+        self.assertEqual(response.status_code, 409, 'Order must not be created if products are out of stock')
+        self.assertEqual(response.data['lines'], [{
+            'product_variation': self.product_variation_1.pk,
+            'requested': self.product_data_1['quantity'],
+            'available': self.product_data_1['quantity'] - 1,
+        }], 'Response must contain every line which is out of stock')
+
+        self.assertFalse(Order.objects.exists(), 'Order must be rolled back')
+        self.assertEqual(self.get_qty_in_stock(), (qty_1, qty_2), 'Stock must not be changed')
+
+        response = self.client.get(reverse(self.url_shopping_cart), format='json')
+        self.assertEqual(len(response.data), 2, 'Shopping cart must not be emptied')
+
+    def test_order_cancel(self):
+        qty_1, qty_2 = self.get_qty_in_stock()
+
+        response = self.create_guest_order()
+        order_id = response.data['id']
+
+        response = self.client.post(reverse('orders-cancel', kwargs={'pk': order_id}), format='json')
+        self.assertEqual(response.status_code, 204, 'New order must be cancelled successfully')
+        self.assertEqual(Order.objects.get(pk=order_id).order_status, Order.OrderStatus.CANCELLED.value)
+        self.assertEqual(self.get_qty_in_stock(), (qty_1, qty_2), 'Products must be returned to stock')
+
+        response = self.client.post(reverse('orders-cancel', kwargs={'pk': order_id}), format='json')
+        self.assertEqual(response.status_code, 400, 'Order must not be cancelled twice')
+        self.assertEqual(self.get_qty_in_stock(), (qty_1, qty_2), 'Products must be returned to stock once')
+
+        self.log_in_as_guest()
+        response = self.client.post(reverse('orders-cancel', kwargs={'pk': order_id}), format='json')
+        self.assertEqual(response.status_code, 404, 'Order must not be cancelled by other users')
+
+    def test_order_stock_indexes(self):
+        product_id = self.product_variation_1.product_item.product_id
+        size_facet = ProductFacet.objects.filter(
+            product_id=product_id, facet=ProductFacet.Facet.SIZE.value, value=self.product_variation_1.size_id
+        )
+        version_key = PRODUCT_VERSION_KEY.format(product_id)
+        cache.set(version_key, 'version')
+
+        # Order takes the last items of the size
+        ProductVariation.objects \
+            .filter(product_item__product_id=product_id, size_id=self.product_variation_1.size_id) \
+            .exclude(pk__in=[self.product_variation_1.pk, self.product_variation_2.pk]) \
+            .update(qty_in_stock=0)
+        ProductVariation.objects \
+            .filter(pk=self.product_variation_1.pk) \
+            .update(qty_in_stock=self.product_data_1['quantity'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            order_id = self.create_guest_order().data['id']
+
+        self.assertFalse(size_facet.exists(), 'Sold out size must be removed from facets')
+        self.assertNotEqual(cache.get(version_key), 'version', 'Cached product must be invalidated')
+
+        cache.set(version_key, 'version')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('orders-cancel', kwargs={'pk': order_id}), format='json')
+
+        self.assertTrue(size_facet.exists(), 'Size returned to stock must be added to facets')
+        self.assertNotEqual(cache.get(version_key), 'version', 'Cached product must be invalidated')
+
+    def test_expire_unpaid_orders(self):
+        qty_1, qty_2 = self.get_qty_in_stock()
+
+        old_order_id = self.create_guest_order().data['id']
+        Order.objects \
+            .filter(pk=old_order_id) \
+            .update(date_created=timezone.now() - datetime.timedelta(days=1))
+
+        new_order_id = self.create_guest_order().data['id']
+
+        expire_unpaid_orders_task()
+
+        self.assertEqual(Order.objects.get(pk=old_order_id).order_status, Order.OrderStatus.EXPIRED.value)
+        self.assertEqual(Order.objects.get(pk=new_order_id).order_status, Order.OrderStatus.NEW.value)
+        self.assertEqual(self.get_qty_in_stock(),
+                         (qty_1 - self.product_data_1['quantity'], qty_2 - self.product_data_2['quantity']),
+                         'Only products of expired orders must be returned to stock')
+
+    def test_order_idempotency(self):
+        self.log_in_as_guest()
+        self.fill_in_shopping_cart()
+        url = reverse(self.url_order_guest)
+
+        response = self.client.post(url, self.order_data_guest, format='json', HTTP_IDEMPOTENCY_KEY='order-1')
+        self.assertEqual(response.status_code, 201, 'Order must be created successfully')
+        order_id = response.data['id']
+
+        # Retry of a slow request
+        response = self.client.post(url, self.order_data_guest, format='json', HTTP_IDEMPOTENCY_KEY='order-1')
+        self.assertEqual(response.status_code, 201, 'First response must be replayed')
+        self.assertEqual(response.data['id'], order_id, 'Replayed response must contain the same order')
+        self.assertEqual(Order.objects.count(), 1, 'Order must be created once')
+
+        # Key is bound to the request it was used with
+        data = {**self.order_data_guest, 'email': 'other@other.other'}
+        response = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='order-1')
+        self.assertEqual(response.status_code, 422, 'Key must not be reused for other request')
+
+        # Responses of exceptions raised in the view are replayed too
+        self.fill_in_shopping_cart()
+        data = {**self.order_data_guest, 'email': 'invalid'}
+        response = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='order-3')
+        self.assertEqual(response.status_code, 400, 'Invalid order must not be created')
+        response = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='order-3')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.headers['Idempotent-Replayed'], 'true', 'Error response must be replayed')
+
+        # Concurrent request with the same key
+        user_id = Order.objects.get(pk=order_id).user_id
+        cache.set(IDEMPOTENCY_LOCK_KEY.format(user_id, 'order-2'), 'fingerprint')
+        response = self.client.post(url, self.order_data_guest, format='json', HTTP_IDEMPOTENCY_KEY='order-2')
+        self.assertEqual(response.status_code, 409, 'Request must not be executed while the same one is in progress')
+
+    def get_cart_items(self) -> list[ShoppingCartItem]:
+        self.log_in_as_guest()
+        self.fill_in_shopping_cart()
+
+        # Guest's shopping cart is the only one
+        return list(with_snapshot_relations(ShoppingCartItem.objects.all()))
+
+    def test_place_order_queries(self):
+        cart_items = self.get_cart_items()
+
+        with CaptureQueriesContext(connection) as queries:
+            order = place_order(cart_items, user=self.user, shipping_address=self.address,
+                                shipping_method=self.shipping_method, payment_method=self.payment_method)
+
+        # Savepoints are created only because the test is run in a transaction
+        statements = [query['sql'] for query in queries if 'SAVEPOINT' not in query['sql']]
+        self.assertEqual(len(statements), PLACE_ORDER_QUERIES,
+                         f'Order must be placed with {PLACE_ORDER_QUERIES} statements: {statements}')
+
+        self.assertEqual(order.order_price, self.order_price, 'Order price must be sum of order items prices')
+        self.assertEqual(OrderItem.objects.filter(order=order).count(), 2, 'Order items must be created')
+        self.assertTrue(Payment.objects.filter(order=order).exists(), 'Payment must be created')
+        self.assertFalse(ShoppingCartItem.objects.exists(), 'Shopping cart must be emptied')
+
+    def test_place_order_cart_changed(self):
+        cart_items = self.get_cart_items()
+
+        # Item was ordered by a concurrent request after the shopping cart was fetched
+        ShoppingCartItem.objects.filter(pk=cart_items[0].pk).delete()
+
+        # The view places orders in its own transaction which is rolled back on errors
+        with self.assertRaises(CartChangedError), transaction.atomic():
+            place_order(cart_items, user=self.user, shipping_address=self.address,
+                        shipping_method=self.shipping_method, payment_method=self.payment_method)
+
+        self.assertFalse(Order.objects.exists(), 'Order must be rolled back')
+
+    @override_settings(ORDERS_ASYNC_INTAKE=True)
+    @patch('ecommerce.views.orders.place_order_task.delay')
+    def test_async_order_intake(self, mock_place_order_task):
+        self.log_in_as_guest()
+        self.fill_in_shopping_cart()
+
+        response = self.client.post(reverse(self.url_order_guest), {}, format='json')
+        self.assertEqual(response.status_code, 400, 'Invalid request must be rejected without queueing')
+        mock_place_order_task.assert_not_called()
+
+        response = self.client.post(reverse(self.url_order_guest), self.order_data_guest, format='json',
+                                    HTTP_IDEMPOTENCY_KEY='intake-1')
+        self.assertEqual(response.status_code, 202, 'Order must be accepted')
+        self.assertEqual(response.data['status'], 'queued')
+        ticket_id = response.data['id']
+        mock_place_order_task.assert_called_once_with(ticket_id)
+
+        # Retry gets the ticket with its status url
+        replayed = self.client.post(reverse(self.url_order_guest), self.order_data_guest, format='json',
+                                    HTTP_IDEMPOTENCY_KEY='intake-1')
+        self.assertEqual(replayed.status_code, 202, 'First response must be replayed')
+        self.assertEqual(replayed.headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(replayed.headers['Location'], response.headers['Location'], 'Location must be replayed')
+        self.assertEqual(replayed.headers['Content-Type'], response.headers['Content-Type'])
+        self.assertEqual(replayed.data['id'], ticket_id)
+        mock_place_order_task.assert_called_once_with(ticket_id)
+        self.assertFalse(Order.objects.exists(), 'Order must be placed by the worker')
+
+        url_ticket = reverse('order_ticket', kwargs={'ticket_id': ticket_id})
+        response = self.client.get(url_ticket)
+        self.assertEqual(response.data['status'], 'queued', 'Ticket must be queued until the worker takes it')
+
+        # Ticket claimed by another worker is skipped
+        cache.set(ORDER_TICKET_CLAIM_KEY.format(ticket_id), 1)
+        place_ticket_order(ticket_id)
+        self.assertEqual(self.client.get(url_ticket).data['status'], 'queued',
+                         'Ticket must be processed only by the worker which claimed it')
+        cache.delete(ORDER_TICKET_CLAIM_KEY.format(ticket_id))
+
+        place_ticket_order(ticket_id)
+
+        response = self.client.get(url_ticket)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'placed', 'Order must be placed by the worker')
+        self.assertEqual(response.data['status_code'], 201)
+        self.assertEqual(response.data['response']['order_price'], self.order_price)
+        self.assertTrue(Order.objects.filter(pk=response.data['response']['id']).exists(), 'Order must be created')
+
+        self.log_in_as_guest()
+        response = self.client.get(url_ticket)
+        self.assertEqual(response.status_code, 404, 'Ticket must not be displayed to other users')
+
+    def test_order_item_snapshot(self):
+        order_id = self.create_guest_order().data['id']
+        url = reverse(self.url_order_detail, kwargs={'pk': order_id})
+
+        response = self.client.get(url, format='json')
+        order_items = response.data['order_item']
+
+        # Product is changed after the purchase
+        product = self.product_variation_1.product_item.product
+        Product.objects.filter(pk=product.pk).update(name='renamed product')
+
+        # Authentication, order with payment, order items with reviews
+        with self.assertNumQueries(3):
+            response = self.client.get(url, format='json')
+
+        self.assertEqual(response.data['order_item'], order_items, 'Order must be shown as it was purchased')
+        self.assertEqual(order_items[0]['product_name'], product.name)
+        self.assertEqual(order_items[0]['product_size'], self.product_variation_1.size.name)
+
+        # Order items created before snapshots are filled from the catalog
+        OrderItem.objects.update(**{field: '' for field in SNAPSHOT_FIELDS if field not in ('product_price', 'main_image')},
+                                 product_price=None, main_image=None)
+        call_command('backfill_order_item_snapshots_command', silence=True)
+
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.data['order_item'][0]['product_name'], 'renamed product',
+                         'Snapshot must be filled from the catalog')
+        self.assertEqual(response.data['order_item'][0]['main_image'], order_items[0]['main_image'])
+        self.assertEqual(response.data['order_item'][1]['product_code'], order_items[1]['product_code'])
+
+    def test_order_history(self):
+        self.log_in_as_guest()
+
+        order_ids = []
+        for _ in range(3):
+            self.fill_in_shopping_cart()
+            response = self.client.post(reverse(self.url_order_guest), self.order_data_guest, format='json')
+            self.assertEqual(response.status_code, 201, 'Order must be created successfully')
+            order_ids.append(response.data['id'])
+
+        # Guest sees orders made from the guest account, newest first
+        response = self.client.get(reverse(self.url_order_list), {'page_size': 2})
+        self.assertEqual([order['id'] for order in response.data['results']], order_ids[:0:-1])
+        self.assertEqual(response.data['results'][0]['payment']['payment_bool'], False, 'Payment must be displayed')
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual([order['id'] for order in response.data['results']], order_ids[:1])
+        self.assertIsNone(response.data['next'], 'It must be the last page')
+
+        self.client.post(reverse('orders-cancel', kwargs={'pk': order_ids[1]}))
+        response = self.client.get(reverse(self.url_order_list), {'order_status': Order.OrderStatus.CANCELLED.value})
+        self.assertEqual([order['id'] for order in response.data['results']], order_ids[1:2],
+                         'Orders must be filtered by status')
+
+        yesterday = timezone.localdate() - datetime.timedelta(days=1)
+        response = self.client.get(reverse(self.url_order_list), {'date_created_before': yesterday.isoformat()})
+        self.assertEqual(response.data['results'], [], 'Orders must be filtered by date')
+
+        response = self.client.get(reverse(self.url_order_list), {'date_created_after': yesterday.isoformat()})
+        self.assertEqual(len(response.data['results']), 3, 'Orders must be filtered by date')
+
+    @skipUnless(connection.vendor == 'postgresql', 'Partitioning is supported only on PostgreSQL')
+    def test_order_partitions(self):
+        cache.delete(ARCHIVE_BOUNDARY_KEY)
+        self.log_in_as_guest()
+
+        order_ids = []
+        for _ in range(2):
+            self.fill_in_shopping_cart()
+            response = self.client.post(reverse(self.url_order_guest), self.order_data_guest, format='json')
+            order_ids.append(response.data['id'])
+
+        old_order_id, live_order_id = order_ids
+        old_date = timezone.now() - datetime.timedelta(days=450)
+        Order.objects.filter(pk=old_order_id).update(date_created=old_date)
+
+        def get_referencing_tables() -> set:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT conrelid::regclass::text FROM pg_constraint WHERE contype = 'f' "
+                    "AND confrelid IN (to_regclass(%s), to_regclass(%s))",
+                    [Order._meta.db_table, OrderItem._meta.db_table]
+                )
+                return {table for table, in cursor.fetchall()}
+
+        self.assertEqual(get_referencing_tables(), {'ecommerce_orderitem', 'ecommerce_payment', 'ecommerce_review'},
+                         'Order tables must be referenced with foreign keys before partitioning')
+
+        self.assertTrue(partition_order_tables(ahead=1), 'Monthly partitions must be created')
+        self.assertTrue(is_partitioned())
+        self.assertEqual(partition_order_tables(ahead=1), [], 'Tables must be partitioned once')
+        self.assertEqual(OrderItem.objects.get(order_id=old_order_id, product_variation=self.product_variation_1)
+                         .date_created, old_date, 'Order items must be moved to the month of the order')
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT conrelid::regclass::text, conname FROM pg_constraint WHERE contype = 'f' "
+                "AND conrelid IN (to_regclass(%s), to_regclass(%s))",
+                [Order._meta.db_table, OrderItem._meta.db_table]
+            )
+            foreign_keys = set(cursor.fetchall())
+        self.assertEqual(foreign_keys, {
+            ('ecommerce_order', 'ecommerce_order_user_id_fk'),
+            ('ecommerce_order', 'ecommerce_order_guest_id_fk'),
+            ('ecommerce_order', 'ecommerce_order_shipping_address_id_fk'),
+            ('ecommerce_orderitem', 'ecommerce_orderitem_product_variation_id_fk'),
+        }, 'Foreign keys must be kept')
+        self.assertEqual(get_referencing_tables(), set(), 'Partitioned tables must not be referenced')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            archived = archive_order_partitions(live_months=12)
+
+        self.assertEqual(archived[0], get_month(old_date), 'Month of the old order must be archived')
+        self.assertLess(archived[-1], add_months(get_month(timezone.now()), -12), 'Live months must not be archived')
+        self.assertGreater(get_archive_boundary(), old_date)
+        self.assertFalse(Order.objects.filter(pk=old_order_id).exists(), 'Old order must leave live tables')
+        self.assertTrue(ArchivedOrder.objects.filter(pk=old_order_id).exists())
+
+        # Archived order is found by the same url
+        response = self.client.get(reverse(self.url_order_detail, kwargs={'pk': old_order_id}), format='json')
+        self.assertEqual(response.status_code, 200, 'Archived order must be displayed')
+        self.assertEqual(len(response.data['order_item']), 2)
+        self.assertEqual(response.data['payment']['payment_bool'], False, 'Payment must be displayed')
+        self.assertIsNone(response.data['order_item'][0]['review_url'], 'Archived order items can not be reviewed')
+
+        response = self.client.get(reverse(self.url_order_list))
+        self.assertEqual([order['id'] for order in response.data['results']], [live_order_id])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([order['id'] for order in response.data['results']], [old_order_id],
+                         'Last live page must link to archived order history')
+        self.assertIsNone(response.data['next'])
+
+        response = self.client.get(reverse(self.url_order_list),
+                                   {'date_created_after': timezone.localdate().isoformat()})
+        self.assertIsNone(response.data['next'], 'Archive must not be linked for dates after the boundary')
+
+        response = self.client.get(reverse(self.url_order_list), {'date_created_before': old_date.date().isoformat()})
+        self.assertEqual([order['id'] for order in response.data['results']], [old_order_id],
+                         'Order history of archived months must be read from the archive')
+        self.assertIsNotNone(response.data['results'][0]['payment'])
+
+        # Orders are placed in partitions, ids continue the sequence
+        self.assertTrue(create_order_partitions(ahead=2))
+        new_order_id = self.create_guest_order().data['id']
+        self.assertGreater(new_order_id, live_order_id)
+        self.assertEqual(Order.objects.get(pk=new_order_id).order_item.count(), 2)
+
+    @override_settings(ORDERS_EXPORT_CHUNK_SIZE=1)
+    def test_order_export_asgi(self):
+        self.create_guest_order()
+        self.user.is_staff = True
+        self.user.save()
+
+        # Rows read from the database and body messages sent to the server, in the order they happened
+        events = []
+        read_rows = export.get_export_rows
+
+        def get_export_rows(order_items):
+            for row in read_rows(order_items):
+                events.append('row')
+                yield row
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            events.append(message)
+
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': reverse('orders_export'),
+            'query_string': b'',
+            'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'authorization', f'Bearer {self.jwt_access_token}'.encode())],
+            'server': ('testserver', 80),
+            'client': ('127.0.0.1', 50000),
+        }
+
+        # Sync code is run in the thread of the test, so it sees the test transaction,
+        # and the connection isn't closed by the request signals (same as the test client does)
+        request_started.disconnect(close_old_connections)
+        request_finished.disconnect(close_old_connections)
+        try:
+            with patch('django.core.handlers.asgi.ThreadSensitiveContext', contextlib.nullcontext), \
+                    patch('ecommerce.utils.orders.export.get_export_rows', get_export_rows):
+                async_to_sync(ASGIHandler())(scope, receive, send)
+        finally:
+            request_started.connect(close_old_connections)
+            request_finished.connect(close_old_connections)
+
+        messages = [event for event in events if event != 'row']
+        self.assertEqual(messages[0]['status'], 200)
+        chunks = [message['body'] for message in messages[1:] if message.get('body')]
+        self.assertGreater(len(chunks), 1, 'Export must be sent in chunks')
+        self.assertEqual(len(list(csv.DictReader(io.StringIO(b''.join(chunks).decode())))), 2)
+
+        first_chunk = next(i for i, event in enumerate(events) if event != 'row' and event.get('body'))
+        self.assertIn('row', events[first_chunk:], 'First chunk must be sent before every row is read')
+
+    def test_archived_order_admin(self):
+        self.client.force_login(self.user)
+        self.user.is_staff = True
+        self.user.is_superuser = True
+        self.user.save()
+
+        # Tables aren't partitioned, archive tables don't exist
+        url = reverse('admin:ecommerce_archivedorder_changelist')
+        response = self.client.get(reverse('admin:index'))
+        self.assertNotContains(response, url, msg_prefix='Archive must be hidden until tables are partitioned')
+        self.assertEqual(self.client.get(url).status_code, 403, 'Archive tables must not be queried')
+
+    def test_order_export(self):
+        paid_order_id = self.create_guest_order().data['id']
+        Order.objects.filter(pk=paid_order_id).update(order_status=Order.OrderStatus.PAYED.value)
+        new_order_id = self.create_guest_order().data['id']
+
+        url = reverse('orders_export')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 403, 'Orders must be exported only by staff')
+
+        self.user.is_staff = True
+        self.user.save()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.jwt_access_token)
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming, 'Export must be streamed')
+
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), 4, 'Every order item must be exported')
+        self.assertEqual([int(row['order_id']) for row in rows], [paid_order_id] * 2 + [new_order_id] * 2)
+        self.assertEqual(rows[0]['order_status'], Order.OrderStatus.PAYED.name)
+        self.assertEqual(rows[0]['city'], self.address_dict['city'])
+        self.assertEqual(rows[0]['phone_number'], self.address_dict['phone_number'])
+
+        response = self.client.get(url, {'file_format': 'ndjson', 'order_status': Order.OrderStatus.NEW.value})
+        orders = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([order['order_id'] for order in orders], [new_order_id], 'Orders must be filtered by status')
+        self.assertEqual(len(orders[0]['items']), 2, 'Items must be nested in their order')
+
+        # Text entered by customers must not be evaluated as formulas by spreadsheets
+        Address.objects.update(first_name='=HYPERLINK("http://example.com")', street='-1+1')
+        response = self.client.get(url)
+        row = next(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual((row['first_name'], row['street']), ('\'=HYPERLINK("http://example.com")', "'-1+1"))
+        self.assertEqual(row['phone_number'], self.address_dict['phone_number'], 'Numbers must not be escaped')
+
+        response = self.client.get(url, {'file_format': 'ndjson'})
+        order = json.loads(b''.join(response.streaming_content).decode().splitlines()[0])
+        self.assertEqual(order['first_name'], '=HYPERLINK("http://example.com")', 'Only CSV must be escaped')
+
+        response = self.client.get(url, {'shipping_method': Order.ShippingMethods.DHL.value})
+        self.assertEqual(len(b''.join(response.streaming_content).decode().splitlines()), 1, 'Only header is expected')
+
+        # Served by ASGI, lines are read in chunks of 'ORDERS_EXPORT_CHUNK_SIZE' instead of the whole file
+        async def read_async(response) -> list[bytes]:
+            return [chunk async for chunk in response]
+
+        with override_settings(ORDERS_EXPORT_CHUNK_SIZE=2):
+            chunks = async_to_sync(read_async)(self.client.get(url))
+        self.assertEqual(len(chunks), 3, 'Header and 4 items must be read in 3 chunks')
+        self.assertEqual(b''.join(chunks), b''.join(self.client.get(url).streaming_content))
+
+        response = self.client.get(url, {'file_format': 'xml'})
+        self.assertEqual(response.status_code, 400, 'Format must be validated')
+
+        # Admin action exports selected orders
+        self.client.force_login(self.user)
+        self.user.is_superuser = True
+        self.user.save()
+        response = self.client.post(reverse('admin:ecommerce_order_changelist'),
+                                    {'action': 'export_ndjson', '_selected_action': [paid_order_id]})
+        orders = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([order['order_id'] for order in orders], [paid_order_id])
+
@@ -1,11 +1,37 @@
-from unittest.mock import patch, MagicMock
+import json
+import threading
+import time
+from unittest.mock import patch, AsyncMock, MagicMock
+
+import redis
+import stripe
+from asgiref.sync import async_to_sync
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import F
+from django.test import override_settings
 
 from rest_framework import status
 from rest_framework.reverse import reverse
 
-from ecommerce.models import ProductItem, Payment
+from ecommerce.management.commands import create_stripe_products_prices_command
+from ecommerce.models import Order, ProductItem, ProductVariation, Payment, WebhookEvent
 from ecommerce.utils.tests.mixins import TestAPIOrder
-from ecommerce.views.payments import CreateCheckoutSessionAPIView, StripeWebhookView
+from ecommerce.utils.payments.catalog import call_with_backoff, get_sync_hash, sync_stripe_catalog
+from ecommerce.utils.payments.fake_stripe import FakeStripe, FakeStripeServer, sign_payload
+from ecommerce.utils.payments.notifications import publish_payment_completed, wait_for_payment
+from ecommerce.utils.payments.sessions import cache_checkout_session, delete_checkout_session, get_checkout_session
+from ecommerce.utils.payments.webhooks import WEBHOOK_HANDLERS, WEBHOOKS_LOCK_KEY, process_webhook_events
+from ecommerce.views.payments import CreateCheckoutSessionAPIView
+
+
+def is_redis_available() -> bool:
+    try:
+        return redis.Redis.from_url(settings.PAYMENTS_PUBSUB_URL, socket_connect_timeout=1).ping()
+    except redis.RedisError:
+        return False
 
 
 class TestPayments(TestAPIOrder):
@@ -32,7 +58,8 @@ class TestPayments(TestAPIOrder):
         mock_session = MagicMock()
         mock_session.id = 'cs_test_a11YYufWQzNY63zpQ6QSNRQhkUpVph4WRmzW0zWJO2znZKdVujZ0N0S22u'
         mock_session.url = 'https://checkout.stripe.com/pay/cs_test_12345'
-        mock_session.status = 'completed'
+        mock_session.status = 'open'
+        mock_session.expires_at = int(time.time()) + 60 * 60
 
         # Set the mock to return the session object
         mock_stripe_session_create.return_value = mock_session
@@ -62,13 +89,22 @@ class TestPayments(TestAPIOrder):
                          'You can get checkout session if it is not paid and not expired')
         self.assertEqual(response.data['checkout_session_id'], 'cs_test_a11YYufWQzNY63zpQ6QSNRQhkUpVph4WRmzW0zWJO2znZKdVujZ0N0S22u')
         self.assertEqual(response.data['checkout_session_url'], 'https://checkout.stripe.com/pay/cs_test_12345')
+        self.assertFalse(mock_stripe_session_retrieve.called, 'Created session must be served from the cache')
 
-        # Try to set session if it is expired
+        # Try to set session if it is expired, session which isn't cached is retrieved from Stripe
         mock_session.status = 'expired'
+        delete_checkout_session(mock_session.id)
         response = self.client.get(reverse(self.url_payment_checkout, args=[order_id]))
         self.assertEqual(response.status_code, 400,
                          'You can not get checkout session if it is expired')
-        mock_session.status = 'completed'
+        self.assertEqual(mock_stripe_session_retrieve.call_count, 1)
+
+        # Session cached as open after its expiration is stale
+        cache_checkout_session(mock_session.id, mock_session.url, 'open', int(time.time()) - 1)
+        response = self.client.get(reverse(self.url_payment_checkout, args=[order_id]))
+        self.assertEqual(response.status_code, 400, 'Stale session must be retrieved from Stripe')
+        self.assertEqual(mock_stripe_session_retrieve.call_count, 2)
+        mock_session.status = 'open'
 
         # Try to create a checkout session after checkout_session_id was created and not expired
         response = self.client.post(reverse(self.url_payment_checkout, args=[order_id]))
@@ -106,50 +142,52 @@ class TestPayments(TestAPIOrder):
             'Line items must display price & quantity'
         )
 
-    @patch('stripe.Webhook.construct_event.data.object')
-    @patch('stripe.Webhook.construct_event')
-    def test_success_payment_webhook(self, mock_stripe, mock_obj_session):
+    def post_webhook_event(self, event_id: str, event_type: str, session_id: str, created: int = 1700000000,
+                           order_id: int = None):
+        event = {
+            'id': event_id,
+            'type': event_type,
+            'created': created,
+            'data': {'object': {'id': session_id, 'client_reference_id': str(order_id) if order_id else None}},
+        }
 
-        # Arrange: Create a mock object
-        mock_obj = MagicMock()
-        mock_obj.id = 'cs_test_session'
+        # Signature is verified by Stripe library
+        with patch('stripe.Webhook.construct_event', return_value=event) as mock_construct_event:
+            response = self.client.post(reverse(self.url_stripe_payment), event, format='json')
 
-        # Set the mock to return the object
-        mock_obj_session.return_value = mock_obj
+        self.assertTrue(mock_construct_event.called, 'Signature must be verified')
+        return response
 
-        # Mock the Stripe webhook signature verification
-        mock_stripe.return_value = {
-            'type': 'checkout.session.completed',
-            'data': {
-                'object': mock_obj
-            }
-        }
+    def create_order_with_session(self, session_id: str) -> int:
+        order_id = self.create_guest_order().data['id']
+        Payment.objects.filter(order_id=order_id).update(stripe_session_id=session_id)
 
-        response = self.create_guest_order()
-        order_id = response.data.get('id', None)
+        return order_id
 
-        payment = Payment.objects.get(order_id=order_id)
+    @patch('ecommerce.utils.payments.webhooks.send_order_details_email')
+    def test_success_payment_webhook(self, mock_send_order_details_email):
+        order_id = self.create_order_with_session('cs_test_session')
 
-        payment.stripe_session_id='cs_test_session'
-        payment.save()
+        response = self.post_webhook_event('evt_1', 'checkout.session.completed', 'cs_test_session')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT, 'Event must be accepted')
 
-        payment = Payment.objects.get(order_id=order_id)
-        self.assertEqual(payment.payment_bool, False,
-                         'Before handle_completed_session() was called payment must be unpaid')
-        self.assertEqual(payment.order.order_status, 1,
-                         'After handle_completed_session() was called order status must 1 (NEW)')
+        response = self.post_webhook_event('evt_1', 'checkout.session.completed', 'cs_test_session')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT, 'Redelivered event must be accepted')
+        self.assertEqual(WebhookEvent.objects.count(), 1, 'Redelivered event must be stored once')
 
-        # Make a POST request to the webhook endpoint
-        response = self.client.post(reverse(self.url_stripe_payment))
+        payment = Payment.objects.get(order_id=order_id)
+        self.assertEqual(payment.payment_bool, False, 'Event must be processed asynchronously')
 
-        # Check that the response status code is 204
-        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT, 'Payment must be processed successfully')
+        with patch('ecommerce.utils.payments.webhooks.publish_payment_completed') as mock_publish_payment_completed, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(process_webhook_events(), 1)
+        mock_publish_payment_completed.assert_called_once_with(order_id)
 
         payment = Payment.objects.get(order_id=order_id)
-        self.assertEqual(payment.payment_bool, True,
-                         'After handle_completed_session() was called payment must be paid')
-        self.assertEqual(payment.order.order_status, 2,
-                         'After handle_completed_session() was called order status must 2 (PAID)')
+        self.assertEqual(payment.payment_bool, True, 'After the event is processed payment must be paid')
+        self.assertEqual(payment.order.order_status, 2, 'After the event is processed order status must 2 (PAID)')
+        self.assertEqual(mock_send_order_details_email.delay.call_count, 1, 'Order details must be emailed')
+        self.assertEqual(WebhookEvent.objects.get().status, WebhookEvent.EventStatus.PROCESSED.value)
 
         # Try to create a checkout session after order was paid (payment.payment_bool is True)
         response = self.client.post(reverse(self.url_payment_checkout, args=[order_id]))
@@ -161,29 +199,322 @@ class TestPayments(TestAPIOrder):
         self.assertEqual(response.status_code, 400,
                          "You can not get checkout session if order is paid")
 
-        # Test expired session
-        mock_obj = MagicMock()
-        mock_obj.id = 'cs_test_o2Q2hF23s'
+        # Expired session is cleared, a new one can be created
+        order_id = self.create_order_with_session('cs_test_o2Q2hF23s')
+        response = self.post_webhook_event('evt_2', 'checkout.session.expired', 'cs_test_o2Q2hF23s')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        process_webhook_events()
+        self.assertEqual(Payment.objects.get(order_id=order_id).stripe_session_id, '')
+
+    @patch('ecommerce.utils.payments.webhooks.send_order_details_email')
+    def test_payment_of_cancelled_order(self, mock_send_order_details_email):
+        self.product_variation_1.refresh_from_db()
+        qty_in_stock = self.product_variation_1.qty_in_stock
+        order_id = self.create_order_with_session('cs_test_session')
+        ordered_qty = qty_in_stock - ProductVariation.objects.get(pk=self.product_variation_1.pk).qty_in_stock
+
+        # Order is cancelled after Stripe has completed the session, but before the event is processed
+        with patch('stripe.checkout.Session.expire', side_effect=stripe.error.InvalidRequestError('Completed', None)):
+            response = self.client.post(reverse('orders-cancel', kwargs={'pk': order_id}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(ProductVariation.objects.get(pk=self.product_variation_1.pk).qty_in_stock, qty_in_stock)
+
+        self.post_webhook_event('evt_1', 'checkout.session.completed', 'cs_test_session')
+        process_webhook_events()
+
+        payment = Payment.objects.select_related('order').get(order_id=order_id)
+        self.assertEqual((payment.payment_bool, payment.refund_required), (True, False))
+        self.assertEqual(payment.order.order_status, Order.OrderStatus.PAYED.value, 'Paid order must be restored')
+        self.assertEqual(ProductVariation.objects.get(pk=self.product_variation_1.pk).qty_in_stock,
+                         qty_in_stock - ordered_qty, 'Items of the paid order must be taken from stock again')
+
+        # Items of a cancelled order are sold out meanwhile, the payment must be refunded
+        order_id = self.create_order_with_session('cs_test_session_2')
+        with patch('stripe.checkout.Session.expire'):
+            self.client.post(reverse('orders-cancel', kwargs={'pk': order_id}))
+        ProductVariation.objects.filter(pk=self.product_variation_1.pk).update(qty_in_stock=0)
+
+        self.post_webhook_event('evt_2', 'checkout.session.completed', 'cs_test_session_2')
+        with self.captureOnCommitCallbacks(execute=True):
+            process_webhook_events()
+
+        payment = Payment.objects.select_related('order').get(order_id=order_id)
+        self.assertEqual((payment.payment_bool, payment.refund_required), (True, True))
+        self.assertEqual(payment.order.order_status, Order.OrderStatus.CANCELLED.value)
+        self.assertEqual(ProductVariation.objects.get(pk=self.product_variation_1.pk).qty_in_stock, 0)
+        self.assertFalse(mock_send_order_details_email.delay.called, 'Refunded order must not be confirmed')
+
+    def test_webhook_events_order(self):
+        order_id = self.create_order_with_session('cs_test_session')
+
+        # Events of an order are processed in the order they were created
+        self.post_webhook_event('evt_expired', 'checkout.session.expired', 'cs_test_session', 1700000010, order_id)
+        self.post_webhook_event('evt_completed', 'checkout.session.completed', 'cs_test_session', 1700000000, order_id)
+
+        with patch.dict(WEBHOOK_HANDLERS, {'checkout.session.completed': MagicMock(side_effect=ValueError)}):
+            self.assertEqual(process_webhook_events(), 0, 'Events after the failed one must wait')
+
+        completed = WebhookEvent.objects.get(event_id='evt_completed')
+        self.assertEqual((completed.status, completed.attempts), (WebhookEvent.EventStatus.PENDING.value, 1))
+        self.assertIsNotNone(completed.next_attempt_at, 'Failed event must be retried later')
+        self.assertEqual(WebhookEvent.objects.get(event_id='evt_expired').status, WebhookEvent.EventStatus.PENDING.value)
+
+        self.assertEqual(process_webhook_events(), 0, 'Event must not be retried before its time')
+
+        WebhookEvent.objects.filter(pk=completed.pk).update(next_attempt_at=None)
+        with patch('ecommerce.utils.payments.webhooks.send_order_details_email'):
+            self.assertEqual(process_webhook_events(), 2)
 
-        mock_stripe.return_value = {
-            'type': 'checkout.session.expired',
-            'data': {
-                'object': mock_obj
-            }
-        }
+        payment = Payment.objects.get(order_id=order_id)
+        self.assertEqual((payment.payment_bool, payment.stripe_session_id), (True, ''),
+                         'Session must be completed before it is expired')
 
-        # Create new order
-        response = self.create_guest_order()
-        order_id = response.data.get('id', None)
+        with override_settings(WEBHOOKS_MAX_ATTEMPTS=1):
+            self.post_webhook_event('evt_failed', 'checkout.session.completed', 'cs_other', 1700000020)
+            with patch.dict(WEBHOOK_HANDLERS, {'checkout.session.completed': MagicMock(side_effect=ValueError)}):
+                process_webhook_events()
+
+        self.assertEqual(WebhookEvent.objects.get(event_id='evt_failed').status, WebhookEvent.EventStatus.FAILED.value)
+
+    def test_webhook_events_after_failed(self):
+        order_id = self.create_order_with_session('cs_test_session')
+
+        self.post_webhook_event('evt_completed', 'checkout.session.completed', 'cs_test_session', 1700000000, order_id)
+        with override_settings(WEBHOOKS_MAX_ATTEMPTS=1), \
+                patch.dict(WEBHOOK_HANDLERS, {'checkout.session.completed': MagicMock(side_effect=ValueError)}):
+            self.assertEqual(process_webhook_events(), 0)
+
+        completed = WebhookEvent.objects.get(event_id='evt_completed')
+        self.assertEqual(completed.status, WebhookEvent.EventStatus.FAILED.value)
+
+        # Event of the order delivered after its predecessor has failed
+        self.post_webhook_event('evt_expired', 'checkout.session.expired', 'cs_test_session', 1700000010, order_id)
+        self.assertEqual(process_webhook_events(), 0, 'Events after the failed one must wait')
+        self.assertEqual(WebhookEvent.objects.get(event_id='evt_expired').status, WebhookEvent.EventStatus.PENDING.value)
+        self.assertEqual(Payment.objects.get(order_id=order_id).stripe_session_id, 'cs_test_session')
+
+        # Failed event is retried
+        WebhookEvent.objects \
+            .filter(pk=completed.pk) \
+            .update(status=WebhookEvent.EventStatus.PENDING.value, attempts=0, next_attempt_at=None)
+        with patch('ecommerce.utils.payments.webhooks.send_order_details_email'):
+            self.assertEqual(process_webhook_events(), 2)
 
         payment = Payment.objects.get(order_id=order_id)
+        self.assertEqual((payment.payment_bool, payment.stripe_session_id), (True, ''),
+                         'Session must be completed before it is expired')
 
-        payment.stripe_session_id='cs_test_o2Q2hF23s'
-        payment.save()
+    def test_webhook_events_lock(self):
+        self.post_webhook_event('evt_1', 'checkout.session.expired', 'cs_session_1', 1700000000)
+        self.post_webhook_event('evt_2', 'checkout.session.expired', 'cs_session_2', 1700000010)
 
-        # Make a POST request to the webhook endpoint
-        response = self.client.post(reverse(self.url_stripe_payment))
+        cache.set(WEBHOOKS_LOCK_KEY, 'other-consumer')
+        self.assertEqual(process_webhook_events(), 0, 'Events must not be processed by two consumers')
+
+        # Lock expires while the first batch is processed and is taken by another consumer
+        def take_over_lock(event):
+            cache.set(WEBHOOKS_LOCK_KEY, 'other-consumer')
+            return True
+
+        cache.delete(WEBHOOKS_LOCK_KEY)
+        with patch('ecommerce.utils.payments.webhooks.process_webhook_event', side_effect=take_over_lock) as mock:
+            self.assertEqual(process_webhook_events(batch_size=1), 1, 'Consumer must stop once its lock has expired')
+
+        self.assertEqual(mock.call_count, 1)
+        self.assertEqual(cache.get(WEBHOOKS_LOCK_KEY), 'other-consumer', 'Lock of another consumer must be kept')
+        cache.delete(WEBHOOKS_LOCK_KEY)
+
+    @patch('stripe.checkout.Session.create')
+    def test_create_checkout_session_idempotency(self, mock_stripe_session_create):
+        mock_session = MagicMock()
+        mock_session.id = 'cs_test_12345'
+        mock_session.url = 'https://checkout.stripe.com/pay/cs_test_12345'
+        mock_session.status = 'open'
+        mock_session.expires_at = int(time.time()) + 60 * 60
+        mock_stripe_session_create.return_value = mock_session
 
-        # Try to receive a webhook with expired stripe session
-        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST,
-                         'Can not create a checkout session if stripe session is expired')
+        order_id = self.create_guest_order().data['id']
+        url = reverse(self.url_payment_checkout, args=[order_id])
+
+        response = self.client.post(url, HTTP_IDEMPOTENCY_KEY='checkout-1')
+        self.assertEqual(response.status_code, 201, 'Checkout session must be created')
+
+        # Retry gets the first response instead of '400 Checkout session already exists'
+        response = self.client.post(url, HTTP_IDEMPOTENCY_KEY='checkout-1')
+        self.assertEqual(response.status_code, 201, 'First response must be replayed')
+        self.assertEqual(response.data['checkout_session_id'], 'cs_test_12345')
+        self.assertEqual(response.headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(mock_stripe_session_create.call_count, 1, 'Checkout session must be created once')
+
+    def start_fake_stripe(self) -> FakeStripe:
+        fake_stripe = FakeStripe()
+        server = FakeStripeServer('127.0.0.1', 0, fake_stripe, verbose=False)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        return fake_stripe
+
+    @override_settings(STRIPE_WEBHOOK_SECRET='whsec_test')
+    @patch('ecommerce.utils.payments.webhooks.send_order_details_email')
+    def test_fake_stripe(self, mock_send_order_details_email):
+        fake_stripe = self.start_fake_stripe()
+
+        with patch('stripe.api_base', fake_stripe.base_url), patch('stripe.api_key', 'sk_test_fake'):
+            call_command(create_stripe_products_prices_command.Command(), silence=True)
+            product_item = ProductItem.objects.get(product_variation=self.product_variation_1)
+            self.assertIn(product_item.stripe_price_id, fake_stripe.objects, 'Prices must be created by fake Stripe')
+
+            order_id = self.create_guest_order().data['id']
+            response = self.client.post(reverse(self.url_payment_checkout, args=[order_id]))
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+            session_id = response.data['checkout_session_id']
+            session = fake_stripe.objects[session_id]
+            self.assertEqual(session['client_reference_id'], str(order_id))
+
+            response = self.client.get(reverse(self.url_payment_checkout, args=[order_id]))
+            self.assertEqual(response.data['checkout_session_url'], session['url'])
+
+            # Injected errors are raised by the Stripe library
+            fake_stripe.error_rate = 1
+            with self.assertRaises(stripe.error.APIError):
+                stripe.checkout.Session.retrieve(session_id)
+            fake_stripe.error_rate = 0
+
+        # Event is signed like Stripe does, the webhook verifies the signature
+        event = fake_stripe.finish_session()
+        self.assertEqual(event['type'], 'checkout.session.completed')
+        self.assertIsNone(fake_stripe.finish_session(), 'Finished session is not open')
+
+        payload = json.dumps(event)
+        response = self.client.post(reverse(self.url_stripe_payment), payload, content_type='application/json',
+                                    HTTP_STRIPE_SIGNATURE=sign_payload(payload, 'wrong_secret'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(reverse(self.url_stripe_payment), payload, content_type='application/json',
+                                    HTTP_STRIPE_SIGNATURE=sign_payload(payload, 'whsec_test'))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            process_webhook_events()
+        self.assertTrue(Payment.objects.get(order_id=order_id).payment_bool)
+        self.assertEqual(get_checkout_session(session_id)['status'], 'complete',
+                         'Cached session must be updated by the event')
+
+    @override_settings(STRIPE_SYNC_MAX_RETRIES=0)
+    def test_stripe_catalog_sync(self):
+        fake_stripe = self.start_fake_stripe()
+        product_items = ProductItem.objects.all()
+
+        with patch('stripe.api_base', fake_stripe.base_url), patch('stripe.api_key', 'sk_test_fake'):
+            stats = sync_stripe_catalog(batch_size=2, workers=2)
+            self.assertEqual((stats['synced'], stats['failed']), (product_items.count(), 0))
+            self.assertFalse(product_items.filter(stripe_sync_hash='').exists(), 'Every item must be synced')
+
+            # Unchanged items aren't pushed
+            requests = fake_stripe.stats['requests']
+            stats = sync_stripe_catalog()
+            self.assertEqual((stats['synced'], stats['unchanged']), (0, product_items.count()))
+            self.assertEqual(fake_stripe.stats['requests'], requests, 'Stripe must not be called')
+
+            # Changed price is pushed as a new price, the superseded one is archived
+            product_item = ProductItem.objects.select_related('product').get(product_variation=self.product_variation_1)
+            old_price_id = product_item.stripe_price_id
+            product_item.price += 100
+            product_item.save()
+            product_item.product.name = 'New name'
+            product_item.product.save()
+
+            stats = sync_stripe_catalog()
+            product_item.refresh_from_db()
+            self.assertEqual(stats['synced'], product_items.filter(product=product_item.product).count())
+            self.assertNotEqual(product_item.stripe_price_id, old_price_id)
+            self.assertEqual(fake_stripe.objects[product_item.stripe_price_id]['unit_amount'], product_item.price)
+            self.assertFalse(fake_stripe.objects[old_price_id]['active'], 'Superseded price must be archived')
+            self.assertEqual(fake_stripe.objects[product_item.stripe_product_id]['name'], 'New name')
+
+            # Items with a price created before sync hashes keep it
+            price_id = product_item.stripe_price_id
+            ProductItem.objects.filter(pk=product_item.pk).update(stripe_sync_hash='')
+            sync_stripe_catalog()
+            product_item.refresh_from_db()
+            self.assertEqual(product_item.stripe_price_id, price_id)
+            self.assertEqual(product_item.stripe_sync_hash, get_sync_hash(product_item))
+
+            # Failed items stay changed and are pushed by the next sync
+            ProductItem.objects.filter(pk=product_item.pk).update(price=F('price') + 100)
+            fake_stripe.error_rate = 1
+            self.assertEqual(sync_stripe_catalog()['failed'], 1)
+            fake_stripe.error_rate = 0
+            self.assertEqual(sync_stripe_catalog()['synced'], 1)
+
+    @override_settings(STRIPE_SYNC_MAX_RETRIES=2)
+    @patch('ecommerce.utils.payments.catalog.time.sleep')
+    def test_stripe_call_backoff(self, mock_sleep):
+        rate_limit_error = stripe.error.RateLimitError('Too many requests', http_status=429,
+                                                      headers={'Retry-After': '3'})
+        method = MagicMock(side_effect=[rate_limit_error, stripe.error.APIConnectionError('Timeout'), 'price'])
+
+        self.assertEqual(call_with_backoff(method, unit_amount=100), 'price')
+        self.assertEqual(method.call_count, 3)
+        self.assertGreaterEqual(mock_sleep.call_args_list[0].args[0], 3, 'Retry-After must be respected')
+
+        method = MagicMock(side_effect=stripe.error.InvalidRequestError('No such price', 'price'))
+        with self.assertRaises(stripe.error.InvalidRequestError):
+            call_with_backoff(method)
+        self.assertEqual(method.call_count, 1, 'Invalid requests must not be retried')
+
+        method = MagicMock(side_effect=rate_limit_error)
+        with self.assertRaises(stripe.error.RateLimitError):
+            call_with_backoff(method)
+        self.assertEqual(method.call_count, 3)
+
+    def test_payment_status(self):
+        order_id = self.create_guest_order().data['id']
+        url = reverse('payment_status', args=[order_id])
+
+        # Without Redis the order is checked when the request times out
+        response = self.client.get(url, {'timeout': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {'order_id': order_id, 'paid': False})
+
+        with patch('ecommerce.views.payments.wait_for_payment', AsyncMock(return_value=True)) as mock_wait:
+            response = self.client.get(url, {'timeout': 5})
+            self.assertEqual(response.json()['paid'], True, 'Request must be answered when the payment is published')
+            mock_wait.assert_awaited_once_with(order_id, 5)
+
+            # Paid and cancelled orders are answered without waiting
+            Payment.objects.filter(order_id=order_id).update(payment_bool=True)
+            self.assertEqual(self.client.get(url).json()['paid'], True)
+            Payment.objects.filter(order_id=order_id).update(payment_bool=False)
+            Order.objects.filter(pk=order_id).update(order_status=Order.OrderStatus.CANCELLED.value)
+            self.assertEqual(self.client.get(url).json()['paid'], False)
+            self.assertEqual(mock_wait.await_count, 1)
+
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+        # Orders of other users aren't found
+        self.log_in_as_guest()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+        self.client.credentials()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_payment_notification(self):
+        # Checked when the test is run, not when the module is imported
+        if not is_redis_available():
+            self.skipTest('Redis is not available')
+
+        order_id = self.create_guest_order().data['id']
+
+        # Payment is published while the request waits
+        timer = threading.Timer(0.5, publish_payment_completed, args=[order_id])
+        timer.start()
+        started = time.monotonic()
+        self.assertTrue(async_to_sync(wait_for_payment)(order_id, 10))
+        self.assertLess(time.monotonic() - started, 5, 'Waiting must end when the payment is published')
+        timer.join()
+
+        self.assertFalse(async_to_sync(wait_for_payment)(order_id, 1), 'Unpaid order must time out')
@@ -0,0 +1,387 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.reverse import reverse
+
+from ecommerce.models import Product, ProductCategory, ProductItem, ProductVariation, Discount
+from ecommerce.serializers.products import ProductSerializer
+from ecommerce.serializers.products_flat import ProductFlatSerializer
+from ecommerce.utils.products.cache import PRODUCT_DETAIL_KEY, get_validators
+from ecommerce.utils.products.facets import GENDER_VALUES
+from ecommerce.utils.products.indexes import refresh_product_prices
+from ecommerce.utils.shopping_carts.holds import STOCK_HOLD_KEY
+from ecommerce.utils.tests.mixins import TestAPIEcommerce
+from ecommerce.views.products import ProductViewSet
+
+
+class TestProducts(TestAPIEcommerce):
+
+    def setUp(self):
+        self.products = self.create_products()
+        self.url_product_list = 'products-list'
+        self.url_product_detail = 'products-detail'
+
+    def walk_pages(self, url) -> list:
+        """
+        Follows 'next' links starting from 'url'.
+
+        :return: list of pages (every page is a list of products)
+        """
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, 'Product list must be displayed')
+            pages.append(response.data['results'])
+            url = response.data['next']
+
+        return pages
+
+    def test_product_list_pagination(self):
+        # Force equal 'date_created' to check that rows with the same timestamp are not lost
+        Product.objects.update(date_created=Product.objects.first().date_created)
+        expected_ids = list(Product.objects.filter(is_active=True).values_list('id', flat=True))
+
+        pages = self.walk_pages(reverse(self.url_product_list) + '?page_size=3')
+
+        self.assertEqual([len(page) for page in pages], [3, 3, 1],
+                         'Products must be split into pages of the requested size')
+
+        ids = [product['id'] for page in pages for product in page]
+        self.assertEqual(ids, expected_ids,
+                         'Every product must be displayed once in (date_created, id) order')
+
+    def test_product_list_previous_page(self):
+        response = self.client.get(reverse(self.url_product_list) + '?page_size=3')
+        first_page = [product['id'] for product in response.data['results']]
+        self.assertIsNone(response.data['previous'], 'First page must not have previous page')
+
+        response = self.client.get(response.data['next'])
+        self.assertIsNotNone(response.data['previous'], 'Second page must have previous page')
+
+        response = self.client.get(response.data['previous'])
+        self.assertEqual([product['id'] for product in response.data['results']], first_page,
+                         'Previous link must return the first page')
+
+    def test_product_list_stable_under_inserts(self):
+        url = reverse(self.url_product_list) + '?page_size=3'
+        response = self.client.get(url)
+        first_page = [product['id'] for product in response.data['results']]
+
+        # A new product appears while the client is walking through the catalog
+        product = Product.objects.first()
+        product.pk = None
+        product.slug = 'new-product'
+        product.save()
+
+        pages = self.walk_pages(response.data['next'])
+        ids = first_page + [product['id'] for page in pages for product in page]
+
+        self.assertEqual(len(ids), len(set(ids)), 'Products must not be repeated between pages')
+        self.assertNotIn(product.pk, ids, 'New product must not shift already opened pages')
+
+    def test_product_list_invalid_cursor(self):
+        response = self.client.get(reverse(self.url_product_list) + '?cursor=invalid')
+        self.assertEqual(response.status_code, 404, 'Invalid cursor must return 404')
+
+    def test_product_list_filters(self):
+        url = reverse(self.url_product_list)
+
+        # Parent category must include products of subcategories
+        shoes = ProductCategory.objects.get(slug='shoes')
+        response = self.client.get(url, {'category': shoes.pk})
+        self.assertEqual(response.status_code, 200, 'Filtered product list must be displayed')
+        self.assertEqual({product['category'] for product in response.data['results']},
+                         {'sneakers', 'flip_flops'},
+                         'Parent category filter must select products of subcategories')
+
+        response = self.client.get(url, {'gender': GENDER_VALUES['M']})
+        self.assertTrue(response.data['results'], 'Gender filter must select products')
+        self.assertTrue(all(product['gender'] == 'M' for product in response.data['results']),
+                        'Gender filter must select only products of the gender')
+
+        product_item = ProductItem.objects.select_related('product').first()
+        price = product_item.get_discount_price()
+        response = self.client.get(url, {'price_min': price, 'price_max': price})
+        self.assertIn(product_item.product.pk, [product['id'] for product in response.data['results']],
+                      'Price filter must select products with the price')
+
+        product_variation = ProductVariation.objects.select_related('product_item').first()
+        response = self.client.get(url, {'size': product_variation.size_id})
+        self.assertIn(product_variation.product_item.product_id,
+                      [product['id'] for product in response.data['results']],
+                      'Size filter must select products with the size in stock')
+
+        # Other product item of the product could have the same size
+        same_size_variations = ProductVariation.objects.filter(
+            product_item__product_id=product_variation.product_item.product_id,
+            size_id=product_variation.size_id,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            for obj in same_size_variations:
+                obj.qty_in_stock = 0
+                obj.save()
+        response = self.client.get(url, {'size': product_variation.size_id})
+        self.assertNotIn(product_variation.product_item.product_id,
+                         [product['id'] for product in response.data['results']],
+                         'Size filter must not select products with the size out of stock')
+
+    def test_product_list_facets(self):
+        url = reverse(self.url_product_list)
+        products_count = Product.objects.filter(is_active=True).count()
+
+        response = self.client.get(url)
+        facets = response.data['facets']
+
+        self.assertEqual(list(facets.keys()),
+                         ['gender', 'category', 'brand', 'color', 'size', 'attribute_option', 'price'],
+                         'Facets must be counted for every filter')
+        self.assertEqual(sum(x['count'] for x in facets['gender']), products_count,
+                         'Every product must be counted in gender facet')
+
+        self.assertEqual(sum(x['count'] for x in facets['brand']), products_count,
+                         'Every product must be counted in brand facet')
+
+        # Counts of an active filter are calculated without the filter itself
+        brand = facets['brand'][0]
+        response = self.client.get(url, {'brand': brand['value']})
+        self.assertEqual(len(response.data['results']), brand['count'],
+                         'Brand filter must select as many products as brand facet shows')
+        self.assertEqual(response.data['facets']['brand'], facets['brand'],
+                         'Brand facet must not depend on brand filter')
+        self.assertEqual(sum(x['count'] for x in response.data['facets']['gender']), brand['count'],
+                         'Gender facet must count only products of the selected brand')
+
+        # Values of facets are values of their filters
+        gender = next(x for x in facets['gender'] if x['count'])
+        response = self.client.get(url, {'gender': gender['value']})
+        self.assertEqual(len(response.data['results']), gender['count'],
+                         'Gender filter must take values of gender facet')
+
+    def test_product_list_query_count(self):
+        url = reverse(self.url_product_list)
+        brand = Product.objects.first().brand_id
+
+        # Page and prefetches (9), facets of inactive filters (1), facets of every active filter (2)
+        with self.assertNumQueries(12):
+            self.client.get(url, {'brand': brand, 'gender': '1,2'})
+
+    def test_product_list_cache(self):
+        url = reverse(self.url_product_list)
+        params = {'page_size': 3, 'gender': '1,2'}
+
+        response = self.client.get(url, params)
+        with self.assertNumQueries(0):
+            cached_response = self.client.get(url, {'gender': '1,2', 'page_size': 3})
+
+        self.assertEqual(cached_response.status_code, 200, 'Cached product list must be displayed')
+        self.assertEqual(cached_response.json(), response.json(), 'Cached product list must not differ')
+
+        # Any change of the catalog makes cached pages outdated
+        product = Product.objects.get(pk=response.data['results'][0]['id'])
+        product.name = 'renamed product'
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+
+        response = self.client.get(url, params)
+        self.assertEqual(response.data['results'][0]['name'], 'renamed product',
+                         'Product list must be invalidated when a product is changed')
+
+    def test_product_detail_cache(self):
+        product = Product.objects.filter(is_active=True).first()
+        other_product = Product.objects.filter(is_active=True).last()
+        url = reverse(self.url_product_detail, kwargs={'slug': product.slug})
+
+        response = self.client.get(url)
+        with self.assertNumQueries(0):
+            cached_response = self.client.get(url)
+        self.assertEqual(cached_response.json(), response.json(), 'Cached product detail must not differ')
+
+        # Changes of other products don't touch cached detail
+        with self.captureOnCommitCallbacks(execute=True):
+            other_product.save()
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+        # Product items aren't ordered, so the item is found by its id
+        def get_images(response) -> list:
+            return next(x for x in response.json()['product_items'] if x['id'] == product_item.pk)['images']
+
+        product_item = product.product_item.filter(is_active=True).first()
+        images_count = len(get_images(cached_response))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_image(product_item)
+
+        response = self.client.get(url)
+        self.assertEqual(len(get_images(response)), images_count + 1,
+                         'Product detail must be invalidated when an image is added')
+
+    def test_product_list_conditional_get(self):
+        url = reverse(self.url_product_list)
+
+        response = self.client.get(url, {'page_size': 3})
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {'page_size': 3}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304, 'Matching ETag must return 304')
+
+        response = self.client.get(url, {'page_size': 3}, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304, 'Unmodified catalog must return 304')
+
+        response = self.client.get(url, {'page_size': 4}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200, 'ETag must depend on query params')
+
+        response = self.client.get(url, {'page_size': 4}, HTTP_IF_NONE_MATCH=etag, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200, 'If-Modified-Since must be ignored with If-None-Match')
+
+        # Version created within a second is not older than 'Last-Modified'
+        self.assertEqual(get_validators('1700000000000000001.abcdef12')[1], 1700000001)
+        self.assertEqual(get_validators('1700000000000000000.abcdef12')[1], 1700000000)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.first().save()
+        response = self.client.get(url, {'page_size': 3}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200, 'Changed catalog must be displayed')
+        self.assertNotEqual(response['ETag'], etag, 'ETag must change with the catalog')
+
+    def test_product_detail_conditional_get(self):
+        product = Product.objects.filter(is_active=True).first()
+        url = reverse(self.url_product_detail, kwargs={'slug': product.slug})
+
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304, 'Matching ETag must return 304')
+
+        # Without cached content only product id is selected, prefetches are skipped
+        cache.delete(PRODUCT_DETAIL_KEY.format(product.slug))
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304, 'Matching ETag must return 304 without cached content')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200, 'Changed product must be displayed')
+
+    def test_product_cache_stock_holds(self):
+        product = Product.objects.filter(is_active=True, product_item__product_variation__qty_in_stock__gt=1).first()
+        url_detail = reverse(self.url_product_detail, kwargs={'slug': product.slug})
+        url_list = reverse(self.url_product_list)
+
+        def get_stock(product_data) -> dict:
+            return {variation['id']: variation['qty_in_stock']
+                    for product_item in product_data['product_items']
+                    for variation in product_item['product_variations']}
+
+        def get_list_stock(response) -> dict:
+            product_data = next(x for x in response.json()['results'] if x['id'] == product.pk)
+            return get_stock(product_data)
+
+        detail_response = self.client.get(url_detail)
+        stock = get_stock(detail_response.json())
+        list_response = self.client.get(url_list, {'page_size': 100})
+        self.assertEqual(get_list_stock(list_response), stock)
+
+        # Holds are changed by shopping carts without changing product versions
+        variation_id, qty = next((pk, qty) for pk, qty in stock.items() if qty > 1)
+        cache.set(STOCK_HOLD_KEY.format(variation_id), 1)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url_detail, HTTP_IF_NONE_MATCH=detail_response['ETag'])
+        self.assertEqual(response.status_code, 200, 'Cached product detail must be validated with holds')
+        self.assertEqual(get_stock(response.json()), {**stock, variation_id: qty - 1},
+                         'Cached product detail must show stock without holds')
+        self.assertNotIn('Last-Modified', response)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url_detail, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304,
+                             'Matching ETag of held response must return 304')
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url_list, {'page_size': 100})
+        self.assertEqual(get_list_stock(response), {**stock, variation_id: qty - 1},
+                         'Cached product list must show stock without holds')
+
+        # Responses rendered with holds are cached without them
+        cache.delete(PRODUCT_DETAIL_KEY.format(product.slug))
+        response = self.client.get(url_detail, HTTP_IF_NONE_MATCH=detail_response['ETag'])
+        self.assertEqual(response.status_code, 200, 'ETag without holds must not match held product')
+        self.assertEqual(get_stock(response.json())[variation_id], qty - 1)
+
+        cache.delete(STOCK_HOLD_KEY.format(variation_id))
+        response = self.client.get(url_detail)
+        self.assertEqual(get_stock(response.json()), stock, 'Released hold must be returned to stock')
+        self.assertEqual(response['ETag'], detail_response['ETag'])
+
+    def test_flat_serializer_parity(self):
+        # Cover every kind of value: ratings, discounts, images and missing ratings
+        product_item = ProductItem.objects.first()
+        product_item.discount.set([self.create_discount(discount_rate=15)])
+        self.create_image(product_item)
+        Product.objects.filter(pk=product_item.product_id).update(rating_sum=9, rating_count=2, rating_count_4=1,
+                                                                   rating_count_5=1)
+
+        products = list(ProductViewSet().get_queryset())
+        renderer = JSONRenderer()
+        # Quantity held in shopping carts is subtracted from stock
+        context = {'stock_holds': {product_item.product_variation.first().pk: 1}}
+
+        self.assertEqual(renderer.render(ProductFlatSerializer(products, many=True, context=context).data),
+                         renderer.render(ProductSerializer(products, many=True, context=context).data),
+                         'Flat serializer must render the same JSON as ProductSerializer')
+
+    def test_product_search(self):
+        url = reverse('products-search')
+
+        response = self.client.get(url, {'q': 'sneakers'})
+        self.assertEqual(response.status_code, 200, 'Search results must be displayed')
+        self.assertEqual([product['name'] for product in response.data['results']], ['running sneakers'],
+                         'Search must find products by name and category')
+
+        # Products are found by parent categories
+        response = self.client.get(url, {'q': 'shoes'})
+        self.assertEqual({product['name'] for product in response.data['results']},
+                         {'running sneakers', 'beach flip flops'},
+                         'Search must find products by parent category')
+
+        # Match in name is ranked higher than match in attribute options
+        response = self.client.get(url, {'q': 'summer'})
+        self.assertEqual(response.data['results'][0]['name'], 'summer hat',
+                         'Products matched by name must be ranked first')
+
+        # Search results are paginated
+        response = self.client.get(url, {'q': 'shoes', 'page_size': 1})
+        first = response.data['results'][0]['id']
+        response = self.client.get(response.data['next'])
+        self.assertNotEqual(response.data['results'][0]['id'], first, 'Search results must be paginated')
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 400, 'Search query is required')
+
+    def test_product_item_discount_window(self):
+        product_item = ProductItem.objects.first()
+        today = timezone.localdate()
+
+        discount = self.create_discount(discount_rate=30)
+        Discount.objects.filter(pk=discount.pk).update(start_date=today - timedelta(days=10),
+                                                       end_date=today - timedelta(days=1))
+        product_item.discount.set([discount])
+
+        product_item.refresh_from_db()
+        self.assertEqual(product_item.get_discount_price(), product_item.price,
+                         'Expired discount must not be applied')
+
+        # Window opens without signals, daily job must find and update the price
+        Discount.objects.filter(pk=discount.pk).update(end_date=today)
+        self.assertEqual(refresh_product_prices(), 1, 'Product with opened discount must be reindexed')
+
+        product_item.refresh_from_db()
+        self.assertEqual(product_item.discount_rate, 30, 'Active discount rate must be stored')
+        self.assertEqual(product_item.get_discount_price(), product_item.price * 70 // 100,
+                         'Active discount must be applied to the stored price')
+        self.assertEqual(refresh_product_prices(), 0, 'Up to date prices must not be reindexed')
@@ -0,0 +1,61 @@
+import io
+from datetime import date, datetime, time
+from decimal import Decimal
+from uuid import uuid4
+
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+
+from phonenumber_field.phonenumber import PhoneNumber
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from ecommerce.utils.renderers.parsers import FastJSONParser
+from ecommerce.utils.renderers.renderers import CompactJSONRenderer, FastJSONRenderer
+
+
+class TestRenderers(APITestCase):
+
+    def setUp(self):
+        self.data = {
+            'id': 1,
+            'name': 'футболка   "quoted"',
+            'price': Decimal('10.50'),
+            'rating': 4.5,
+            'date': date(2024, 1, 31),
+            'time': time(10, 30, 15, 123456),
+            'created': timezone.make_aware(datetime(2024, 1, 31, 10, 30, 15, 123456), timezone.utc),
+            'local': timezone.make_aware(datetime(2024, 1, 31, 10, 30)),
+            'uuid': uuid4(),
+            'lazy': gettext_lazy('lazy'),
+            'histogram': {5: 1, 4: 0},
+            'items': [{'id': 1, 'is_active': True, 'discount': None}],
+        }
+
+    def test_renderers_parity(self):
+        expected = JSONRenderer().render(self.data)
+
+        for renderer_class in (CompactJSONRenderer, FastJSONRenderer):
+            self.assertEqual(renderer_class().render(self.data), expected,
+                             f'{renderer_class.__name__} must render the same JSON as JSONRenderer')
+
+        self.assertEqual(FastJSONRenderer().render(self.data, 'application/json; indent=4'),
+                         JSONRenderer().render(self.data, 'application/json; indent=4'),
+                         'Indented JSON must be rendered the same way')
+        self.assertEqual(FastJSONRenderer().render(None), b'', 'Empty data must be rendered as empty body')
+
+    def test_renderers_phone_number(self):
+        data = {'phone': PhoneNumber.from_string('+380501234567')}
+
+        for renderer_class in (CompactJSONRenderer, FastJSONRenderer):
+            self.assertEqual(renderer_class().render(data), b'{"phone":"+380501234567"}',
+                             f'{renderer_class.__name__} must render phone numbers as strings')
+
+    def test_parser(self):
+        data = FastJSONParser().parse(io.BytesIO('{"name": "футболка", "qty": [1, 2.5, null]}'.encode()))
+        self.assertEqual(data, {'name': 'футболка', 'qty': [1, 2.5, None]}, 'JSON must be parsed')
+
+        for body in (b'{"name": ', b'{"price": NaN}'):
+            with self.assertRaises(ParseError, msg=f'Invalid JSON {body} must raise ParseError'):
+                FastJSONParser().parse(io.BytesIO(body))
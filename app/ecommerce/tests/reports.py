@@ -0,0 +1,79 @@
+import datetime
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from rest_framework.reverse import reverse
+
+from ecommerce.models import DailyProductSales, DailySales, Order, OrderItem, RollupWatermark
+from ecommerce.utils.reports.rollups import SALES_ROLLUP, rollup_sales
+from ecommerce.utils.tests.mixins import TestAPIOrder
+
+
+class TestSalesReports(TestAPIOrder):
+
+    def create_order_on(self, date: datetime.date, order_status: Order.OrderStatus) -> Order:
+        order = Order.objects.get(pk=self.create_guest_order().data['id'])
+        date_created = timezone.make_aware(datetime.datetime.combine(date, datetime.time(12)))
+
+        Order.objects.filter(pk=order.pk).update(date_created=date_created, order_status=order_status.value)
+        OrderItem.objects.filter(order=order).update(date_created=date_created)
+
+        return order
+
+    def test_rollup_sales(self):
+        yesterday = timezone.localdate() - datetime.timedelta(days=1)
+        day_before = yesterday - datetime.timedelta(days=1)
+
+        paid_order = self.create_order_on(day_before, Order.OrderStatus.PAYED)
+        new_order = self.create_order_on(day_before, Order.OrderStatus.NEW)
+        self.create_order_on(yesterday, Order.OrderStatus.DONE)
+        self.create_guest_order()  # today's orders aren't rolled up
+
+        self.assertEqual(rollup_sales(), [day_before, yesterday], 'Days from the first order must be rolled up')
+        self.assertEqual(RollupWatermark.objects.get(name=SALES_ROLLUP).date, yesterday)
+
+        units = self.product_data_1['quantity'] + self.product_data_2['quantity']
+        paid_sales = DailySales.objects.get(date=day_before, order_status=Order.OrderStatus.PAYED.value)
+        self.assertEqual((paid_sales.order_count, paid_sales.units_sold, paid_sales.revenue),
+                         (1, units, paid_order.order_price))
+        self.assertEqual(DailySales.objects.get(date=day_before, order_status=Order.OrderStatus.NEW.value).order_count, 1)
+        self.assertEqual(DailyProductSales.objects.filter(date=day_before).count(), 2,
+                         'Only products of paid orders must be rolled up')
+
+        # The order is paid after it was rolled up, the last days are rolled up again
+        Order.objects.filter(pk=new_order.pk).update(order_status=Order.OrderStatus.PAYED.value)
+        self.assertEqual(rollup_sales(lookback_days=2), [day_before, yesterday])
+        self.assertEqual(DailySales.objects.get(date=day_before, order_status=Order.OrderStatus.PAYED.value).order_count, 2)
+        self.assertFalse(DailySales.objects.filter(date=day_before, order_status=Order.OrderStatus.NEW.value).exists())
+        self.assertEqual(rollup_sales(lookback_days=0), [], 'Days after the watermark must be rolled up only once')
+
+        call_command('rollup_sales_command', rebuild=True, silence=True)
+        self.assertEqual(DailySales.objects.filter(date=day_before).count(), 1, 'Rollup must be rebuilt')
+
+        url = reverse('sales_report')
+        response = self.client.get(url, {'date_after': day_before.isoformat()})
+        self.assertEqual(response.status_code, 403, 'Report must be available only for staff')
+
+        self.user.is_staff = True
+        self.user.save()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.get_jwt_access_token())
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'date_after': day_before.isoformat()})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries if 'ecommerce_order' in query['sql']],
+                         'Report must be read only from rollups')
+        self.assertEqual(response.data['order_count'], 3)
+        self.assertEqual(response.data['units_sold'], 3 * units)
+        self.assertEqual(response.data['days'][0]['orders_per_status'], {Order.OrderStatus.PAYED.name: 2})
+        self.assertEqual(len(response.data['top_products']), 2)
+        self.assertEqual(sum(product['revenue'] for product in response.data['top_products']), response.data['revenue'])
+        self.assertEqual(sum(category['revenue'] for category in response.data['categories']), response.data['revenue'])
+        self.assertEqual(sum(brand['units_sold'] for brand in response.data['brands']), response.data['units_sold'])
+
+        response = self.client.get(url, {'date_after': yesterday.isoformat(), 'date_before': day_before.isoformat()})
+        self.assertEqual(response.status_code, 400, 'Date range must be validated')
@@ -1,8 +1,10 @@
 import uuid
 
+from django.core.management import call_command
+
 from rest_framework.reverse import reverse
 
-from ecommerce.models import UserProfile, Payment
+from ecommerce.models import UserProfile, Payment, Product
 from ecommerce.utils.tests.mixins import TestAPIOrder
 
 
@@ -193,3 +195,54 @@ class TestReviews(TestAPIOrder):
 
         response = self.client.delete(review_url_detail_1)
         self.assertEqual(response.status_code, 404, 'User cant delete review for other user')
+
+    def test_product_rating(self):
+        response = self.create_guest_order()
+        self.assertEqual(response.status_code, 201, 'Order must be created successfully')
+        order_id = response.data.get('id', None)
+
+        Payment.objects.filter(order_id=order_id).update(payment_bool=True)
+
+        response = self.client.get(reverse(self.url_order_detail, kwargs={'pk': order_id}))
+        review_url = response.data['order_item'][0]['review_url']
+        product = Product.objects.get(product_item__product_variation=self.product_variation_1)
+
+        # Create review
+        response = self.client.post(review_url, data={'comment': 'good', 'rating': 5})
+        self.assertEqual(response.status_code, 201, 'Review must be created successfully')
+        review_id = response.data.get('id', None)
+
+        product.refresh_from_db()
+        self.assertEqual((product.rating_sum, product.rating_count, product.get_rating()), (5, 1, 5.0),
+                         'Product rating must be updated after review was created')
+        self.assertEqual(product.get_rating_histogram(), {1: 0, 2: 0, 3: 0, 4: 0, 5: 1},
+                         'Product rating histogram must be updated after review was created')
+
+        response = self.client.get(reverse('products-detail', kwargs={'slug': product.slug}))
+        self.assertEqual(response.data['product_rating'], 5.0, 'Product rating must be displayed')
+
+        # Update review
+        response = self.client.patch(review_url + f'{review_id}/', data={'comment': 'bad', 'rating': 2})
+        self.assertEqual(response.status_code, 200, 'Review must be updated successfully')
+
+        product.refresh_from_db()
+        self.assertEqual((product.rating_sum, product.rating_count), (2, 1),
+                         'Product rating must be updated after review was updated')
+        self.assertEqual(product.get_rating_histogram(), {1: 0, 2: 1, 3: 0, 4: 0, 5: 0},
+                         'Product rating histogram must be updated after review was updated')
+
+        # Rebuilt aggregates must match incremental ones
+        Product.objects.filter(pk=product.pk).update(rating_sum=0, rating_count=0, rating_count_2=0)
+        call_command('rebuild_product_ratings_command', silence=True)
+
+        product.refresh_from_db()
+        self.assertEqual((product.rating_sum, product.rating_count, product.rating_count_2), (2, 1, 1),
+                         'Product rating must be rebuilt from reviews')
+
+        # Delete review
+        response = self.client.delete(review_url + f'{review_id}/')
+        self.assertEqual(response.status_code, 204, 'Review must be deleted successfully')
+
+        product.refresh_from_db()
+        self.assertEqual((product.rating_sum, product.rating_count, product.get_rating()), (0, 0, None),
+                         'Product rating must be updated after review was deleted')
@@ -1,6 +1,13 @@
+import datetime
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.utils import timezone
+
 from rest_framework.reverse import reverse
 
-from ecommerce.models import ProductVariation
+from ecommerce.models import ProductVariation, ShoppingCartItem
+from ecommerce.utils.shopping_carts.holds import STOCK_HOLD_KEY, get_stock_holds, reconcile_stock_holds
 from ecommerce.utils.tests.mixins import TestAPIEcommerce
 
 
@@ -184,6 +191,75 @@ class TestShoppingCartItem(TestAPIEcommerce):
                          f"'item_price' must be {(product_price * data['quantity'])}"
                          f" but it is {response.data['item_price']}")
 
-        self.assertEqual(response.data['item_discount_price'], int((product_price * 0.7)) * data['quantity'],
-                         f"'discount_price' must be {int((product_price * 0.7)) * data['quantity']}"
+        self.assertEqual(response.data['item_discount_price'], (product_price * 70 // 100) * data['quantity'],
+                         f"'discount_price' must be {(product_price * 70 // 100) * data['quantity']}"
                          f"but it is {response.data['item_discount_price']}")
+
+    def test_stock_holds(self):
+        """
+        Quantity in shopping cart is held for other users until
+        the item is deleted or its hold expires
+        """
+        product_variation = ProductVariation.objects.filter(qty_in_stock__gt=0).first()
+        data = {
+            'product_variation': product_variation.pk,
+            'quantity': product_variation.qty_in_stock
+        }
+
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.jwt_access_token)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse(self.url_name), data, format='json')
+        self.assertEqual(response.status_code, 201, 'Item must be added to shopping cart')
+        self.assertEqual(get_stock_holds([product_variation.pk]), {product_variation.pk: data['quantity']},
+                         'Quantity in shopping cart must be held')
+
+        # Product which is held in other shopping cart can't be added
+        self.create_user('user@user.user')
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.get_jwt_access_token('user@user.user'))
+        response = self.client.post(reverse(self.url_name), data, format='json')
+        self.assertEqual(response.status_code, 400, 'Held product must not be added to other shopping cart')
+
+        # Owner of the hold can change quantity within held quantity
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.jwt_access_token)
+        item = ShoppingCartItem.objects.get(product_variation=product_variation)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(reverse(self.url_name_detail, kwargs={'pk': item.pk}), data, format='json')
+        self.assertEqual(response.data['quantity'], data['quantity'], 'Held quantity must stay in shopping cart')
+        self.assertEqual(get_stock_holds([product_variation.pk]), {product_variation.pk: data['quantity']},
+                         'Quantity must be held once')
+
+        self.assertEqual(reconcile_stock_holds(), 1)
+        self.assertEqual(get_stock_holds([product_variation.pk]), {product_variation.pk: data['quantity']},
+                         'Active hold must be kept')
+
+        # Hold changed while the shopping cart items are summed isn't overwritten
+        key = STOCK_HOLD_KEY.format(product_variation.pk)
+        get_many = cache.get_many
+
+        def get_counters(keys):
+            counters = get_many(keys)
+            cache.incr(key, 1)
+            return counters
+
+        with patch.object(cache, 'get_many', side_effect=get_counters):
+            reconcile_stock_holds()
+        self.assertEqual(get_stock_holds([product_variation.pk]), {product_variation.pk: data['quantity'] + 1},
+                         'Concurrent change of the hold must be kept')
+        cache.decr(key, 1)
+
+        # Expired holds are released by reconciliation
+        ShoppingCartItem.objects.filter(pk=item.pk).update(updated_at=timezone.now() - datetime.timedelta(days=1))
+        self.assertEqual(reconcile_stock_holds(), 0)
+        self.assertEqual(get_stock_holds([product_variation.pk]), {product_variation.pk: 0},
+                         'Expired hold must be released')
+
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.get_jwt_access_token('user@user.user'))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse(self.url_name), data, format='json')
+        self.assertEqual(response.status_code, 201, 'Product with expired hold must be added to shopping cart')
+
+        # Hold is released when the item is deleted
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(reverse(self.url_name_detail, kwargs={'pk': response.data['id']}))
+        self.assertEqual(response.status_code, 204, 'Item must be deleted')
+        self.assertEqual(get_stock_holds([product_variation.pk]), {product_variation.pk: 0}, 'Hold must be released')
@@ -5,7 +5,8 @@ from rest_framework.routers import SimpleRouter
 from rest_framework_simplejwt.views import TokenObtainPairView
 
 from .views import *
-from .views.payments import CreateCheckoutSessionAPIView, StripeWebhookView
+from .views.payments import CreateCheckoutSessionAPIView, StripeWebhookView, payment_status_view
+from .views.reports import SalesReportAPIView
 from .views.reviews import ReviewViewSet
 from .views.shopping_carts import ShoppingCartItemViewSet
 
@@ -13,6 +14,7 @@ router = SimpleRouter()
 router.register(r'users', UserProfileViewSet, basename='users')
 router.register(r'addresses', UserAddressViewSet, basename='addresses')
 router.register(r'products', ProductViewSet, basename='products')
+router.register(r'categories', ProductCategoryViewSet, basename='categories')
 router.register(r'shopping_cart_items', ShoppingCartItemViewSet, basename='shopping_cart_items')
 router.register(r'orders', OrderViewSet, basename='orders')
 
@@ -39,12 +41,17 @@ urlpatterns = [
 
     path('api/v1/create-order/user/', OrderUserCreateAPIView.as_view(), name='create_order_user'),
     path('api/v1/create-order/guest/', OrderGuestCreateAPIView.as_view(), name='create_order_guest'),
+    path('api/v1/create-order/tickets/<str:ticket_id>/', OrderTicketAPIView.as_view(), name='order_ticket'),
+    path('api/v1/orders-export/', OrderExportAPIView.as_view(), name='orders_export'),
     #
     path('api/v1/payment/<int:order_id>/checkout/', CreateCheckoutSessionAPIView.as_view(), name='payment_checkout'),
+    path('api/v1/payment/<int:order_id>/status/', payment_status_view, name='payment_status'),
     # path('api/v1/payment/<int:?>/successful/', '#', name='payment_successful'),
     # path('api/v1/payment/<int:?>/cancelled/', '#', name='payment_cancelled'),
     path('api/v1/stripe_webhook/', StripeWebhookView.as_view(), name='stripe_webhook'),
 
+    path('api/v1/reports/sales/', SalesReportAPIView.as_view(), name='sales_report'),
+
     path('api/v1/'
          'orders/<int:order_id>/'
          'order_items/<int:order_item_id>/'
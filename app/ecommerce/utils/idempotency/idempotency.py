@@ -0,0 +1,152 @@
+import datetime
+import functools
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.response import Response
+
+from ecommerce.models.idempotency import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_RESPONSE_KEY = 'idempotency:response:{}:{}'
+IDEMPOTENCY_LOCK_KEY = 'idempotency:lock:{}:{}'
+# Headers set by views which are replayed with the stored response, 'Content-Type' is stored when it's set by the view
+IDEMPOTENCY_REPLAYED_HEADERS = ('Location', )
+
+
+def get_fingerprint(request) -> str:
+    """
+    Returns digest of method, path and body of the request.
+    """
+    body = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder)
+
+    return hashlib.sha256(f'{request.method}:{request.path}:{body}'.encode()).hexdigest()
+
+
+def get_stored_response(user_id: int, key: str) -> dict | None:
+    """
+    Returns stored response {'fingerprint', 'status_code', 'response', 'headers'} from the cache
+    or from the database if it isn't older than 'IDEMPOTENCY_KEY_TIMEOUT'.
+    """
+    stored = cache.get(IDEMPOTENCY_RESPONSE_KEY.format(user_id, key))
+    if stored is not None:
+        return stored
+
+    threshold_time = timezone.now() - datetime.timedelta(seconds=settings.IDEMPOTENCY_KEY_TIMEOUT)
+
+    return IdempotencyKey.objects \
+        .filter(user_id=user_id, key=key, created_at__gte=threshold_time) \
+        .values('fingerprint', 'status_code', 'response', 'headers') \
+        .first()
+
+
+def store_response(user_id: int, key: str, fingerprint: str, response) -> None:
+    """
+    Stores the response in the database and in the cache.
+    Response data is stored as it is rendered to JSON, with headers from 'IDEMPOTENCY_REPLAYED_HEADERS'.
+    """
+    headers = {name: response[name] for name in IDEMPOTENCY_REPLAYED_HEADERS if response.has_header(name)}
+    # Response isn't rendered yet, its 'Content-Type' header is the default one
+    if response.content_type:
+        headers['Content-Type'] = response.content_type
+
+    stored = {
+        'fingerprint': fingerprint,
+        'status_code': response.status_code,
+        'response': json.loads(json.dumps(response.data, cls=DjangoJSONEncoder)),
+        'headers': headers,
+    }
+
+    IdempotencyKey.objects.filter(user_id=user_id, key=key).delete()  # outdated key
+    try:
+        IdempotencyKey.objects.create(user_id=user_id, key=key, **stored)
+    except IntegrityError:
+        pass  # stored by a request which waited longer than the lock
+
+    cache.set(IDEMPOTENCY_RESPONSE_KEY.format(user_id, key), stored, timeout=settings.IDEMPOTENCY_KEY_TIMEOUT)
+
+
+def get_replayed_response(stored: dict, fingerprint: str) -> Response:
+    if stored['fingerprint'] != fingerprint:
+        return Response(f'{IDEMPOTENCY_HEADER} was already used with another request',
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    headers = stored.get('headers', {}).copy()
+    # Content type is set on rendering, which would override the header
+    content_type = headers.pop('Content-Type', None)
+
+    return Response(stored['response'], status=stored['status_code'], content_type=content_type,
+                    headers={**headers, 'Idempotent-Replayed': 'true'})
+
+
+def idempotent(view_method):
+    """
+    Makes a view method idempotent for requests with 'Idempotency-Key' header.
+
+    The first response (except server errors) is stored for 'IDEMPOTENCY_KEY_TIMEOUT' seconds
+    and replayed for requests with the same key, responses of exceptions handled by the view
+    (e.g. 'ValidationError', 'Http404') are stored too. While the first request is executed,
+    requests with the same key get '409 Conflict'. Keys are scoped to the user.
+    Requests without the header are executed as usual.
+    """
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+
+        if len(key) > 255:
+            return Response(f'{IDEMPOTENCY_HEADER} must not be longer than 255 characters',
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        user_id = request.user.pk
+        fingerprint = get_fingerprint(request)
+
+        stored = get_stored_response(user_id, key)
+        if stored is not None:
+            return get_replayed_response(stored, fingerprint)
+
+        lock_key = IDEMPOTENCY_LOCK_KEY.format(user_id, key)
+        if not cache.add(lock_key, fingerprint, timeout=settings.IDEMPOTENCY_LOCK_TIMEOUT):
+            return Response(f'Request with the same {IDEMPOTENCY_HEADER} is in progress',
+                            status=status.HTTP_409_CONFLICT)
+
+        try:
+            # Response could be stored between the first check and the lock
+            stored = get_stored_response(user_id, key)
+            if stored is not None:
+                return get_replayed_response(stored, fingerprint)
+
+            try:
+                response = view_method(self, request, *args, **kwargs)
+            except Exception as exc:
+                # Unhandled exceptions are raised again
+                response = self.handle_exception(exc)
+
+            # Server errors are not stored, request can be retried with the same key
+            if response.status_code < 500:
+                store_response(user_id, key, fingerprint, response)
+        finally:
+            cache.delete(lock_key)
+
+        return response
+
+    return wrapper
+
+
+def delete_old_idempotency_keys() -> int:
+    """
+    :return: amount of deleted keys
+    """
+    threshold_time = timezone.now() - datetime.timedelta(seconds=settings.IDEMPOTENCY_KEY_TIMEOUT)
+    count, _ = IdempotencyKey.objects.filter(created_at__lt=threshold_time).delete()
+
+    return count
@@ -0,0 +1,168 @@
+import csv
+import itertools
+import json
+import re
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from ecommerce.models.orders import Order
+
+# Column -> lookup from 'OrderItem'
+ORDER_COLUMNS = {
+    'order_id': 'order_id',
+    'date_created': 'order__date_created',
+    'order_status': 'order__order_status',
+    'payment_method': 'order__payment_method',
+    'shipping_method': 'order__shipping_method',
+    'order_price': 'order__order_price',
+    'paid': 'order__payment__payment_bool',
+    'email': 'order__user__email',
+    'first_name': 'order__shipping_address__first_name',
+    'last_name': 'order__shipping_address__last_name',
+    'street': 'order__shipping_address__street',
+    'unit_number': 'order__shipping_address__unit_number',
+    'city': 'order__shipping_address__city',
+    'post_code': 'order__shipping_address__post_code',
+    'region': 'order__shipping_address__region',
+    'country': 'order__shipping_address__country',
+    'phone_number': 'order__shipping_address__phone_number',
+}
+ITEM_COLUMNS = {
+    'item_id': 'id',
+    'product_code': 'product_code',
+    'product_name': 'product_name',
+    'product_size': 'product_size',
+    'quantity': 'quantity',
+    'price': 'price',
+}
+
+# Choice fields are exported by names
+CHOICE_NAMES = {
+    'order_status': Order.OrderStatus,
+    'payment_method': Order.OrderMethods,
+    'shipping_method': Order.ShippingMethods,
+}
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+
+# Spreadsheets evaluate cells starting with these characters as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+# Signed numbers, e.g. phone numbers in E.164 format, are evaluated as numbers
+NUMBER_RE = re.compile(r'[+-]?\d+(\.\d+)?')
+
+
+class Echo:
+    """ File-like object which returns written value, 'csv.writer' formats rows without a buffer. """
+
+    def write(self, value):
+        return value
+
+
+def get_export_rows(order_items):
+    """
+    Yields order items joined with orders, payments and shipping addresses as flat dicts,
+    items of an order are consecutive. Rows are fetched with a server-side cursor
+    in chunks of 'ORDERS_EXPORT_CHUNK_SIZE', so memory doesn't depend on the amount of orders.
+
+    :param order_items: 'OrderItem' queryset
+    """
+    columns = {**ORDER_COLUMNS, **ITEM_COLUMNS}
+    rows = order_items \
+        .order_by('order__date_created', 'order_id', 'id') \
+        .values_list(*columns.values()) \
+        .iterator(chunk_size=settings.ORDERS_EXPORT_CHUNK_SIZE)
+
+    for values in rows:
+        row = dict(zip(columns, values))
+
+        for column, choices in CHOICE_NAMES.items():
+            row[column] = choices(row[column]).name
+        row['phone_number'] = str(row['phone_number'])
+
+        yield row
+
+
+def escape_cell(value):
+    """
+    Prefixes text which would be evaluated as a formula by spreadsheets with a quote,
+    e.g. a name '=HYPERLINK(...)' entered by a customer. Numbers are kept as they are.
+    """
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES) and not NUMBER_RE.fullmatch(value):
+        return f"'{value}"
+
+    return value
+
+
+def stream_csv(order_items):
+    """
+    Yields a header and a CSV line for every order item, text cells are escaped ('escape_cell').
+    """
+    writer = csv.writer(Echo())
+
+    yield writer.writerow([*ORDER_COLUMNS, *ITEM_COLUMNS])
+
+    for row in get_export_rows(order_items):
+        yield writer.writerow([escape_cell(value) for value in row.values()])
+
+
+def stream_ndjson(order_items):
+    """
+    Yields a JSON line for every order with its items. Only items of one order are kept in memory.
+    """
+    order = None
+
+    for row in get_export_rows(order_items):
+        if order is None or order['order_id'] != row['order_id']:
+            if order is not None:
+                yield json.dumps(order, cls=DjangoJSONEncoder) + '\n'
+            order = {column: row[column] for column in ORDER_COLUMNS}
+            order['items'] = []
+
+        order['items'].append({column: row[column] for column in ITEM_COLUMNS})
+
+    if order is not None:
+        yield json.dumps(order, cls=DjangoJSONEncoder) + '\n'
+
+
+def read_chunk(lines, size: int) -> bytes:
+    return b''.join(itertools.islice(lines, size))
+
+
+class ExportResponse(StreamingHttpResponse):
+    """
+    Streams lines of a sync generator under WSGI and ASGI.
+
+    Under ASGI Django consumes sync iterators into a list before sending anything,
+    here lines are read through 'sync_to_async' in chunks of 'ORDERS_EXPORT_CHUNK_SIZE' lines,
+    so memory doesn't depend on the amount of orders with either server. Chunks are read
+    in the thread of the view, so the server-side cursor stays on its connection.
+    """
+
+    async def __aiter__(self):
+        lines = iter(self.streaming_content)
+        read = sync_to_async(read_chunk, thread_sensitive=True)
+
+        while chunk := await read(lines, settings.ORDERS_EXPORT_CHUNK_SIZE):
+            yield chunk
+
+
+def get_export_response(order_items, file_format: str) -> ExportResponse:
+    """
+    Returns a response which streams order items as a CSV or NDJSON attachment.
+    Archived orders (see 'utils.orders.partitions') aren't exported.
+    """
+    if file_format == 'ndjson':
+        response = ExportResponse(stream_ndjson(order_items), content_type='application/x-ndjson')
+    else:
+        response = ExportResponse(stream_csv(order_items), content_type='text/csv')
+
+    filename = f'orders-{timezone.localtime():%Y%m%d-%H%M%S}.{file_format}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+
+    return response
@@ -0,0 +1,119 @@
+import enum
+from urllib.parse import urljoin
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+from ecommerce.models.users import UserProfile
+
+ORDER_TICKET_KEY = 'orders:ticket:{}'
+ORDER_TICKET_CLAIM_KEY = 'orders:ticket:{}:claim'
+
+
+class TicketStatus(enum.Enum):
+    QUEUED = 'queued'
+    PROCESSING = 'processing'
+    PLACED = 'placed'
+    FAILED = 'failed'
+
+
+class IntakeRequest:
+    """
+    Part of DRF request used by order create views and their serializers
+    ('user', 'data' and absolute urls). Worker rebuilds it from the ticket
+    to place the order with the view which accepted it.
+    """
+
+    def __init__(self, user, data, base_uri: str):
+        self.user = user
+        self.data = data
+        self.base_uri = base_uri
+
+    def build_absolute_uri(self, location: str = None) -> str:
+        return urljoin(self.base_uri, location or '')
+
+
+def get_view_path(view) -> str:
+    return f'{type(view).__module__}.{type(view).__qualname__}'
+
+
+def create_ticket(view, request) -> str:
+    """
+    Stores the request accepted by the order create view for 'ORDERS_TICKET_TIMEOUT' seconds.
+
+    :return: ticket id
+    """
+    ticket_id = uuid4().hex
+    ticket = {
+        'id': ticket_id,
+        'user_id': request.user.pk,
+        'view': get_view_path(view),
+        'data': request.data,
+        'base_uri': request.build_absolute_uri('/'),
+        'status': TicketStatus.QUEUED.value,
+        'status_code': None,
+        'response': None,
+    }
+    cache.set(ORDER_TICKET_KEY.format(ticket_id), ticket, timeout=settings.ORDERS_TICKET_TIMEOUT)
+
+    return ticket_id
+
+
+def get_ticket(ticket_id: str) -> dict | None:
+    return cache.get(ORDER_TICKET_KEY.format(ticket_id))
+
+
+def update_ticket(ticket: dict, **fields) -> None:
+    ticket.update(fields)
+    cache.set(ORDER_TICKET_KEY.format(ticket['id']), ticket, timeout=settings.ORDERS_TICKET_TIMEOUT)
+
+
+def get_ticket_representation(ticket: dict) -> dict:
+    """
+    Returns ticket without the request it was created from.
+    'response' is the response of the synchronous order create view ('status_code' is its status).
+    """
+    return {key: ticket[key] for key in ('id', 'status', 'status_code', 'response')}
+
+
+def place_ticket_order(ticket_id: str) -> None:
+    """
+    Places the order of the ticket with the view which accepted it.
+    Expired and already processed tickets are skipped.
+
+    Ticket is claimed with 'cache.add' before it's processed, so a redelivered task
+    which reads the ticket as queued at the same time doesn't place the order twice.
+    """
+    ticket = get_ticket(ticket_id)
+    if ticket is None or ticket['status'] != TicketStatus.QUEUED.value:
+        return None
+
+    if not cache.add(ORDER_TICKET_CLAIM_KEY.format(ticket_id), 1, timeout=settings.ORDERS_TICKET_TIMEOUT):
+        return None
+
+    update_ticket(ticket, status=TicketStatus.PROCESSING.value)
+
+    user = UserProfile.objects.get(pk=ticket['user_id'])
+    request = IntakeRequest(user, ticket['data'], ticket['base_uri'])
+    view = import_string(ticket['view'])(request=request, format_kwarg=None, args=(), kwargs={})
+
+    try:
+        response = view.create_order()
+    except APIException as e:
+        # Validation errors are raised by the view, they are reported as the view would respond
+        response = Response(e.detail, status=e.status_code)
+    except Exception:
+        update_ticket(ticket, status=TicketStatus.FAILED.value, status_code=500)
+        raise
+
+    update_ticket(
+        ticket,
+        status=TicketStatus.PLACED.value if response.status_code == 201 else TicketStatus.FAILED.value,
+        status_code=response.status_code,
+        response=response.data,
+    )
@@ -0,0 +1,308 @@
+"""
+Monthly range partitioning of order tables by 'date_created' (PostgreSQL only).
+
+After 'partition_order_tables' the order and order item tables are partitioned parents
+with one partition per month, e.g. 'ecommerce_order_y2024m05'. Queries filtered by 'date_created'
+read only the partitions of the requested months (partition pruning), and vacuum and index maintenance
+are done per partition.
+
+Partitions of old months are detached from the live tables and attached to the archive tables
+('ecommerce_order_archive', 'ecommerce_orderitem_archive') by 'archive_order_partitions'.
+Archived orders are read with 'ArchivedOrder' and 'ArchivedOrderItem' models.
+"""
+import datetime
+import re
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ecommerce.models.orders import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+ARCHIVE_BOUNDARY_KEY = 'orders:archive:boundary'
+
+# Live table -> archive table
+PARTITIONED_TABLES = {
+    Order._meta.db_table: ArchivedOrder._meta.db_table,
+    OrderItem._meta.db_table: ArchivedOrderItem._meta.db_table,
+}
+
+PARTITION_NAME_RE = re.compile(r'_y(\d{4})m(\d{2})$')
+
+
+def get_month(dt: datetime.datetime) -> datetime.date:
+    """ Returns the first day of the month of the date in UTC, partitions are bounded by UTC months. """
+    if isinstance(dt, datetime.datetime):
+        dt = dt.astimezone(datetime.timezone.utc)
+
+    return datetime.date(dt.year, dt.month, 1)
+
+
+def add_months(month: datetime.date, months: int) -> datetime.date:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def get_month_start(month: datetime.date) -> datetime.datetime:
+    return datetime.datetime(month.year, month.month, 1, tzinfo=datetime.timezone.utc)
+
+
+def get_partition_name(table: str, month: datetime.date) -> str:
+    return f'{table}_y{month.year}m{month.month:02d}'
+
+
+def is_partitioned() -> bool:
+    """
+    Returns True if order tables are partitioned ('partition_order_tables' was run).
+    """
+    if connection.vendor != 'postgresql':
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)',
+            [Order._meta.db_table]
+        )
+        return cursor.fetchone() is not None
+
+
+def get_partition_months(cursor, table: str) -> list[datetime.date]:
+    """
+    Returns months of partitions attached to the table, oldest first.
+    """
+    cursor.execute(
+        'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+        'WHERE i.inhparent = to_regclass(%s)',
+        [table]
+    )
+
+    months = []
+    for name, in cursor.fetchall():
+        match = PARTITION_NAME_RE.search(name)
+        if match:
+            months.append(datetime.date(int(match[1]), int(match[2]), 1))
+
+    return sorted(months)
+
+
+def get_index_definitions(cursor, table: str) -> list[tuple[str, str]]:
+    """
+    Returns names and definitions of indexes of the table except the primary key.
+    """
+    cursor.execute(
+        'SELECT c.relname, pg_get_indexdef(i.indexrelid) FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid '
+        'WHERE i.indrelid = to_regclass(%s) AND NOT i.indisprimary',
+        [table]
+    )
+    return cursor.fetchall()
+
+
+def drop_referencing_foreign_keys(cursor) -> list[tuple[str, str]]:
+    """
+    Drops foreign keys which reference order tables (order items, payments and reviews of orders).
+    A partitioned table can't be referenced by 'id' alone, so after partitioning
+    these relations are kept only by Django (cascades are done by Django too).
+
+    :return: tables and names of dropped constraints
+    """
+    cursor.execute(
+        "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+        "WHERE contype = 'f' AND confrelid = ANY(ARRAY[to_regclass(%s), to_regclass(%s)]::oid[])",
+        list(PARTITIONED_TABLES)
+    )
+    constraints = cursor.fetchall()
+
+    for table, name in constraints:
+        cursor.execute(f'ALTER TABLE {table} DROP CONSTRAINT "{name}"')
+
+    return constraints
+
+
+def add_foreign_keys(cursor, model) -> None:
+    """
+    Adds foreign keys of the model to its table, 'LIKE ... INCLUDING CONSTRAINTS'
+    copies only check and not-null constraints. Keys without 'db_constraint'
+    and keys which reference partitioned tables are skipped.
+    """
+    table = model._meta.db_table
+
+    for field in model._meta.concrete_fields:
+        if field.many_to_one and field.db_constraint and field.related_model._meta.db_table not in PARTITIONED_TABLES:
+            target = field.target_field
+            cursor.execute(
+                f'ALTER TABLE {table} ADD CONSTRAINT {table}_{field.column}_fk FOREIGN KEY ({field.column}) '
+                f'REFERENCES {target.model._meta.db_table} ({target.column}) DEFERRABLE INITIALLY DEFERRED'
+            )
+
+
+def create_partition(cursor, table: str, month: datetime.date) -> str:
+    name = get_partition_name(table, month)
+    cursor.execute(
+        f'CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)',
+        [get_month_start(month), get_month_start(add_months(month, 1))]
+    )
+    return name
+
+
+def create_order_partitions(ahead: int) -> list[str]:
+    """
+    Creates missing partitions of live order tables from the current month to 'ahead' months later.
+    An order can't be inserted without a partition of its month, so it's run daily (see 'ORDERS_PARTITIONS_AHEAD').
+
+    :return: names of partitions (created or existing)
+    """
+    if not is_partitioned():
+        return []
+
+    current_month = get_month(datetime.datetime.now(datetime.timezone.utc))
+    names = []
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        for table in PARTITIONED_TABLES:
+            for months in range(ahead + 1):
+                names.append(create_partition(cursor, table, add_months(current_month, months)))
+
+    return names
+
+
+def partition_order_tables(ahead: int) -> list[str]:
+    """
+    Converts order and order item tables to partitioned tables and creates empty archive tables.
+
+    Foreign keys which reference order tables are dropped first ('drop_referencing_foreign_keys').
+    Each table is renamed, the partitioned table is created with the same columns and constraints
+    (foreign keys are added once rows are copied), rows are copied to monthly partitions and the old table is dropped. Primary keys include 'date_created',
+    'id' keeps its sequence. Order items are moved to the month of their order.
+
+    Tables are locked while rows are copied, so it's run during maintenance.
+
+    :return: names of created partitions
+    """
+    if connection.vendor != 'postgresql':
+        raise NotImplementedError('Partitioning is supported only on PostgreSQL')
+
+    if is_partitioned():
+        return []
+
+    order_table = Order._meta.db_table
+    item_table = OrderItem._meta.db_table
+    current_month = get_month(datetime.datetime.now(datetime.timezone.utc))
+    names = []
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Deferred foreign key checks of rows inserted in this transaction would block 'ALTER TABLE'
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        drop_referencing_foreign_keys(cursor)
+
+        cursor.execute(
+            f'UPDATE {item_table} i SET date_created = o.date_created FROM {order_table} o '
+            f'WHERE o.id = i.order_id AND i.date_created <> o.date_created'
+        )
+
+        cursor.execute(f'SELECT MIN(date_created) FROM {order_table}')
+        first_created = cursor.fetchone()[0]
+        first_month = get_month(first_created) if first_created else current_month
+
+        for model in (Order, OrderItem):
+            table = model._meta.db_table
+            archive_table = PARTITIONED_TABLES[table]
+            indexes = get_index_definitions(cursor, table)
+            legacy_table = f'{table}_legacy'
+
+            cursor.execute(f'ALTER TABLE {table} RENAME TO {legacy_table}')
+            cursor.execute(
+                f'CREATE TABLE {table} (LIKE {legacy_table} INCLUDING CONSTRAINTS) PARTITION BY RANGE (date_created)'
+            )
+
+            month = first_month
+            while month <= add_months(current_month, ahead):
+                names.append(create_partition(cursor, table, month))
+                month = add_months(month, 1)
+
+            cursor.execute(f'INSERT INTO {table} SELECT * FROM {legacy_table}')
+            cursor.execute(f'SELECT COALESCE(MAX(id), 0) + 1 FROM {legacy_table}')
+            next_id = cursor.fetchone()[0]
+
+            # Identity sequence, primary key and indexes of the old table are dropped with it
+            cursor.execute(f'DROP TABLE {legacy_table}')
+            cursor.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id, date_created)')
+            cursor.execute(f'CREATE SEQUENCE {table}_id_seq OWNED BY {table}.id START WITH {next_id}')
+            cursor.execute(f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval('{table}_id_seq')")
+            add_foreign_keys(cursor, model)
+
+            cursor.execute(
+                f'CREATE TABLE {archive_table} (LIKE {table} INCLUDING CONSTRAINTS) PARTITION BY RANGE (date_created)'
+            )
+            cursor.execute(f'ALTER TABLE {archive_table} ADD PRIMARY KEY (id, date_created)')
+
+            for name, definition in indexes:
+                cursor.execute(definition)
+                archive_definition = re.sub(rf'\b{table}\b', archive_table, definition)
+                cursor.execute(archive_definition.replace(f'INDEX {name} ', f'INDEX {name}_archive ', 1))
+
+    return names
+
+
+def archive_order_partitions(live_months: int) -> list[datetime.date]:
+    """
+    Moves partitions older than 'live_months' months (besides the current one)
+    from live order tables to archive tables. Only the catalog is changed, rows aren't copied.
+
+    :return: archived months
+    """
+    if not is_partitioned():
+        return []
+
+    cutoff = add_months(get_month(datetime.datetime.now(datetime.timezone.utc)), -live_months)
+    archived = []
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        months = [month for month in get_partition_months(cursor, Order._meta.db_table) if month < cutoff]
+
+        for month in months:
+            for table, archive_table in PARTITIONED_TABLES.items():
+                name = get_partition_name(table, month)
+                cursor.execute(f'ALTER TABLE {table} DETACH PARTITION {name}')
+                cursor.execute(
+                    f'ALTER TABLE {archive_table} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)',
+                    [get_month_start(month), get_month_start(add_months(month, 1))]
+                )
+            archived.append(month)
+
+        if archived:
+            transaction.on_commit(lambda: cache.delete(ARCHIVE_BOUNDARY_KEY))
+
+    return archived
+
+
+def get_archive_boundary() -> datetime.datetime | None:
+    """
+    Returns the time before which orders are in the archive tier (the end of the last archived month),
+    None if nothing is archived. Cached until partitions are archived again.
+    """
+    if connection.vendor != 'postgresql':
+        return None
+
+    boundary = cache.get(ARCHIVE_BOUNDARY_KEY)
+    if boundary is None:
+        with connection.cursor() as cursor:
+            months = get_partition_months(cursor, ArchivedOrder._meta.db_table)
+
+        # Empty string is cached when there is no archive
+        boundary = get_month_start(add_months(months[-1], 1)) if months else ''
+        cache.set(ARCHIVE_BOUNDARY_KEY, boundary, timeout=None)
+
+    return boundary or None
+
+
+def is_archived(date: datetime.date) -> bool:
+    """
+    Returns True if orders created on the date or earlier are in the archive tier.
+    """
+    boundary = get_archive_boundary()
+    if boundary is None:
+        return False
+
+    day_end = timezone.make_aware(datetime.datetime.combine(date + datetime.timedelta(days=1), datetime.time.min))
+
+    return day_end <= boundary
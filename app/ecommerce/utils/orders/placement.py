@@ -0,0 +1,76 @@
+from django.db import transaction
+
+from ecommerce.models.orders import Order, OrderItem
+from ecommerce.models.payments import Payment
+from ecommerce.models.shopping_carts import ShoppingCartItem
+from ecommerce.utils.orders.snapshots import get_snapshot
+from ecommerce.utils.orders.stock import get_stock_lines, reserve_stock
+from ecommerce.utils.shopping_carts.holds import release_stock_holds
+
+# Statements executed by 'place_order' (enforced by 'test_place_order_queries'):
+# INSERT order, INSERT payment, INSERT order items, DELETE cart items, UPDATE stock
+PLACE_ORDER_QUERIES = 5
+
+
+class CartChangedError(Exception):
+    """
+    Raised when shopping cart items were deleted (ordered by a concurrent request)
+    after they were fetched.
+    """
+
+    def __init__(self):
+        super().__init__('Shopping cart was changed, try again')
+
+
+def get_order_items(cart_items) -> list[OrderItem]:
+    """
+    Builds order items with snapshots of products from shopping cart items
+    fetched with 'with_snapshot_relations'.
+    """
+    return [
+        OrderItem(
+            product_variation=cart_item.product_variation,
+            quantity=cart_item.quantity,
+            price=cart_item.product_variation.product_item.get_discount_price() * cart_item.quantity,
+            **get_snapshot(cart_item.product_variation),
+        )
+        for cart_item in cart_items
+    ]
+
+
+def place_order(cart_items: list[ShoppingCartItem], **order_fields) -> Order:
+    """
+    Places an order from evaluated shopping cart items in one transaction
+    with 'PLACE_ORDER_QUERIES' statements. Order and payment are inserted
+    with 'bulk_create', so 'create_payment' signal isn't sent.
+
+    Raises 'OutOfStockError' or 'CartChangedError', nothing is written in this case.
+    No savepoint is created, if it's called inside a transaction the whole transaction is rolled back.
+
+    :param cart_items: shopping cart items fetched with 'with_snapshot_relations'
+    :param order_fields: fields of the order except 'order_price'
+    """
+    order_items = get_order_items(cart_items)
+    order = Order(order_price=sum(item.price for item in order_items), **order_fields)
+
+    with transaction.atomic(savepoint=False):
+        Order.objects.bulk_create([order])
+        # Assigning the order caches the payment on it ('order.payment')
+        Payment.objects.bulk_create([Payment(order=order, stripe_session_id='')])
+
+        # Items are put in the partition of the order (see 'utils.orders.partitions')
+        for item in order_items:
+            item.order = order
+            item.date_created = order.date_created
+        OrderItem.objects.bulk_create(order_items)
+
+        deleted, _ = ShoppingCartItem.objects.filter(pk__in=[item.pk for item in cart_items]).delete()
+        if deleted != len(cart_items):
+            raise CartChangedError()
+
+        # Stock rows stay locked until the commit, so they are updated last
+        reserve_stock(get_stock_lines(order_items))
+
+    release_stock_holds(cart_items)
+
+    return order
@@ -0,0 +1,68 @@
+from django.db.models import Prefetch
+
+from ecommerce.models.orders import OrderItem
+from ecommerce.models.products import Image
+
+SNAPSHOT_FIELDS = ['product_name', 'product_slug', 'product_code', 'product_gender',
+                   'product_size', 'product_price', 'main_image']
+
+
+def with_snapshot_relations(queryset, prefix: str = 'product_variation__'):
+    """
+    Fetches relations of product variations copied to order items
+    with one join and one prefetch of main images.
+
+    :param queryset: queryset of shopping cart items or order items
+    """
+    return queryset \
+        .select_related(f'{prefix}size', f'{prefix}product_item__product') \
+        .prefetch_related(Prefetch(f'{prefix}product_item__image', queryset=Image.objects.filter(is_main=True)))
+
+
+def get_snapshot(product_variation) -> dict:
+    """
+    Returns values of 'SNAPSHOT_FIELDS' of an order item from its product variation
+    fetched with 'with_snapshot_relations'.
+    """
+    product_item = product_variation.product_item
+    product = product_item.product
+    main_image = next((image for image in product_item.image.all() if image.is_main), None)
+
+    return {
+        'product_name': product.name,
+        'product_slug': product.slug,
+        'product_code': product_item.product_code,
+        'product_gender': product.gender,
+        'product_size': product_variation.size.name,
+        'product_price': product_item.price,
+        # Same as 'ImageSerializer'
+        'main_image': {
+            'id': main_image.id,
+            'name': main_image.name,
+            'url': main_image.url,
+            'is_main': main_image.is_main,
+        } if main_image is not None else None,
+    }
+
+
+def backfill_order_item_snapshots(batch_size: int = 1000) -> int:
+    """
+    Copies products to order items created before snapshots were introduced.
+    Current catalog values are used, purchase-time values of such items are unknown.
+
+    :return: amount of updated order items
+    """
+    queryset = with_snapshot_relations(OrderItem.objects.filter(product_slug='').order_by('id'))
+
+    updated = 0
+    while True:
+        # Updated items don't match the filter anymore, so the first batch is always taken
+        bulk_list = list(queryset[:batch_size])
+        if not bulk_list:
+            return updated
+
+        for order_item in bulk_list:
+            for field, value in get_snapshot(order_item.product_variation).items():
+                setattr(order_item, field, value)
+
+        updated += OrderItem.objects.bulk_update(bulk_list, SNAPSHOT_FIELDS)
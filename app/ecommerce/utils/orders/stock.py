@@ -0,0 +1,155 @@
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+from django.db.models.functions import Now
+
+from ecommerce.models.orders import Order, OrderItem
+from ecommerce.models.products import ProductVariation
+from ecommerce.utils.products.cache import invalidate_products
+from ecommerce.utils.products.facets import update_size_facets
+
+
+class OutOfStockError(Exception):
+    """
+    Raised when some lines of an order can't be taken from stock.
+
+    :param lines: [{'product_variation': int, 'requested': int, 'available': int}]
+    """
+
+    def __init__(self, lines: list[dict]):
+        super().__init__('Not enough products in stock')
+        self.lines = lines
+
+
+def get_stock_lines(order_items) -> dict:
+    """
+    Sums quantities of order items (or cart items) by product variation.
+
+    :return: {product_variation_id: quantity}
+    """
+    lines = {}
+    for item in order_items:
+        lines[item.product_variation_id] = lines.get(item.product_variation_id, 0) + item.quantity
+
+    return lines
+
+
+def get_quantity(lines: dict) -> Case:
+    """
+    Returns an expression with quantity of the line for every product variation of the lines.
+    """
+    return Case(
+        *[When(pk=product_variation_id, then=Value(qty)) for product_variation_id, qty in lines.items()],
+        output_field=PositiveIntegerField(),
+    )
+
+
+def refresh_stock_indexes(product_variation_ids) -> None:
+    """
+    Updates size facets and invalidates cached responses of products of the product variations
+    once their stock change is committed, so sold out sizes aren't shown as available.
+    Products are looked up after the commit, the stock transaction isn't made longer.
+    """
+    product_variation_ids = list(product_variation_ids)
+
+    transaction.on_commit(lambda: invalidate_products(update_size_facets(product_variation_ids)))
+
+
+def reserve_stock(lines: dict) -> None:
+    """
+    Takes every line from stock with one conditional 'UPDATE ... WHERE qty_in_stock >= quantity'.
+
+    Either every line is taken or 'OutOfStockError' is raised and the outer transaction
+    is rolled back (no savepoint is created). Updated rows stay locked until
+    the outer transaction is committed, so it should be called right before the commit.
+
+    :param lines: {product_variation_id: quantity}
+    """
+    if not lines:
+        return None
+
+    with transaction.atomic(savepoint=False):
+        updated = ProductVariation.objects \
+            .filter(pk__in=lines, is_active=True, qty_in_stock__gte=get_quantity(lines)) \
+            .update(qty_in_stock=F('qty_in_stock') - get_quantity(lines), updated_at=Now())
+
+        if updated != len(lines):
+            # Raising inside 'atomic' rolls back the lines which were taken
+            raise OutOfStockError(get_unavailable_lines(lines))
+
+    refresh_stock_indexes(lines)
+
+
+def get_unavailable_lines(lines: dict) -> list[dict]:
+    available = dict(
+        ProductVariation.objects
+            .filter(pk__in=lines, is_active=True)
+            .values_list('id', 'qty_in_stock')
+    )
+
+    return [
+        {'product_variation': product_variation_id, 'requested': qty, 'available': available.get(product_variation_id, 0)}
+        for product_variation_id, qty in lines.items()
+        if available.get(product_variation_id, 0) < qty
+    ]
+
+
+def release_stock(lines: dict) -> None:
+    """
+    Returns every line to stock with one 'UPDATE'.
+
+    :param lines: {product_variation_id: quantity}
+    """
+    if not lines:
+        return None
+
+    ProductVariation.objects \
+        .filter(pk__in=lines) \
+        .update(qty_in_stock=F('qty_in_stock') + get_quantity(lines), updated_at=Now())
+
+    refresh_stock_indexes(lines)
+
+
+def release_order_stock(order_id: int, order_status: Order.OrderStatus) -> bool:
+    """
+    Moves a new (unpaid) order to the status and returns its items to stock.
+
+    Status is changed with a conditional 'UPDATE', so stock of an order
+    is released once even if the order is cancelled and expired at the same time.
+
+    :return: True if the order was released
+    """
+    with transaction.atomic():
+        released = Order.objects \
+            .filter(pk=order_id, order_status=Order.OrderStatus.NEW.value) \
+            .update(order_status=order_status.value)
+
+        if released:
+            release_stock(get_stock_lines(OrderItem.objects.filter(order_id=order_id).only('product_variation_id', 'quantity')))
+
+    return bool(released)
+
+
+def restore_order_stock(order_id: int, order_status: Order.OrderStatus) -> bool:
+    """
+    Takes items of a cancelled or expired order from stock again and moves the order to the status,
+    e.g. when its payment is completed after it was released.
+
+    The order and its stock are changed in a savepoint, so the outer transaction is kept
+    when the items aren't in stock anymore.
+
+    :return: True if the order was restored, False if it isn't released or its items are out of stock
+    """
+    released_statuses = (Order.OrderStatus.CANCELLED.value, Order.OrderStatus.EXPIRED.value)
+
+    try:
+        with transaction.atomic():
+            restored = Order.objects \
+                .filter(pk=order_id, order_status__in=released_statuses) \
+                .update(order_status=order_status.value)
+
+            if restored:
+                reserve_stock(get_stock_lines(OrderItem.objects.filter(order_id=order_id).only('product_variation_id', 'quantity')))
+    except OutOfStockError:
+        return False
+
+    return bool(restored)
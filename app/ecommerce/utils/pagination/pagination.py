@@ -0,0 +1,147 @@
+import json
+
+from django.conf import settings
+from django.db.models import Q
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, _reverse_ordering
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination keyed on every field of 'ordering'.
+
+    DRF's 'CursorPagination' filters by the first ordering field only and skips
+    duplicates with an offset. Here the whole ordering tuple is stored in the cursor
+    and compared as a key, so the last field of 'ordering' must be unique (e.g. 'id').
+    A position then points to exactly one row, cursors never carry an offset and pages
+    stay stable when new rows are inserted while a client is walking through them.
+    """
+
+    ordering = ('-id', )
+    page_size = settings.KEYSET_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.KEYSET_MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (reverse, current_position) = (False, None)
+        else:
+            (_, reverse, current_position) = self.cursor
+
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+
+        if current_position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(ordering, current_position))
+
+        # Fetch one extra row to know if there is a page following this one.
+        # Prefetches of the queryset are run only for the fetched slice.
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_following_position = len(results) > len(self.page)
+
+        if reverse:
+            # The query ordering was reversed, so reverse the items back.
+            self.page.reverse()
+            self.has_next = current_position is not None
+            self.has_previous = has_following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = current_position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_keyset_filter(self, ordering, position: str) -> Q:
+        """
+        Builds a filter which selects rows following the 'position' in given 'ordering'.
+
+        For ordering ('-a', '-b') and position (x, y) the filter is:
+            a < x OR (a = x AND b < y)
+        """
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        keyset_filter = Q()
+        equal_fields = {}
+        for order, value in zip(ordering, values):
+            field = order.lstrip('-')
+            lookup = '__lt' if order.startswith('-') else '__gt'
+            keyset_filter |= Q(**equal_fields, **{field + lookup: value})
+            equal_fields[field] = value
+
+        return keyset_filter
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        if self.page:
+            position = self._get_position_from_instance(self.page[-1], self.ordering)
+        else:
+            position = self.cursor.position
+
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+
+        if self.page:
+            position = self._get_position_from_instance(self.page[0], self.ordering)
+        else:
+            position = self.cursor.position
+
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            value = getattr(instance, order.lstrip('-'))
+            # Datetimes keep microseconds, so the position matches the stored value exactly.
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+
+        return json.dumps(values, separators=(',', ':'))
+
+
+class ProductPagination(KeysetPagination):
+    """
+    Pagination for the product catalog. Matches 'Product.Meta.ordering'.
+    """
+
+    ordering = ('-date_created', '-id')
+    page_size = settings.PRODUCTS_PAGE_SIZE
+
+
+class OrderPagination(KeysetPagination):
+    """
+    Pagination for order history. Matches 'Order.Meta.ordering'.
+    """
+
+    ordering = ('-date_created', '-id')
+    page_size = settings.ORDERS_PAGE_SIZE
+
+
+class ProductSearchPagination(KeysetPagination):
+    """
+    Pagination for product search results ranked by relevance.
+    """
+
+    ordering = ('-rank', '-id')
+    page_size = settings.PRODUCTS_PAGE_SIZE
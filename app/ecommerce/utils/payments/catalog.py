@@ -0,0 +1,174 @@
+"""
+Incremental sync of product items to Stripe products and prices.
+
+Every product item stores a hash of what was last pushed to Stripe ('stripe_sync_hash'):
+the product part (name, description) and the price part (price, currency).
+Only items with a changed hash are pushed, the product is updated if its part is changed
+and a new price is created (prices are immutable in Stripe) if the price part is changed,
+the superseded price is archived.
+
+Items are read in batches by id, changed items of a batch are pushed by a thread pool
+and results are saved with one 'bulk_update'. Creates are sent with idempotency keys
+derived from the item and its hash, so a sync restarted after a crash skips saved items
+and doesn't duplicate objects created by Stripe before the crash.
+"""
+import hashlib
+import random
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import stripe
+
+from django.conf import settings
+
+from ecommerce.models.products import ProductItem
+
+CURRENCY = 'eur'
+
+# Length of each part of 'stripe_sync_hash'
+HASH_PART_LENGTH = 32
+
+SYNC_FIELDS = ('stripe_product_id', 'stripe_price_id', 'stripe_sync_hash')
+
+
+def get_hash(*values) -> str:
+    return hashlib.sha256('\0'.join(str(value) for value in values).encode()).hexdigest()[:HASH_PART_LENGTH]
+
+
+def get_product_hash(product_item: ProductItem) -> str:
+    return get_hash(product_item.product.name, product_item.product.description)
+
+
+def get_price_hash(product_item: ProductItem) -> str:
+    return get_hash(product_item.price, CURRENCY)
+
+
+def get_sync_hash(product_item: ProductItem) -> str:
+    return get_product_hash(product_item) + get_price_hash(product_item)
+
+
+def is_retryable(error: stripe.error.StripeError) -> bool:
+    """ Rate limits, network errors and Stripe's server errors are retried. """
+    if isinstance(error, (stripe.error.RateLimitError, stripe.error.APIConnectionError)):
+        return True
+
+    return isinstance(error, stripe.error.APIError) and (error.http_status or 500) >= 500
+
+
+def call_with_backoff(method, *args, **kwargs):
+    """
+    Calls the Stripe method, retryable errors are retried after 'STRIPE_SYNC_RETRY_DELAY'
+    doubled by every attempt with a random jitter, or after 'Retry-After' of a rate limit response.
+    The error is raised after 'STRIPE_SYNC_MAX_RETRIES' retries.
+    """
+    for attempt in range(settings.STRIPE_SYNC_MAX_RETRIES + 1):
+        try:
+            return method(*args, **kwargs)
+        except stripe.error.StripeError as e:
+            if attempt == settings.STRIPE_SYNC_MAX_RETRIES or not is_retryable(e):
+                raise
+
+            delay = settings.STRIPE_SYNC_RETRY_DELAY / 1000 * 2 ** attempt
+            retry_after = (e.headers or {}).get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+
+            time.sleep(delay * random.uniform(1, 1.5))
+
+
+def push_product_item(product_item: ProductItem, force: bool = False) -> None:
+    """
+    Creates or updates the Stripe product and price of the item, ids and the hash are set on the item.
+    Ids of created objects are set as soon as they are created, so they are saved even if a later call fails.
+
+    :param force: the stored hash is ignored, the product is updated and the price is recreated
+    """
+    product_hash = get_product_hash(product_item)
+    price_hash = get_price_hash(product_item)
+    synced_hash = '' if force else product_item.stripe_sync_hash
+    product = product_item.product
+
+    if not product_item.stripe_product_id:
+        stripe_product = call_with_backoff(
+            stripe.Product.create,
+            name=product.name,
+            description=product.description,
+            idempotency_key=f'product-item-{product_item.pk}-product-{product_hash}',
+        )
+        product_item.stripe_product_id = stripe_product.id
+    elif synced_hash[:HASH_PART_LENGTH] != product_hash:
+        call_with_backoff(
+            stripe.Product.modify, product_item.stripe_product_id, name=product.name, description=product.description
+        )
+
+    price_synced = product_item.stripe_price_id and synced_hash[HASH_PART_LENGTH:] == price_hash
+
+    # Items priced before sync hashes keep their price if it's still valid
+    if product_item.stripe_price_id and not synced_hash and not force:
+        try:
+            stripe_price = call_with_backoff(stripe.Price.retrieve, product_item.stripe_price_id)
+            price_synced = stripe_price.active and stripe_price.product == product_item.stripe_product_id \
+                and (stripe_price.unit_amount, stripe_price.currency) == (product_item.price, CURRENCY)
+        except stripe.error.InvalidRequestError:
+            price_synced = False
+
+    if not price_synced:
+        superseded_price_id = product_item.stripe_price_id
+        stripe_price = call_with_backoff(
+            stripe.Price.create,
+            product=product_item.stripe_product_id,
+            unit_amount=product_item.price,
+            currency=CURRENCY,
+            # Superseded price is a part of the key, so a price changed back isn't replayed as the archived one
+            idempotency_key=f'product-item-{product_item.pk}-price-{superseded_price_id}-{price_hash}',
+        )
+        product_item.stripe_price_id = stripe_price.id
+
+        # Superseded price can't be used by new checkout sessions
+        if superseded_price_id and superseded_price_id != stripe_price.id:
+            try:
+                call_with_backoff(stripe.Price.modify, superseded_price_id, active=False)
+            except stripe.error.InvalidRequestError:
+                # Price was deleted in Stripe
+                pass
+
+    product_item.stripe_sync_hash = product_hash + price_hash
+
+
+def sync_stripe_catalog(batch_size: int = 500, workers: int = None, full: bool = False) -> Counter:
+    """
+    Pushes product items changed since the last sync to Stripe.
+
+    :param batch_size: amount of items read and saved at once
+    :param workers: amount of threads calling Stripe ('STRIPE_SYNC_WORKERS' by default)
+    :param full: every item is pushed regardless of its hash
+    :return: amount of 'synced', 'unchanged' and 'failed' items
+    """
+    stats = Counter(synced=0, unchanged=0, failed=0)
+    queryset = ProductItem.objects \
+        .select_related('product') \
+        .only('id', 'price', 'product__name', 'product__description', *SYNC_FIELDS) \
+        .order_by('id')
+    last_id = 0
+
+    with ThreadPoolExecutor(max_workers=workers or settings.STRIPE_SYNC_WORKERS) as executor:
+        while True:
+            product_items = list(queryset.filter(id__gt=last_id)[:batch_size])
+            if not product_items:
+                return stats
+            last_id = product_items[-1].pk
+
+            changed = [
+                product_item for product_item in product_items
+                if full or not product_item.stripe_price_id
+                or product_item.stripe_sync_hash != get_sync_hash(product_item)
+            ]
+            stats['unchanged'] += len(product_items) - len(changed)
+
+            # Items which failed are saved with ids created before the failure, their hash isn't changed
+            futures = [executor.submit(push_product_item, product_item, full) for product_item in changed]
+            for future in futures:
+                stats['failed' if future.exception() else 'synced'] += 1
+
+            ProductItem.objects.bulk_update(changed, SYNC_FIELDS)
@@ -0,0 +1,381 @@
+"""
+Local stand-in of the Stripe API for load testing the checkout and webhooks offline.
+
+Implements the endpoints used by the shop: products and prices ('create_stripe_products_prices_command'),
+creating, retrieving and expiring checkout sessions ('CreateCheckoutSessionAPIView'). Responses are delayed
+by a configurable latency and a share of requests fails with an injected error.
+
+Open checkout sessions are completed or expired at a chosen rate and 'checkout.session.completed'
+and 'checkout.session.expired' events are posted to the webhook ('StripeWebhookView'),
+signed with 'STRIPE_WEBHOOK_SECRET' like Stripe does.
+
+The shop calls it when 'STRIPE_API_BASE' is its address, e.g. 'http://localhost:12111'.
+It's started by 'run_fake_stripe_command', objects are kept in memory.
+"""
+import hashlib
+import hmac
+import json
+import random
+import re
+import secrets
+import threading
+import time
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+API_VERSION = '2024-06-20'
+
+# Checkout sessions expire after 24 hours
+SESSION_LIFETIME = 24 * 60 * 60
+
+# Fields sent by the Stripe library as strings
+INTEGER_FIELDS = ('quantity', 'unit_amount')
+
+
+def parse_form(body: str) -> dict:
+    """
+    Parses a form encoded body of the Stripe library ('line_items[0][price]=price_1') to nested dicts and lists.
+    """
+    params = {}
+    for key, value in parse_qsl(body, keep_blank_values=True):
+        parts = re.findall(r'[^\[\]]+', key)
+        if not parts:
+            continue
+
+        node = params
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = int(value) if parts[-1] in INTEGER_FIELDS and value.isdigit() else value
+
+    return convert_lists(params)
+
+
+def convert_lists(node):
+    """ Converts dicts with only index keys to lists. """
+    if not isinstance(node, dict):
+        return node
+
+    node = {key: convert_lists(value) for key, value in node.items()}
+    if node and all(key.isdigit() for key in node):
+        return [node[key] for key in sorted(node, key=int)]
+
+    return node
+
+
+def sign_payload(payload: str, secret: str, timestamp: int = None) -> str:
+    """
+    Returns the 'Stripe-Signature' header of the webhook payload.
+    """
+    timestamp = timestamp or int(time.time())
+    signature = hmac.new(secret.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256).hexdigest()
+
+    return f't={timestamp},v1={signature}'
+
+
+def get_error(status: int, message: str, error_type: str = 'invalid_request_error', code: str = None) -> tuple:
+    return status, {'error': {'type': error_type, 'code': code, 'message': message}}
+
+
+class FakeStripe:
+    """
+    In-memory objects and API of the stand-in, called by request threads and the webhook sender.
+
+    :param latency: delay of every response in seconds
+    :param jitter: max random delay (in seconds) added to the latency
+    :param error_rate: share of requests (0 - 1) which fail with 'error_status'
+    :param error_status: status of injected errors, e.g. 500 or 429
+    """
+
+    ROUTES = (
+        ('POST', re.compile(r'^/v1/products$'), 'create_product'),
+        ('POST', re.compile(r'^/v1/products/(?P<object_id>[^/]+)$'), 'update_product'),
+        ('POST', re.compile(r'^/v1/prices$'), 'create_price'),
+        ('GET', re.compile(r'^/v1/prices/(?P<object_id>[^/]+)$'), 'retrieve_price'),
+        ('POST', re.compile(r'^/v1/prices/(?P<object_id>[^/]+)$'), 'update_price'),
+        ('POST', re.compile(r'^/v1/checkout/sessions$'), 'create_session'),
+        ('GET', re.compile(r'^/v1/checkout/sessions/(?P<object_id>[^/]+)$'), 'retrieve_session'),
+        ('POST', re.compile(r'^/v1/checkout/sessions/(?P<object_id>[^/]+)/expire$'), 'expire_session'),
+    )
+
+    def __init__(self, latency: float = 0, jitter: float = 0, error_rate: float = 0, error_status: int = 500):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.base_url = ''
+
+        self.lock = threading.Lock()
+        self.objects = {}
+        # Ids of open checkout sessions, oldest first
+        self.open_sessions = []
+        # Idempotency key -> response of the first request, repeated requests get the same response
+        self.idempotent_responses = {}
+        self.stats = Counter()
+
+    @staticmethod
+    def new_id(prefix: str) -> str:
+        return f'{prefix}_test_{secrets.token_hex(12)}'
+
+    def handle(self, method: str, path: str, params: dict, idempotency_key: str = None) -> tuple[int, dict]:
+        """
+        Routes the request after the latency.
+
+        :return: status, body
+        """
+        time.sleep(self.latency + random.uniform(0, self.jitter))
+        self.stats['requests'] += 1
+
+        if self.error_rate and random.random() < self.error_rate:
+            self.stats['injected_errors'] += 1
+            error_type = 'rate_limit_error' if self.error_status == 429 else 'api_error'
+            return get_error(self.error_status, 'Injected error', error_type)
+
+        if idempotency_key and idempotency_key in self.idempotent_responses:
+            self.stats['idempotent_replays'] += 1
+            return self.idempotent_responses[idempotency_key]
+
+        response = get_error(404, f'Unrecognized request URL ({method}: {path})')
+        for route_method, pattern, handler in self.ROUTES:
+            match = pattern.match(path)
+            if match and route_method == method:
+                response = getattr(self, handler)(params, **match.groupdict())
+                break
+
+        if idempotency_key and method == 'POST':
+            self.idempotent_responses[idempotency_key] = response
+
+        return response
+
+    def create_object(self, prefix: str, obj: dict) -> tuple[int, dict]:
+        obj = {'id': self.new_id(prefix), 'created': int(time.time()), 'livemode': False, **obj}
+        with self.lock:
+            self.objects[obj['id']] = obj
+
+        return 200, obj
+
+    def create_product(self, params: dict) -> tuple[int, dict]:
+        if not params.get('name'):
+            return get_error(400, 'Missing required param: name.', code='parameter_missing')
+
+        return self.create_object('prod', {
+            'object': 'product',
+            'active': True,
+            'name': params['name'],
+            'description': params.get('description') or None,
+            'metadata': params.get('metadata', {}),
+        })
+
+    def update_object(self, object_type: str, object_id: str, params: dict, fields: tuple) -> tuple[int, dict]:
+        obj = self.objects.get(object_id)
+        if obj is None or obj['object'] != object_type:
+            return get_error(404, f'No such {object_type}: {object_id!r}', code='resource_missing')
+
+        with self.lock:
+            for field in fields:
+                if field in params:
+                    obj[field] = params[field] if field != 'active' else params[field] == 'true'
+
+        return 200, obj
+
+    def update_product(self, params: dict, object_id: str) -> tuple[int, dict]:
+        return self.update_object('product', object_id, params, ('name', 'description', 'active', 'metadata'))
+
+    def create_price(self, params: dict) -> tuple[int, dict]:
+        if params.get('product') not in self.objects:
+            return get_error(400, f'No such product: {params.get("product")!r}', code='resource_missing')
+
+        return self.create_object('price', {
+            'object': 'price',
+            'active': True,
+            'product': params['product'],
+            'unit_amount': params.get('unit_amount'),
+            'currency': params.get('currency'),
+            'type': 'one_time',
+        })
+
+    def retrieve_price(self, params: dict, object_id: str) -> tuple[int, dict]:
+        price = self.objects.get(object_id)
+        if price is None or price['object'] != 'price':
+            return get_error(404, f'No such price: {object_id!r}', code='resource_missing')
+
+        return 200, price
+
+    def update_price(self, params: dict, object_id: str) -> tuple[int, dict]:
+        return self.update_object('price', object_id, params, ('active', 'metadata'))
+
+    def create_session(self, params: dict) -> tuple[int, dict]:
+        line_items = params.get('line_items', [])
+        prices = [self.objects.get(item.get('price')) for item in line_items]
+        if not line_items or None in prices:
+            return get_error(400, 'Invalid line items', code='resource_missing')
+
+        amount_total = sum(price['unit_amount'] * item.get('quantity', 1) for price, item in zip(prices, line_items))
+        session_id = self.new_id('cs')
+        status, session = self.create_object('cs', {
+            'id': session_id,
+            'object': 'checkout.session',
+            'url': f'{self.base_url}/c/pay/{session_id}',
+            'status': 'open',
+            'payment_status': 'unpaid',
+            'expires_at': int(time.time()) + SESSION_LIFETIME,
+            'mode': params.get('mode', 'payment'),
+            'client_reference_id': params.get('client_reference_id'),
+            'amount_total': amount_total,
+            'currency': prices[0]['currency'],
+            'success_url': params.get('success_url'),
+            'cancel_url': params.get('cancel_url'),
+            'metadata': params.get('metadata', {}),
+        })
+
+        with self.lock:
+            self.open_sessions.append(session_id)
+        self.stats['sessions'] += 1
+
+        return status, session
+
+    def retrieve_session(self, params: dict, object_id: str) -> tuple[int, dict]:
+        session = self.objects.get(object_id)
+        if session is None or session['object'] != 'checkout.session':
+            return get_error(404, f'No such checkout.session: {object_id!r}', code='resource_missing')
+
+        return 200, session
+
+    def expire_session(self, params: dict, object_id: str) -> tuple[int, dict]:
+        status, session = self.retrieve_session(params, object_id)
+        if status != 200:
+            return status, session
+
+        if self.finish_session(object_id, expire=True) is None:
+            return get_error(400, f'Only Checkout Sessions with a status in ["open"] can be expired. '
+                                  f'This Checkout Session has a status of "{session["status"]}".')
+
+        return 200, session
+
+    def finish_session(self, session_id: str = None, expire: bool = False) -> dict | None:
+        """
+        Completes (pays) or expires the open session, the oldest one by default.
+
+        :return: the event of the session, None if the session isn't open
+        """
+        with self.lock:
+            if session_id is None:
+                if not self.open_sessions:
+                    return None
+                session_id = self.open_sessions[0]
+
+            if session_id not in self.open_sessions:
+                return None
+            self.open_sessions.remove(session_id)
+
+            session = self.objects[session_id]
+            if expire:
+                session.update(status='expired')
+            else:
+                session.update(status='complete', payment_status='paid')
+
+        return {
+            'id': self.new_id('evt'),
+            'object': 'event',
+            'api_version': API_VERSION,
+            'created': int(time.time()),
+            'livemode': False,
+            'type': 'checkout.session.expired' if expire else 'checkout.session.completed',
+            'data': {'object': dict(session)},
+        }
+
+
+class WebhookSender(threading.Thread):
+    """
+    Finishes open sessions at 'rate' per second and posts signed events to the webhook.
+    Events are posted by 'workers' threads, so a slow webhook doesn't lower the rate.
+
+    :param expire_rate: share of sessions (0 - 1) which are expired instead of completed
+    """
+
+    def __init__(self, fake_stripe: FakeStripe, url: str, secret: str, rate: float, expire_rate: float = 0,
+                 workers: int = 8):
+        super().__init__(daemon=True)
+        self.fake_stripe = fake_stripe
+        self.url = url
+        self.secret = secret
+        self.interval = 1 / rate
+        self.expire_rate = expire_rate
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            event = self.fake_stripe.finish_session(expire=random.random() < self.expire_rate)
+            if event is not None:
+                self.executor.submit(self.send, event)
+
+    def stop(self):
+        self.stopped.set()
+        self.executor.shutdown(wait=True)
+
+    def send(self, event: dict) -> None:
+        payload = json.dumps(event)
+        request = urllib.request.Request(self.url, data=payload.encode(), method='POST', headers={
+            'Content-Type': 'application/json; charset=utf-8',
+            'Stripe-Signature': sign_payload(payload, self.secret),
+            'User-Agent': 'Stripe/1.0 (+https://stripe.com/docs/webhooks)',
+        })
+
+        try:
+            with urllib.request.urlopen(request, timeout=30):
+                self.fake_stripe.stats['webhooks_sent'] += 1
+        except OSError:
+            # HTTP errors and refused connections, Stripe would retry the event later
+            self.fake_stripe.stats['webhooks_failed'] += 1
+
+
+class FakeStripeRequestHandler(BaseHTTPRequestHandler):
+    server_version = 'FakeStripe/1.0'
+
+    def do_GET(self):
+        self.respond()
+
+    def do_POST(self):
+        self.respond()
+
+    def do_DELETE(self):
+        self.respond()
+
+    def respond(self):
+        url = urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode() if length else url.query
+
+        status, data = self.server.fake_stripe.handle(self.command, url.path, parse_form(body),
+                                                      self.headers.get('Idempotency-Key'))
+        payload = json.dumps(data).encode()
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.send_header('Request-Id', f'req_{secrets.token_hex(8)}')
+        self.send_header('Stripe-Version', API_VERSION)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class FakeStripeServer(ThreadingHTTPServer):
+    """
+    HTTP server of the stand-in, every request is handled in its own thread.
+    Port 0 binds a free port, 'fake_stripe.base_url' is the address of the server.
+    """
+    daemon_threads = True
+
+    def __init__(self, host: str, port: int, fake_stripe: FakeStripe, verbose: bool = False):
+        super().__init__((host, port), FakeStripeRequestHandler)
+        self.fake_stripe = fake_stripe
+        self.verbose = verbose
+
+        fake_stripe.base_url = f'http://{host}:{self.server_address[1]}'
@@ -0,0 +1,66 @@
+"""
+Notifications of completed payments over Redis pub/sub.
+
+The webhook consumer publishes to the channel of the order when its payment is completed,
+long-polling requests ('payment_status_view') wait on the channel instead of polling the database.
+"""
+import asyncio
+import functools
+
+import redis
+import redis.asyncio
+
+from django.conf import settings
+
+from ecommerce.models.payments import Payment
+
+PAYMENT_CHANNEL = 'payments:order:{}'
+
+
+@functools.cache
+def get_publisher() -> redis.Redis:
+    return redis.Redis.from_url(settings.PAYMENTS_PUBSUB_URL, socket_connect_timeout=1)
+
+
+def publish_payment_completed(order_id: int) -> None:
+    try:
+        get_publisher().publish(PAYMENT_CHANNEL.format(order_id), 'paid')
+    except redis.RedisError:
+        # Waiting requests check the order when they time out
+        pass
+
+
+async def is_order_paid(order_id: int) -> bool:
+    return await Payment.objects.filter(order_id=order_id, payment_bool=True).aexists()
+
+
+async def wait_for_payment(order_id: int, timeout: float) -> bool:
+    """
+    Waits until the payment of the order is completed or the timeout is over.
+    The order is checked after subscribing, so a payment completed meanwhile isn't missed.
+    Without Redis the order is only checked.
+
+    :return: True if the order is paid
+    """
+    client = redis.asyncio.Redis.from_url(settings.PAYMENTS_PUBSUB_URL, socket_connect_timeout=1)
+
+    try:
+        async with client.pubsub() as pubsub:
+            await pubsub.subscribe(PAYMENT_CHANNEL.format(order_id))
+
+            if await is_order_paid(order_id):
+                return True
+
+            try:
+                async with asyncio.timeout(timeout):
+                    async for message in pubsub.listen():
+                        if message['type'] == 'message':
+                            return True
+            except TimeoutError:
+                return await is_order_paid(order_id)
+    except redis.RedisError:
+        return await is_order_paid(order_id)
+    finally:
+        await client.aclose()
+
+    return await is_order_paid(order_id)
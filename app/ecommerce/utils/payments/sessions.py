@@ -0,0 +1,60 @@
+import time
+
+import stripe
+
+from django.conf import settings
+from django.core.cache import cache
+
+CHECKOUT_SESSION_KEY = 'payments:checkout_session:{}'
+
+
+def cache_checkout_session(session_id: str, url: str | None, status: str, expires_at: int | None) -> dict:
+    """
+    Caches the state of the checkout session for 'PAYMENTS_CHECKOUT_SESSION_CACHE_TIMEOUT',
+    polling of the session is served from the cache.
+
+    :return: cached state
+    """
+    state = {'id': session_id, 'url': url, 'status': status, 'expires_at': expires_at}
+    cache.set(CHECKOUT_SESSION_KEY.format(session_id), state, timeout=settings.PAYMENTS_CHECKOUT_SESSION_CACHE_TIMEOUT)
+
+    return state
+
+
+def update_checkout_session_status(session_id: str, status: str) -> None:
+    """
+    Sets the status of the cached session, it's called by webhook events of the session.
+    Sessions which aren't cached are retrieved from Stripe when they are polled.
+    """
+    key = CHECKOUT_SESSION_KEY.format(session_id)
+    state = cache.get(key)
+
+    if state is not None:
+        state['status'] = status
+        cache.set(key, state, timeout=settings.PAYMENTS_CHECKOUT_SESSION_CACHE_TIMEOUT)
+
+
+def is_stale(state: dict) -> bool:
+    """
+    Returns True if the session is cached as open after it has expired,
+    e.g. its 'checkout.session.expired' event isn't processed yet.
+    """
+    return state['status'] == 'open' and state['expires_at'] is not None and state['expires_at'] <= time.time()
+
+
+def get_checkout_session(session_id: str) -> dict:
+    """
+    Returns the cached state of the checkout session,
+    the session is retrieved from Stripe only if it isn't cached or its state is stale.
+    """
+    state = cache.get(CHECKOUT_SESSION_KEY.format(session_id))
+
+    if state is None or is_stale(state):
+        session = stripe.checkout.Session.retrieve(session_id)
+        state = cache_checkout_session(session.id, session.url, session.status, session.expires_at)
+
+    return state
+
+
+def delete_checkout_session(session_id: str) -> None:
+    cache.delete(CHECKOUT_SESSION_KEY.format(session_id))
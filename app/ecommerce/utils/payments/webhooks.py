@@ -0,0 +1,265 @@
+import datetime
+import json
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from ecommerce.models.orders import Order, OrderItem
+from ecommerce.models.payments import Payment, WebhookEvent
+from ecommerce.tasks.payments import process_webhook_events_task
+from ecommerce.tasks.send_email import send_order_details_email
+from ecommerce.utils.orders.stock import restore_order_stock
+from ecommerce.utils.payments.notifications import publish_payment_completed
+from ecommerce.utils.payments.sessions import update_checkout_session_status
+
+WEBHOOKS_LOCK_KEY = 'webhooks:consumer:lock'
+
+
+def get_ordering_key(event: dict) -> str:
+    """
+    Returns the key of events which must be processed in order: the order id passed to the checkout session
+    as 'client_reference_id', or the id of the event object for sessions created without it.
+    """
+    obj = event['data']['object']
+    order_id = obj.get('client_reference_id')
+
+    return f'order:{order_id}' if order_id else f'object:{obj.get("id", event["id"])}'
+
+
+def record_webhook_event(payload: bytes) -> None:
+    """
+    Stores a verified event with one 'INSERT ... ON CONFLICT DO NOTHING',
+    repeated deliveries of the event are dropped. Processing is scheduled once the transaction is committed.
+
+    :param payload: body of the webhook request
+    """
+    event = json.loads(payload)
+    WebhookEvent.objects.bulk_create([
+        WebhookEvent(
+            event_id=event['id'],
+            event_type=event['type'],
+            ordering_key=get_ordering_key(event),
+            payload=event,
+            stripe_created=datetime.datetime.fromtimestamp(event['created'], tz=datetime.timezone.utc),
+        )
+    ], ignore_conflicts=True)
+
+    transaction.on_commit(process_webhook_events_task.delay)
+
+
+def get_order_email_context(order_id: int) -> dict | None:
+    """
+    Returns context of 'send_order_details_email' with 'email' of the user.
+    """
+    queryset = OrderItem.objects \
+        .select_related('order__shipping_address', 'order__user') \
+        .filter(order_id=order_id) \
+        .only(
+            'id', 'order_id', 'quantity', 'price', 'product_name',
+            'order__date_created', 'order__order_price', 'order__user__email', 'order__shipping_address',
+        )
+
+    order_items = list(queryset)
+    if not order_items:
+        return None
+
+    order_obj = order_items[0].order
+    shipping_address_obj = order_obj.shipping_address
+
+    return dict(
+        order={
+            'id': order_obj.pk,
+            'date_created': order_obj.date_created.date(),
+            'price': order_obj.order_price / 100,
+        },
+        order_items=[[item.product_name, item.quantity, item.price / 100] for item in order_items],
+        shipping_address={
+            'first_name': shipping_address_obj.first_name,
+            'last_name': shipping_address_obj.last_name,
+            'region': shipping_address_obj.region,
+            'street': shipping_address_obj.street,
+            'unit_number': shipping_address_obj.unit_number,
+            'city': shipping_address_obj.city,
+            'country': shipping_address_obj.country,
+            'phone_number': str(shipping_address_obj.phone_number),
+        },
+        email=order_obj.user.email,
+    )
+
+
+def handle_completed_session(session: dict) -> None:
+    payment = Payment.objects \
+        .only('id', 'order_id', 'payment_bool') \
+        .filter(stripe_session_id=session['id']) \
+        .first()
+
+    # Session of another shop or an already processed payment
+    if payment is None or payment.payment_bool:
+        return None
+
+    Payment.objects.filter(pk=payment.pk).update(payment_bool=True)
+    transaction.on_commit(lambda: update_checkout_session_status(session['id'], 'complete'))
+
+    # Order can be cancelled or expired (and its stock released) before the event is processed
+    paid = Order.objects \
+        .filter(pk=payment.order_id, order_status=Order.OrderStatus.NEW.value) \
+        .update(order_status=Order.OrderStatus.PAYED.value)
+    if not paid and not restore_order_stock(payment.order_id, Order.OrderStatus.PAYED):
+        Payment.objects.filter(pk=payment.pk).update(refund_required=True)
+        return None
+
+    # Long-polling requests of the payment status are answered
+    transaction.on_commit(lambda: publish_payment_completed(payment.order_id))
+
+    context = get_order_email_context(payment.order_id)
+    if context is not None:
+        user_email = context.pop('email')
+        transaction.on_commit(lambda: send_order_details_email.delay(user_email, context))
+
+
+def handle_expired_session(session: dict) -> None:
+    # Order can be paid with a new checkout session
+    Payment.objects.filter(stripe_session_id=session['id']).update(stripe_session_id='')
+    transaction.on_commit(lambda: update_checkout_session_status(session['id'], 'expired'))
+
+
+# Event type -> handler of the event object, other events are only marked as processed
+WEBHOOK_HANDLERS = {
+    'checkout.session.completed': handle_completed_session,
+    'checkout.session.expired': handle_expired_session,
+}
+
+
+def process_webhook_event(event: WebhookEvent) -> bool:
+    """
+    Handles the event in its own transaction. A failed event is retried after
+    'WEBHOOKS_RETRY_DELAY' seconds doubled by every attempt, it's marked as failed
+    after 'WEBHOOKS_MAX_ATTEMPTS' attempts.
+
+    :return: True if the event is processed
+    """
+    now = timezone.now()
+
+    try:
+        with transaction.atomic():
+            handler = WEBHOOK_HANDLERS.get(event.event_type)
+            if handler is not None:
+                handler(event.payload['data']['object'])
+
+            WebhookEvent.objects \
+                .filter(pk=event.pk) \
+                .update(status=WebhookEvent.EventStatus.PROCESSED.value, attempts=F('attempts') + 1,
+                        processed_at=now)
+    except Exception as e:
+        event.attempts += 1
+        if event.attempts >= settings.WEBHOOKS_MAX_ATTEMPTS:
+            event.status = WebhookEvent.EventStatus.FAILED.value
+        event.last_error = repr(e)
+        event.next_attempt_at = now + datetime.timedelta(seconds=settings.WEBHOOKS_RETRY_DELAY * 2 ** (event.attempts - 1))
+        event.save(update_fields=['status', 'attempts', 'last_error', 'next_attempt_at'])
+
+        return False
+
+    return True
+
+
+def extend_lock(token: str) -> bool:
+    """
+    Extends the consumer lock by 'WEBHOOKS_LOCK_TIMEOUT' if it's still held with the token.
+
+    :return: False if the lock has expired (it could be taken by another consumer)
+    """
+    return cache.get(WEBHOOKS_LOCK_KEY) == token and cache.touch(WEBHOOKS_LOCK_KEY, settings.WEBHOOKS_LOCK_TIMEOUT)
+
+
+def release_lock(token: str) -> None:
+    """
+    Deletes the consumer lock only if it's held with the token, a lock which has expired
+    and was taken by another consumer is kept.
+    """
+    if cache.get(WEBHOOKS_LOCK_KEY) == token:
+        cache.delete(WEBHOOKS_LOCK_KEY)
+
+
+def process_webhook_events(batch_size: int = None) -> int:
+    """
+    Processes pending events in batches in the order they were created by Stripe.
+
+    An event isn't processed while an earlier event with the same 'ordering_key' is pending or failed,
+    so events of an order are applied strictly in order. Events after a failed one wait
+    until it's retried or resolved in the admin. Only one consumer runs at a time:
+    its lock is extended before every batch and the consumer stops once the lock has expired.
+
+    :return: amount of processed events
+    """
+    batch_size = batch_size or settings.WEBHOOKS_BATCH_SIZE
+
+    token = uuid4().hex
+    if not cache.add(WEBHOOKS_LOCK_KEY, token, timeout=settings.WEBHOOKS_LOCK_TIMEOUT):
+        return 0
+
+    try:
+        processed = 0
+        blocked_keys = set()
+        last_event = None
+
+        failed_events = WebhookEvent.objects \
+            .filter(status=WebhookEvent.EventStatus.FAILED.value, ordering_key=OuterRef('ordering_key')) \
+            .filter(
+                Q(stripe_created__lt=OuterRef('stripe_created'))
+                | Q(stripe_created=OuterRef('stripe_created'), id__lt=OuterRef('id'))
+            )
+
+        while extend_lock(token):
+            events = WebhookEvent.objects \
+                .filter(status=WebhookEvent.EventStatus.PENDING.value) \
+                .exclude(Exists(failed_events)) \
+                .order_by('stripe_created', 'id')
+
+            # Skipped events stay pending, batches are read after the last read event
+            if last_event is not None:
+                events = events.filter(
+                    Q(stripe_created__gt=last_event.stripe_created)
+                    | Q(stripe_created=last_event.stripe_created, id__gt=last_event.pk)
+                )
+
+            events = list(events[:batch_size])
+            if not events:
+                return processed
+
+            now = timezone.now()
+            for event in events:
+                if event.ordering_key in blocked_keys:
+                    continue
+
+                if event.next_attempt_at is not None and event.next_attempt_at > now:
+                    blocked_keys.add(event.ordering_key)
+                elif process_webhook_event(event):
+                    processed += 1
+                else:
+                    blocked_keys.add(event.ordering_key)
+
+            last_event = events[-1]
+
+        return processed
+    finally:
+        release_lock(token)
+
+
+def delete_old_webhook_events() -> int:
+    """
+    Deletes processed events older than 'WEBHOOKS_RETENTION_DAYS', failed events are kept.
+
+    :return: amount of deleted events
+    """
+    threshold_time = timezone.now() - datetime.timedelta(days=settings.WEBHOOKS_RETENTION_DAYS)
+
+    deleted, _ = WebhookEvent.objects \
+        .filter(status=WebhookEvent.EventStatus.PROCESSED.value, processed_at__lt=threshold_time) \
+        .delete()
+
+    return deleted
@@ -0,0 +1,276 @@
+import hashlib
+import json
+import time
+from urllib.parse import urlencode
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import QuerySet
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from ecommerce.models.products import Product
+from ecommerce.utils.renderers.renderers import FastJSONRenderer
+from ecommerce.utils.shopping_carts.holds import get_stock_holds
+
+CATALOG_VERSION_KEY = 'products:catalog:version'
+PRODUCT_VERSION_KEY = 'products:product:{}:version'
+PRODUCT_LIST_KEY = 'products:list:{}:{}'
+PRODUCT_DETAIL_KEY = 'products:detail:{}'
+
+
+def new_version() -> str:
+    """
+    Returns a unique version which starts with the time it was created at,
+    so the version also serves as 'Last-Modified' of responses built with it.
+    """
+    return f'{time.time_ns()}.{uuid4().hex[:8]}'
+
+
+def get_version(key: str) -> str:
+    """
+    Returns version stored under the key, creates it if there is none.
+    """
+    version = cache.get(key)
+    if version is None:
+        version = new_version()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+
+    return version
+
+
+def get_catalog_version() -> str:
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def get_product_version(product_id: int) -> str:
+    return get_version(PRODUCT_VERSION_KEY.format(product_id))
+
+
+def is_cacheable(request) -> bool:
+    """
+    Only JSON responses are cached, browsable API is always rendered.
+    """
+    return request.accepted_renderer.format == 'json'
+
+
+def get_list_digest(request) -> str:
+    """
+    Returns digest of a product list url with sorted query params.
+    Host is a part of the digest because pagination links are absolute.
+    """
+    params = sorted((key, value) for key, values in request.query_params.lists() for value in values)
+    url = f'{request.scheme}://{request.get_host()}{request.path}?{urlencode(params)}'
+
+    return hashlib.md5(url.encode()).hexdigest()
+
+
+def get_list_cache_key(version: str, digest: str) -> str:
+    """
+    Returns cache key of a product list page.
+    Key contains catalog version, so any change of the catalog makes every cached page outdated.
+    """
+    return PRODUCT_LIST_KEY.format(version, digest)
+
+
+def get_cached_product(slug: str) -> dict | None:
+    """
+    Returns cached product detail {'product_id', 'version', 'content', 'stock'}
+    if the product was not changed since it was cached.
+    """
+    entry = cache.get(PRODUCT_DETAIL_KEY.format(slug))
+    if entry is None:
+        return None
+
+    if cache.get(PRODUCT_VERSION_KEY.format(entry['product_id'])) != entry['version']:
+        return None
+
+    return entry
+
+
+def get_products(data: dict, many: bool = False) -> list:
+    """
+    Returns serialized products of a product list page or product detail.
+    """
+    return data['results'] if many else [data]
+
+
+def get_stock(products: list) -> dict:
+    """
+    Returns quantities in stock of serialized products.
+
+    :return: {product_variation_id: qty_in_stock}
+    """
+    return {
+        variation['id']: variation['qty_in_stock']
+        for product in products
+        for product_item in product['product_items']
+        for variation in product_item['product_variations']
+    }
+
+
+def get_held_stock(product_variation_ids) -> dict:
+    """
+    Returns quantities held in shopping carts, variations without holds are left out.
+
+    :return: {product_variation_id: quantity}
+    """
+    return {pk: qty for pk, qty in get_stock_holds(product_variation_ids).items() if qty}
+
+
+def apply_stock_holds(products: list, holds: dict) -> None:
+    """
+    Subtracts quantities held in shopping carts from the stock of serialized products
+    (same as 'get_available_quantity' does for serialized variations).
+    """
+    for product in products:
+        for product_item in product['product_items']:
+            for variation in product_item['product_variations']:
+                qty_in_stock = variation['qty_in_stock']
+                variation['qty_in_stock'] = min(max(qty_in_stock - holds.get(variation['id'], 0), 0), qty_in_stock)
+
+
+def get_held_etag(version: str, digest: str, holds: dict) -> str:
+    """
+    Returns 'ETag' of a response with stock holds applied.
+    Holds change without changing versions, so they are a part of the tag.
+    """
+    holds_digest = hashlib.md5(repr(sorted(holds.items())).encode()).hexdigest()[:8]
+
+    return quote_etag(f'{version}-{digest}-{holds_digest}')
+
+
+def get_validators(version: str, digest: str = '') -> (str, int):
+    """
+    Returns 'ETag' and 'Last-Modified' (timestamp) of a response built with the version.
+    'Last-Modified' is rounded up to the next second, a response isn't older than its version.
+    """
+    etag = quote_etag(f'{version}-{digest}' if digest else version)
+    last_modified = -(-int(version.split('.')[0]) // 10 ** 9)
+
+    return etag, last_modified
+
+
+def set_validators(response, version: str, digest: str = '') -> None:
+    etag, last_modified = get_validators(version, digest)
+    response.headers['ETag'] = etag
+    response.headers['Last-Modified'] = http_date(last_modified)
+
+
+def get_not_modified_response(request, version: str, digest: str = '') -> HttpResponse | None:
+    """
+    Returns '304 Not Modified' if 'If-None-Match' or 'If-Modified-Since'
+    of the request matches the version. 'If-None-Match' is evaluated first,
+    'If-Modified-Since' is ignored when the request has it.
+    """
+    etag, last_modified = get_validators(version, digest)
+    if 'If-None-Match' in request.headers:
+        response = get_conditional_response(request, etag=etag)
+    else:
+        response = get_conditional_response(request, last_modified=last_modified)
+
+    if response is not None:
+        set_validators(response, version, digest)
+
+    return response
+
+
+def get_cached_response(request, entry: dict, version: str, digest: str = '', many: bool = False) -> HttpResponse:
+    """
+    Returns cached content with current stock holds applied
+    or '304 Not Modified' if the request matches it.
+
+    Content without holds is returned as it is, otherwise it is decoded and holds are applied
+    to its variations. Held responses are validated only with 'ETag',
+    their 'Last-Modified' isn't known.
+    """
+    holds = get_held_stock(entry['stock'])
+    if not holds:
+        response = get_not_modified_response(request, version, digest)
+        if response is None:
+            response = HttpResponse(entry['content'], content_type='application/json')
+            set_validators(response, version, digest)
+
+        return response
+
+    etag = get_held_etag(version, digest, holds)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        data = json.loads(entry['content'])
+        apply_stock_holds(get_products(data, many), holds)
+        response = HttpResponse(FastJSONRenderer().render(data), content_type='application/json')
+
+    response.headers['ETag'] = etag
+    return response
+
+
+def set_held_validators(response, stock: dict, version: str, digest: str = '', many: bool = False) -> None:
+    """
+    Applies current stock holds to the data of a response which was serialized without them
+    and sets its validators ('ETag' with holds if there are any).
+    """
+    holds = get_held_stock(stock)
+    if not holds:
+        return set_validators(response, version, digest)
+
+    apply_stock_holds(get_products(response.data, many), holds)
+    response.headers['ETag'] = get_held_etag(version, digest, holds)
+
+
+def cache_list_response(response, key: str) -> dict:
+    """
+    Stores content of a product list page serialized without stock holds under the key,
+    holds are applied when the page is returned.
+
+    :return: cached entry {'content', 'stock'}
+    """
+    entry = {
+        'content': FastJSONRenderer().render(response.data),
+        'stock': get_stock(get_products(response.data, many=True)),
+    }
+    cache.set(key, entry, timeout=settings.PRODUCTS_CACHE_TIMEOUT)
+
+    return entry
+
+
+def cache_product_response(response, product_id: int, version: str, slug: str) -> dict:
+    """
+    Stores content of product detail serialized without stock holds with the version of the product
+    it was serialized with ('version' must be taken before the product is serialized).
+
+    :return: cached entry {'product_id', 'version', 'content', 'stock'}
+    """
+    entry = {
+        'product_id': product_id,
+        'version': version,
+        'content': FastJSONRenderer().render(response.data),
+        'stock': get_stock(get_products(response.data)),
+    }
+    cache.set(PRODUCT_DETAIL_KEY.format(slug), entry, timeout=settings.PRODUCTS_CACHE_TIMEOUT)
+
+    return entry
+
+
+def invalidate_products(product_ids) -> None:
+    """
+    Bumps versions of given products and the catalog version
+    once the current transaction is committed.
+
+    :param product_ids: list of product ids or a queryset with product ids
+    """
+    if isinstance(product_ids, QuerySet):
+        product_ids = Product.objects.filter(pk__in=product_ids).values_list('id', flat=True)
+
+    # Ids are taken now, rows they come from could be deleted before the commit
+    product_ids = list(product_ids)
+
+    def bump_versions():
+        versions = {PRODUCT_VERSION_KEY.format(product_id): new_version() for product_id in product_ids}
+        versions[CATALOG_VERSION_KEY] = new_version()
+        cache.set_many(versions, timeout=None)
+
+    transaction.on_commit(bump_versions)
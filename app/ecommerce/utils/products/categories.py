@@ -0,0 +1,95 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Value
+from django.db.models.functions import Concat, StrIndex, Substr
+
+from ecommerce.models.products import ProductCategory
+
+CATEGORY_TREE_KEY = 'products:categories:tree'
+
+
+def get_category_path(category_id: int, parent_path: str | None) -> str:
+    """
+    Returns materialized path of a category: ids from the root category
+    to the category itself, e.g. '/6/7/' for 'sneakers' under 'shoes'.
+    """
+    return f'{parent_path or "/"}{category_id}/'
+
+
+def update_category_path(category: ProductCategory) -> None:
+    """
+    Updates path of the category and paths of every category under it.
+
+    Subcategories are found by the id of the category in their paths,
+    so a path saved from an outdated instance doesn't break the subtree.
+    """
+    parent_path = None
+    if category.parent_category_id is not None:
+        parent_path = ProductCategory.objects \
+            .filter(pk=category.parent_category_id) \
+            .values_list('path', flat=True) \
+            .first()
+
+    path = get_category_path(category.pk, parent_path)
+    segment = f'/{category.pk}/'
+
+    with transaction.atomic():
+        ProductCategory.objects.filter(pk=category.pk).update(path=path)
+        ProductCategory.objects \
+            .filter(path__contains=segment) \
+            .exclude(pk=category.pk) \
+            .update(path=Concat(Value(path), Substr('path', StrIndex('path', Value(segment)) + len(segment))))
+
+    category.path = path
+
+
+def rebuild_category_paths() -> int:
+    """
+    Recalculates paths of every category from 'parent_category'.
+
+    :return: amount of updated categories
+    """
+    categories = {category.pk: category for category in ProductCategory.objects.only('id', 'parent_category_id', 'path')}
+
+    def get_path(category):
+        parent = categories.get(category.parent_category_id)
+        return get_category_path(category.pk, get_path(parent) if parent else None)
+
+    bulk_list = []
+    for category in categories.values():
+        path = get_path(category)
+        if category.path != path:
+            category.path = path
+            bulk_list.append(category)
+
+    return ProductCategory.objects.bulk_update(bulk_list, ['path'])
+
+
+def get_category_tree() -> list[dict]:
+    """
+    Returns every category as a nested list ordered by name, cached until a category is changed.
+    """
+    tree = cache.get(CATEGORY_TREE_KEY)
+    if tree is not None:
+        return tree
+
+    nodes = {}
+    tree = []
+    categories = ProductCategory.objects \
+        .values('id', 'name', 'slug', 'image', 'parent_category_id', 'path') \
+        .order_by('name')
+
+    for category in categories:
+        nodes[category['id']] = {**category, 'subcategories': []}
+
+    for node in nodes.values():
+        parent = nodes.get(node.pop('parent_category_id'))
+        (parent['subcategories'] if parent else tree).append(node)
+
+    cache.set(CATEGORY_TREE_KEY, tree, timeout=None)
+
+    return tree
+
+
+def invalidate_category_tree() -> None:
+    transaction.on_commit(lambda: cache.delete(CATEGORY_TREE_KEY))
@@ -0,0 +1,163 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch, Count, Q
+
+from ecommerce.models.products import Product, ProductCategory, ProductFacet, ProductItem, ProductVariation
+
+Facet = ProductFacet.Facet
+
+GENDER_VALUES = {gender: value for value, (gender, _) in enumerate(Product.GENDER_CHOICES, start=1)}
+
+
+def get_price_range(price: int) -> (int, str):
+    """
+    Returns lower bound and name of the price bucket the price belongs to.
+    """
+    step = settings.PRODUCTS_PRICE_FACET_STEP
+    start = price // step * step
+
+    return start, f'{start}-{start + step - 1}'
+
+
+def get_categories() -> dict:
+    """
+    Returns every category as {category_id: (name, path)}.
+    """
+    return {
+        pk: (name, path)
+        for pk, name, path in ProductCategory.objects.values_list('id', 'name', 'path')
+    }
+
+
+def get_product_facets(product: Product, categories: dict) -> list[ProductFacet]:
+    """
+    Builds facet rows for a product.
+
+    Product must be fetched with 'get_products_for_indexing' prefetches.
+    """
+    facets = {
+        (Facet.GENDER, GENDER_VALUES[product.gender], product.gender_display()),
+        (Facet.BRAND, product.brand_id, product.brand.name),
+    }
+
+    # Product belongs to its category and every parent category
+    if product.category_id in categories:
+        _, path = categories[product.category_id]
+        for category_id in ProductCategory.get_path_ids(path):
+            facets.add((Facet.CATEGORY, category_id, categories[category_id][0]))
+
+    for option in product.attribute_option.all():
+        facets.add((Facet.ATTRIBUTE_OPTION, option.pk, option.name))
+
+    for product_item in product.product_item.all():
+        facets.add((Facet.COLOR, product_item.color_id, product_item.color.name))
+
+        price = product_item.get_discount_price()
+        facets.add((Facet.PRICE, price, ''))
+        facets.add((Facet.PRICE_RANGE, *get_price_range(price)))
+
+        for product_variation in product_item.product_variation.all():
+            facets.add((Facet.SIZE, product_variation.size_id, product_variation.size.name))
+
+    return [
+        ProductFacet(product=product, facet=facet.value, value=value, name=name)
+        for facet, value, name in facets
+    ]
+
+
+def get_products_for_indexing():
+    return Product.objects.select_related(
+        'brand',
+    ).prefetch_related(
+        'attribute_option',
+        Prefetch(
+            'product_item',
+            queryset=ProductItem.objects.filter(is_active=True).select_related('color')
+        ),
+        Prefetch(
+            'product_item__product_variation',
+            queryset=ProductVariation.objects.filter(qty_in_stock__gt=0, is_active=True).select_related('size')
+        ),
+    ).only(
+        'id', 'gender', 'category_id', 'brand__id', 'brand__name',
+    )
+
+
+def index_product_facets(product_ids) -> None:
+    """
+    Rebuilds facet rows of given products.
+
+    :param product_ids: list of product ids or a queryset with product ids
+    """
+    with transaction.atomic():
+        products = get_products_for_indexing().filter(pk__in=product_ids)
+        categories = get_categories()
+
+        bulk_list = []
+        for product in products:
+            bulk_list.extend(get_product_facets(product, categories))
+
+        ProductFacet.objects.filter(product_id__in=product_ids).delete()
+        ProductFacet.objects.bulk_create(bulk_list)
+
+
+def update_size_facets(product_variation_ids) -> set[int]:
+    """
+    Updates size facet rows of products of given product variations after their stock was changed.
+    A size is a facet of a product while some active variation of the size is in stock.
+    Only rows of the sizes of given variations are changed.
+
+    :return: ids of the products
+    """
+    pairs = set(
+        ProductVariation.objects
+            .filter(pk__in=product_variation_ids)
+            .values_list('product_item__product_id', 'size_id')
+    )
+    if not pairs:
+        return set()
+
+    product_ids = {product_id for product_id, _ in pairs}
+    in_stock = {
+        (product_id, size_id): name
+        for product_id, size_id, name in ProductVariation.objects
+            .filter(product_item__product_id__in=product_ids, size_id__in={size_id for _, size_id in pairs},
+                    product_item__is_active=True, is_active=True, qty_in_stock__gt=0)
+            .values_list('product_item__product_id', 'size_id', 'size__name')
+        if (product_id, size_id) in pairs
+    }
+
+    sold_out = Q()
+    for product_id, size_id in pairs - in_stock.keys():
+        sold_out |= Q(product_id=product_id, value=size_id)
+
+    with transaction.atomic():
+        if sold_out:
+            ProductFacet.objects.filter(sold_out, facet=Facet.SIZE.value).delete()
+        ProductFacet.objects.bulk_create([
+            ProductFacet(product_id=product_id, facet=Facet.SIZE.value, value=size_id, name=name)
+            for (product_id, size_id), name in in_stock.items()
+        ], ignore_conflicts=True)
+
+    return product_ids
+
+
+def get_facet_counts(queryset, facets) -> dict:
+    """
+    Counts products of the queryset for every value of given facets with one grouped query.
+
+    :param queryset: Product queryset
+    :param facets: list of 'ProductFacet.Facet'
+    :return: {Facet: [{'value': int, 'name': str, 'count': int}]}
+    """
+    rows = ProductFacet.objects \
+        .filter(facet__in=[facet.value for facet in facets], product__in=queryset.values('pk')) \
+        .values('facet', 'value', 'name') \
+        .annotate(count=Count('product_id')) \
+        .order_by('facet', 'value')
+
+    counts = {facet: [] for facet in facets}
+    for row in rows:
+        counts[Facet(row['facet'])].append({'value': row['value'], 'name': row['name'], 'count': row['count']})
+
+    return counts
@@ -0,0 +1,56 @@
+from django.db import transaction
+
+from ecommerce.models.products import Product, ProductItem
+from ecommerce.utils.products.cache import invalidate_products
+from ecommerce.utils.products.categories import rebuild_category_paths
+from ecommerce.utils.products.facets import index_product_facets
+from ecommerce.utils.products.prices import get_outdated_prices, update_prices
+from ecommerce.utils.products.search import index_product_search
+
+
+def index_products(product_ids) -> None:
+    """
+    Rebuilds every index derived from the catalog for given products:
+    prices of product items, facets (which use prices)
+    and search vectors (which are built from facets).
+    Cached responses of the products are invalidated.
+
+    :param product_ids: list of product ids or a queryset with product ids
+    """
+    with transaction.atomic():
+        update_prices(ProductItem.objects.filter(product_id__in=product_ids).values('pk'))
+        index_product_facets(product_ids)
+        index_product_search(product_ids)
+        invalidate_products(product_ids)
+
+
+def rebuild_product_indexes(batch_size: int = 500) -> int:
+    """
+    Rebuilds indexes of every product.
+    Category paths are rebuilt first, facets are built from them.
+
+    :return: amount of indexed products
+    """
+    rebuild_category_paths()
+
+    product_ids = list(Product.objects.values_list('id', flat=True))
+
+    for i in range(0, len(product_ids), batch_size):
+        index_products(product_ids[i:i + batch_size])
+
+    return len(product_ids)
+
+
+def refresh_product_prices(batch_size: int = 500) -> int:
+    """
+    Reindexes products which prices are outdated
+    because a discount window has opened or closed.
+
+    :return: amount of reindexed products
+    """
+    product_ids = list(get_outdated_prices().order_by().values_list('product_id', flat=True).distinct())
+
+    for i in range(0, len(product_ids), batch_size):
+        index_products(product_ids[i:i + batch_size])
+
+    return len(product_ids)
@@ -0,0 +1,78 @@
+import datetime
+
+from django.db.models import ExpressionWrapper, F, OuterRef, PositiveIntegerField, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Least, Now
+from django.utils import timezone
+
+from ecommerce.models.products import Discount, ProductItem
+
+ProductItemDiscount = ProductItem.discount.through
+
+
+def get_active_discounts(date: datetime.date = None):
+    """
+    Returns discounts which window includes the date (today by default).
+    """
+    date = date or timezone.localdate()
+
+    return Discount.objects.filter(start_date__lte=date, end_date__gte=date)
+
+
+def get_discount_rate(date: datetime.date = None) -> Least:
+    """
+    Returns an expression with total rate of discounts of the outer product item
+    active on the date. Rate can't exceed 100.
+    """
+    date = date or timezone.localdate()
+
+    rates = ProductItemDiscount.objects \
+        .filter(productitem_id=OuterRef('pk'), discount__start_date__lte=date, discount__end_date__gte=date) \
+        .values('productitem_id') \
+        .annotate(rate=Sum('discount__discount_rate')) \
+        .values('rate')
+
+    return Least(
+        Coalesce(Subquery(rates), Value(0)),
+        Value(100),
+        output_field=PositiveIntegerField()
+    )
+
+
+def get_discount_price(date: datetime.date = None) -> ExpressionWrapper:
+    """
+    Returns an expression with price of the outer product item with discounts active on the date.
+    Price is rounded down with integer division.
+    """
+    return ExpressionWrapper(
+        F('price') * (Value(100) - get_discount_rate(date)) / Value(100),
+        output_field=PositiveIntegerField()
+    )
+
+
+def update_prices(product_item_ids, date: datetime.date = None) -> int:
+    """
+    Recalculates discount rates and prices of given product items with one 'UPDATE'.
+    Only rows which price is outdated are written.
+
+    :param product_item_ids: list of product item ids or a queryset with product item ids
+    :return: amount of updated product items
+    """
+    return get_outdated_prices(date).filter(pk__in=product_item_ids).update(
+        discount_rate=get_discount_rate(date),
+        discount_price=get_discount_price(date),
+        updated_at=Now(),
+    )
+
+
+def get_outdated_prices(date: datetime.date = None):
+    """
+    Returns product items which stored price differs from the price on the date:
+    a discount window has opened or closed, or price was changed without signals.
+    """
+    return ProductItem.objects \
+        .alias(actual_rate=get_discount_rate(date), actual_price=get_discount_price(date)) \
+        .filter(
+            Q(discount_price__isnull=True)
+            | ~Q(discount_rate=F('actual_rate'))
+            | ~Q(discount_price=F('actual_price'))
+        )
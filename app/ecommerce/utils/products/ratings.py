@@ -0,0 +1,75 @@
+from django.db.models import F, Count, Sum, Q
+from django.db.models.functions import Now
+
+from ecommerce.models.products import Product
+from ecommerce.models.reviews import Review
+
+
+def update_product_rating(product_id: int, old_rating: int = None, new_rating: int = None) -> None:
+    """
+    Applies a change of a single review to the rating aggregates of a product.
+
+    Review created: old_rating=None, new_rating=rating.
+    Review updated: old_rating=previous rating, new_rating=rating.
+    Review deleted: old_rating=rating, new_rating=None.
+
+    Everything is done with one 'UPDATE' using F expressions,
+    so concurrent reviews of the same product don't overwrite each other.
+    """
+    if old_rating == new_rating:
+        return None
+
+    updates = {
+        'rating_sum': F('rating_sum') + (new_rating or 0) - (old_rating or 0),
+        'rating_count': F('rating_count') + int(new_rating is not None) - int(old_rating is not None),
+        'updated_at': Now(),
+    }
+
+    if old_rating is not None:
+        field = Product.RATING_HISTOGRAM_FIELDS[old_rating]
+        updates[field] = F(field) - 1
+
+    if new_rating is not None:
+        field = Product.RATING_HISTOGRAM_FIELDS[new_rating]
+        updates[field] = F(field) + 1
+
+    Product.objects.filter(pk=product_id).update(**updates)
+
+
+def rebuild_product_ratings(batch_size: int = 1000) -> int:
+    """
+    Recalculates rating aggregates of every product from 'Review' table.
+
+    :return: amount of updated products
+    """
+    histogram_annotations = {
+        field: Count('id', filter=Q(rating=star))
+        for star, field in Product.RATING_HISTOGRAM_FIELDS.items()
+    }
+
+    aggregates = {
+        row.pop('product_id'): row
+        for row in Review.objects
+            .values('product_id')
+            .annotate(rating_sum=Sum('rating'), rating_count=Count('id'), **histogram_annotations)
+            .order_by()
+    }
+
+    fields = ['rating_sum', 'rating_count', *Product.RATING_HISTOGRAM_FIELDS.values()]
+    empty = dict.fromkeys(fields, 0)
+
+    updated = 0
+    bulk_list = []
+    for product in Product.objects.only('id', *fields).iterator(chunk_size=batch_size):
+        for field, value in aggregates.get(product.pk, empty).items():
+            setattr(product, field, value)
+        bulk_list.append(product)
+
+        if len(bulk_list) >= batch_size:
+            updated += Product.objects.bulk_update(bulk_list, fields)
+            bulk_list = []
+
+    if bulk_list:
+        updated += Product.objects.bulk_update(bulk_list, fields)
+
+    return updated
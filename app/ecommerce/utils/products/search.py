@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank
+from django.db.models import F, FloatField, OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Cast, Coalesce
+
+from ecommerce.models.products import Product, ProductFacet
+
+Facet = ProductFacet.Facet
+
+
+def get_facet_names(*facets: Facet) -> Subquery:
+    """
+    Returns a subquery which joins names of given facets of the outer product.
+    """
+    names = ProductFacet.objects \
+        .filter(product_id=OuterRef('pk'), facet__in=[facet.value for facet in facets]) \
+        .values('product_id') \
+        .annotate(names=StringAgg('name', delimiter=' ')) \
+        .values('names')
+
+    return Coalesce(Subquery(names), Value(''), output_field=TextField())
+
+
+def get_search_vector() -> SearchVector:
+    """
+    Returns weighted search vector of a product:
+        A - name,
+        B - brand, category and its parent categories,
+        C - attribute options,
+        D - description.
+
+    Brand, category and attribute option names are taken from 'ProductFacet',
+    so facets of a product have to be indexed before its search vector.
+    """
+    config = settings.PRODUCTS_SEARCH_CONFIG
+
+    return (
+        SearchVector('name', weight='A', config=config)
+        + SearchVector(get_facet_names(Facet.BRAND, Facet.CATEGORY), weight='B', config=config)
+        + SearchVector(get_facet_names(Facet.ATTRIBUTE_OPTION), weight='C', config=config)
+        + SearchVector('description', weight='D', config=config)
+    )
+
+
+def index_product_search(product_ids) -> None:
+    """
+    Rebuilds search vectors of given products with one 'UPDATE'.
+
+    :param product_ids: list of product ids or a queryset with product ids
+    """
+    Product.objects.filter(pk__in=product_ids).update(search_vector=get_search_vector())
+
+
+def search_products(queryset, text: str):
+    """
+    Filters products matching the text using GIN index on 'Product.search_vector'
+    and annotates them with 'rank'.
+
+    Text supports web search syntax: "quoted phrase", or, -excluded.
+    """
+    query = SearchQuery(text, search_type='websearch', config=settings.PRODUCTS_SEARCH_CONFIG)
+
+    # 'ts_rank' returns 'real', it's cast to 'double precision' so the rank stored
+    # in a pagination cursor is compared with exactly the same value on the next page
+    return queryset \
+        .annotate(rank=Cast(SearchRank(F('search_vector'), query), FloatField())) \
+        .filter(search_vector=query)
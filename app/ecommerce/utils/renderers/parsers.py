@@ -0,0 +1,28 @@
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from ecommerce.utils.renderers.renderers import FastJSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class FastJSONParser(JSONParser):
+    """
+    Parses JSON with 'orjson' when it is installed, otherwise works as 'JSONParser'.
+    'orjson' always rejects 'NaN' and 'Infinity' like strict 'JSONParser' does.
+    """
+
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', 'utf-8')
+        if orjson is None or not self.strict or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,88 @@
+from phonenumber_field.phonenumber import PhoneNumber
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class JSONEncoder(encoders.JSONEncoder):
+    """
+    DRF encoder which also encodes 'PhoneNumber' objects (in E.164 format by default).
+    """
+
+    def default(self, obj):
+        if isinstance(obj, PhoneNumber):
+            return str(obj)
+
+        return super().default(obj)
+
+
+class CompactJSONRenderer(JSONRenderer):
+    """
+    Stdlib JSON renderer which reuses one encoder instead of building
+    a new one for every response. Output is the same as 'JSONRenderer' output.
+    Indented responses (browsable API, 'indent' media type param) are rendered by 'JSONRenderer'.
+    """
+
+    encoder_class = JSONEncoder
+    _encoder = None
+
+    @classmethod
+    def get_encoder(cls) -> JSONEncoder:
+        # Encoder keeps no state between 'encode' calls, so it is shared by all responses
+        if cls._encoder is None:
+            cls._encoder = cls.encoder_class(
+                ensure_ascii=cls.ensure_ascii,
+                allow_nan=not cls.strict,
+                separators=(',', ':') if cls.compact else (', ', ': '),
+            )
+
+        return cls._encoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = self.get_encoder().encode(data)
+
+        # Same as 'JSONRenderer': output is kept a strict javascript subset
+        ret = ret.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+        return ret.encode()
+
+
+class FastJSONRenderer(CompactJSONRenderer):
+    """
+    Renders JSON with 'orjson' when it is installed, otherwise works as 'CompactJSONRenderer'.
+
+    Dates, times and types 'orjson' doesn't know are passed to 'JSONEncoder.default',
+    so output is the same as 'JSONRenderer' output.
+    """
+
+    if orjson is not None:
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if data is None:
+            return b''
+
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.get_encoder().default, option=self.options)
+        except orjson.JSONEncodeError:
+            # E.g. integers wider than 64 bits
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -0,0 +1,151 @@
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min, Sum
+from django.utils import timezone
+
+from ecommerce.models.orders import Order, OrderItem
+from ecommerce.models.products import Brand, Product, ProductCategory
+from ecommerce.models.reports import DailyProductSales, DailySales, RollupWatermark
+
+SALES_ROLLUP = 'sales'
+
+# Orders which are counted as sold in units and revenue
+SALES_STATUSES = (
+    Order.OrderStatus.PAYED.value,
+    Order.OrderStatus.SHIPPED.value,
+    Order.OrderStatus.DONE.value,
+)
+
+
+def get_day_bounds(date: datetime.date) -> tuple[datetime.datetime, datetime.datetime]:
+    """
+    Returns the start and the end of the day in the current time zone.
+    Orders are filtered by a range of 'date_created', so only partitions of the day are read.
+    """
+    start = timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+    return start, start + datetime.timedelta(days=1)
+
+
+def rollup_day(date: datetime.date) -> None:
+    """
+    Replaces rollup rows of the day with aggregates of orders created on the day.
+    """
+    start, end = get_day_bounds(date)
+    order_items = OrderItem.objects.filter(order__date_created__gte=start, order__date_created__lt=end)
+
+    units_sold = dict(
+        order_items
+        .values_list('order__order_status')
+        .annotate(units_sold=Sum('quantity'))
+        .order_by()
+    )
+    daily_sales = [
+        DailySales(date=date, units_sold=units_sold.get(row['order_status'], 0), **row)
+        for row in Order.objects
+        .filter(date_created__gte=start, date_created__lt=end)
+        .values('order_status')
+        .annotate(order_count=Count('id'), revenue=Sum('order_price'))
+        .order_by()
+    ]
+
+    # Category and brand are taken from the product at the time of the rollup
+    product = 'product_variation__product_item__product'
+    daily_product_sales = [
+        DailyProductSales(date=date, **row)
+        for row in order_items
+        .filter(order__order_status__in=SALES_STATUSES)
+        .values(product_id=F(f'{product}_id'), category_id=F(f'{product}__category_id'),
+                brand_id=F(f'{product}__brand_id'))
+        .annotate(units_sold=Sum('quantity'), revenue=Sum('price'))
+        .order_by()
+    ]
+
+    with transaction.atomic():
+        DailySales.objects.filter(date=date).delete()
+        DailySales.objects.bulk_create(daily_sales)
+        DailyProductSales.objects.filter(date=date).delete()
+        DailyProductSales.objects.bulk_create(daily_product_sales)
+        RollupWatermark.objects.update_or_create(name=SALES_ROLLUP, defaults={'date': date})
+
+
+def rollup_sales(lookback_days: int = None) -> list[datetime.date]:
+    """
+    Rolls up complete days (up to yesterday) after the watermark, every day in its own transaction.
+
+    Orders change status after they are created, so the last 'lookback_days' rolled up days
+    ('REPORTS_ROLLUP_LOOKBACK_DAYS' by default) are rolled up again. The first run starts from the first order.
+    Archived orders (see 'utils.orders.partitions') aren't read, their months are rolled up before they are archived.
+
+    :return: rolled up days
+    """
+    if lookback_days is None:
+        lookback_days = settings.REPORTS_ROLLUP_LOOKBACK_DAYS
+
+    watermark = RollupWatermark.objects.filter(name=SALES_ROLLUP).first()
+    if watermark is not None:
+        date = watermark.date + datetime.timedelta(days=1 - lookback_days)
+    else:
+        first_created = Order.objects.aggregate(first_created=Min('date_created'))['first_created']
+        if first_created is None:
+            return []
+        date = timezone.localdate(first_created)
+
+    yesterday = timezone.localdate() - datetime.timedelta(days=1)
+    days = []
+
+    while date <= yesterday:
+        rollup_day(date)
+        days.append(date)
+        date += datetime.timedelta(days=1)
+
+    return days
+
+
+def get_sales_report(date_from: datetime.date, date_to: datetime.date, category_id: int = None,
+                     brand_id: int = None, limit: int = 10) -> dict:
+    """
+    Returns sales of the days from 'date_from' to 'date_to' (inclusive) read from the rollups:
+    totals and orders per status of every day, top products, sales per category and per brand.
+    Products can be filtered by category and brand, names are fetched by ids of the result.
+    """
+    days = {}
+    for row in DailySales.objects.filter(date__range=(date_from, date_to)).order_by('date', 'order_status'):
+        day = days.setdefault(row.date, {
+            'date': row.date, 'order_count': 0, 'units_sold': 0, 'revenue': 0, 'orders_per_status': {},
+        })
+        day['order_count'] += row.order_count
+        day['orders_per_status'][Order.OrderStatus(row.order_status).name] = row.order_count
+        if row.order_status in SALES_STATUSES:
+            day['units_sold'] += row.units_sold
+            day['revenue'] += row.revenue
+
+    product_sales = DailyProductSales.objects.filter(date__range=(date_from, date_to))
+    if category_id is not None:
+        product_sales = product_sales.filter(category_id=category_id)
+    if brand_id is not None:
+        product_sales = product_sales.filter(brand_id=brand_id)
+
+    def get_sales(field: str, model, limit: int = None) -> list[dict]:
+        rows = product_sales \
+            .values(field) \
+            .annotate(total_units_sold=Sum('units_sold'), total_revenue=Sum('revenue')) \
+            .order_by('-total_revenue', field)
+        rows = list(rows[:limit] if limit else rows)
+        names = dict(model.objects.filter(pk__in=[row[field] for row in rows]).values_list('id', 'name'))
+
+        return [{'id': row[field], 'name': names.get(row[field]), 'units_sold': row['total_units_sold'],
+                 'revenue': row['total_revenue']} for row in rows]
+
+    return {
+        'date_from': date_from,
+        'date_to': date_to,
+        'order_count': sum(day['order_count'] for day in days.values()),
+        'units_sold': sum(day['units_sold'] for day in days.values()),
+        'revenue': sum(day['revenue'] for day in days.values()),
+        'days': list(days.values()),
+        'top_products': get_sales('product_id', Product, limit),
+        'categories': get_sales('category_id', ProductCategory),
+        'brands': get_sales('brand_id', Brand),
+    }
@@ -0,0 +1,135 @@
+import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from ecommerce.models.shopping_carts import ShoppingCartItem
+
+STOCK_HOLD_KEY = 'stock:holds:{}'
+STOCK_HOLD_IDS_KEY = 'stock:holds:ids'
+
+
+def get_hold_threshold() -> datetime.datetime:
+    """
+    Returns the time before which changed shopping cart items don't hold stock anymore.
+    """
+    return timezone.now() - datetime.timedelta(seconds=settings.CART_HOLD_TIMEOUT)
+
+
+def get_held_quantity(cart_item: ShoppingCartItem | None) -> int:
+    """
+    Returns quantity held by the shopping cart item, zero if its hold has expired.
+    """
+    if cart_item is None or cart_item.updated_at < get_hold_threshold():
+        return 0
+
+    return cart_item.quantity
+
+
+def get_stock_holds(product_variation_ids) -> dict:
+    """
+    Returns quantities held in shopping carts with one cache round trip.
+
+    :return: {product_variation_id: quantity}
+    """
+    keys = {STOCK_HOLD_KEY.format(product_variation_id): product_variation_id
+            for product_variation_id in product_variation_ids}
+
+    return {keys[key]: max(qty, 0) for key, qty in cache.get_many(keys).items()}
+
+
+def get_available_quantity(product_variation, holds: dict, held_qty: int = 0) -> int:
+    """
+    Returns quantity in stock which is not held in shopping carts.
+
+    :param holds: result of 'get_stock_holds'
+    :param held_qty: quantity already held by the shopping cart which asks for the stock
+    """
+    qty_in_stock = product_variation.qty_in_stock
+
+    return min(max(qty_in_stock - holds.get(product_variation.pk, 0) + held_qty, 0), qty_in_stock)
+
+
+def hold_stock(product_variation_id: int, qty: int) -> None:
+    """
+    Changes quantity of the product variation held in shopping carts by 'qty'
+    (negative 'qty' releases the hold) once the current transaction is committed.
+
+    Counter is changed atomically with 'INCRBY' and expires 'CART_HOLD_TIMEOUT'
+    seconds after the last change. Holds of expired cart items are removed
+    from counters by 'reconcile_stock_holds'.
+    """
+    if not qty:
+        return None
+
+    key = STOCK_HOLD_KEY.format(product_variation_id)
+
+    def change_hold():
+        cache.add(key, 0, timeout=settings.CART_HOLD_TIMEOUT)
+        try:
+            cache.incr(key, qty)
+        except ValueError:
+            # Counter has expired between 'add' and 'incr'
+            cache.add(key, max(qty, 0), timeout=settings.CART_HOLD_TIMEOUT)
+        cache.touch(key, timeout=settings.CART_HOLD_TIMEOUT)
+
+    transaction.on_commit(change_hold)
+
+
+def release_stock_holds(cart_items) -> None:
+    """
+    Releases stock held by shopping cart items, e.g. before they are deleted.
+    """
+    lines = {}
+    for item in cart_items:
+        lines[item.product_variation_id] = lines.get(item.product_variation_id, 0) + get_held_quantity(item)
+
+    for product_variation_id, qty in lines.items():
+        hold_stock(product_variation_id, -qty)
+
+
+def reconcile_stock_holds() -> int:
+    """
+    Recalculates hold counters from shopping cart items changed in the last
+    'CART_HOLD_TIMEOUT' seconds. Only product variations held now or at the previous
+    reconciliation are checked, counters of expired holds are released to zero.
+
+    Counters are corrected by the difference with 'INCRBY', so holds changed
+    while the items are summed aren't overwritten. Counters are read before
+    the items, a hold is added to its counter after its transaction is committed.
+
+    :return: amount of product variations with active holds
+    """
+    items = ShoppingCartItem.objects.filter(updated_at__gte=get_hold_threshold())
+
+    held_ids = set(cache.get(STOCK_HOLD_IDS_KEY, []))
+    held_ids.update(items.values_list('product_variation_id', flat=True).distinct())
+    keys = {product_variation_id: STOCK_HOLD_KEY.format(product_variation_id) for product_variation_id in held_ids}
+    counters = cache.get_many(keys.values())
+
+    holds = dict(
+        items
+            .values('product_variation_id')
+            .annotate(qty=Sum('quantity'))
+            .values_list('product_variation_id', 'qty')
+    )
+
+    for product_variation_id, key in keys.items():
+        qty = holds.get(product_variation_id, 0)
+
+        if key not in counters:
+            # Counter has expired or was evicted
+            cache.add(key, qty, timeout=settings.CART_HOLD_TIMEOUT)
+        elif qty != counters[key]:
+            try:
+                cache.incr(key, qty - counters[key])
+            except ValueError:
+                # Counter has expired after it was read
+                cache.add(key, qty, timeout=settings.CART_HOLD_TIMEOUT)
+
+    cache.set(STOCK_HOLD_IDS_KEY, list(holds), timeout=None)
+
+    return len(holds)
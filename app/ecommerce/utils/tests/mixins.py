@@ -1,8 +1,10 @@
-from datetime import datetime
+from datetime import timedelta
 from urllib.parse import urlparse
 
+from django.core.cache import cache
 from django.core.management import call_command
 from django.db.models import QuerySet
+from django.utils import timezone
 
 from rest_framework.test import APITestCase
 
@@ -74,8 +76,8 @@ class TestAPIEcommerce(APITestCase):
 
     def create_discount(self, name='discount', discount_rate=10) -> Discount:
 
-        start_date = datetime(2024, 1, 1)
-        end_date = datetime(2024, 12, 31)
+        start_date = timezone.localdate() - timedelta(days=1)
+        end_date = timezone.localdate() + timedelta(days=30)
 
         discount = Discount.objects.create(
             name=name,
@@ -96,6 +98,9 @@ class TestAPIEcommerce(APITestCase):
         call_command('create_sizes_command', silence=True)
         call_command('create_products_command', silence=True)
 
+        # Cached product responses belong to products of previous tests
+        cache.clear()
+
         product_qs = Product.objects.all()
 
         return product_qs
@@ -160,6 +165,7 @@ class TestAPIOrder(TestAPIEcommerce):
         discount_2 = self.create_discount(name='discount 2', discount_rate=20)
 
         self.product_variation_1.product_item.discount.set([discount_1, discount_2])
+        self.product_variation_1.product_item.refresh_from_db()
         product_variation_1_discount_price = self.product_variation_1.product_item.get_discount_price()
 
         self.product_data_1 = {
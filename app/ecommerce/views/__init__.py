@@ -1,5 +1,6 @@
 from .users import *
 from .addresses import *
 from .products import *
+from .categories import *
 from .orders import *
 from .payments import *
@@ -0,0 +1,16 @@
+from rest_framework import viewsets
+from rest_framework.response import Response
+
+from ecommerce.models import ProductCategory
+from ecommerce.serializers.categories import ProductCategorySerializer
+from ecommerce.utils.products.categories import get_category_tree
+
+
+class ProductCategoryViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = ProductCategory.objects.all()
+    serializer_class = ProductCategorySerializer
+    lookup_field = 'slug'
+
+    def list(self, request, *args, **kwargs):
+        # Whole tree is small and changes rarely, it is cached until a category is changed
+        return Response(get_category_tree())
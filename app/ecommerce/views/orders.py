@@ -1,61 +1,212 @@
+import datetime
+
+import stripe
+
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
 from django.db.models import Prefetch
+from django.http import Http404
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 
 from rest_framework import status
+from rest_framework.decorators import action
 from rest_framework.generics import CreateAPIView, get_object_or_404
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework.views import APIView
 from rest_framework.viewsets import ReadOnlyModelViewSet
 
-from ecommerce.models import UserProfile, Payment, Review, Product, ProductItem, ProductVariation, Image, Discount
-from ecommerce.models.orders import Order, OrderItem
+from ecommerce.filters.orders import ArchivedOrderFilter, OrderExportFilter, OrderFilter
+from ecommerce.models import UserProfile, Payment
+from ecommerce.models.orders import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
 from ecommerce.models.shopping_carts import ShoppingCartItem
 from ecommerce.serializers.orders import OrderGuestCreateSerializer, OrderUserCreateSerializer, OrderListSerializer, \
     OrderDetailSerializer
+from ecommerce.tasks.orders import place_order_task
+from ecommerce.utils.idempotency.idempotency import idempotent
+from ecommerce.utils.orders.export import EXPORT_FORMATS, get_export_response
+from ecommerce.utils.orders.intake import TicketStatus, create_ticket, get_ticket, get_ticket_representation
+from ecommerce.utils.orders.partitions import get_archive_boundary, is_archived
+from ecommerce.utils.orders.placement import CartChangedError
+from ecommerce.utils.orders.snapshots import SNAPSHOT_FIELDS, with_snapshot_relations
+from ecommerce.utils.orders.stock import OutOfStockError, release_order_stock
+from ecommerce.utils.pagination.pagination import OrderPagination
+from ecommerce.utils.payments.sessions import delete_checkout_session
 
 
 class OrderViewSet(ReadOnlyModelViewSet):
+    """
+    Orders of old months can be moved to the archive tier (see 'utils.orders.partitions').
+    Order history is read from the archive when it's filtered by a date before the archive boundary
+    or requested with '?archive=true'. The last page of live order history links to the archive
+    if the requested dates reach before the boundary ('next'), an order which isn't found in live tables
+    is looked up in the archive.
+    """
     permission_classes = (IsAuthenticated, )
+    pagination_class = OrderPagination
+
+    @property
+    def filterset_class(self):
+        return ArchivedOrderFilter if self.is_archive_request() else OrderFilter
 
     def get_queryset(self):
+        if self.is_archive_request():
+            # Payments are attached to the page (see 'paginate_queryset')
+            return ArchivedOrder.objects \
+                .only('id', 'order_price', 'order_status', 'date_created') \
+                .filter(**self.get_user_filter())
+
+        # Pages are read with 'order_*_date_created_idx' index, payment is joined
         queryset = Order.objects \
-            .prefetch_related('payment') \
-            .filter(user=self.request.user)
+            .select_related('payment') \
+            .only('id', 'order_price', 'order_status', 'date_created',
+                  'payment__id', 'payment__order_id', 'payment__payment_bool') \
+            .filter(**self.get_user_filter())
 
         return queryset
 
-    def get_object(self):
-        user_filter = {'user': self.request.user} \
+    def is_archive_request(self) -> bool:
+        """
+        Returns True if order history is requested only for dates in the archive tier
+        or the archive is requested explicitly (see 'get_archive_link').
+        """
+        if self.action != 'list':
+            return False
+
+        if self.request.query_params.get('archive') == 'true':
+            return get_archive_boundary() is not None
+
+        try:
+            date_created_before = parse_date(self.request.query_params.get('date_created_before', ''))
+        except ValueError:
+            return False
+
+        return date_created_before is not None and is_archived(date_created_before)
+
+    def get_archive_link(self) -> str | None:
+        """
+        Returns link to the same order history read from the archive
+        if the requested dates reach before the archive boundary.
+        """
+        boundary = get_archive_boundary()
+        if boundary is None or self.is_archive_request():
+            return None
+
+        try:
+            date_created_after = parse_date(self.request.query_params.get('date_created_after', ''))
+        except ValueError:
+            return None
+
+        if date_created_after is not None and \
+                timezone.make_aware(datetime.datetime.combine(date_created_after, datetime.time.min)) >= boundary:
+            return None
+
+        url = remove_query_param(self.request.build_absolute_uri(), self.paginator.cursor_query_param)
+        return replace_query_param(url, 'archive', 'true')
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+
+        # Archived orders are older than live ones, so they follow the last live page
+        if response.data['next'] is None:
+            response.data['next'] = self.get_archive_link()
+
+        return response
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+
+        if page is not None and queryset.model is ArchivedOrder:
+            self.attach_payments(page)
+
+        return page
+
+    @staticmethod
+    def attach_payments(orders) -> None:
+        """
+        Sets 'payment' of archived orders, payments aren't archived.
+        """
+        payments = Payment.objects \
+            .only('id', 'order_id', 'payment_bool') \
+            .in_bulk([order.pk for order in orders], field_name='order_id')
+
+        for order in orders:
+            order.payment = payments.get(order.pk)
+
+    def get_user_filter(self) -> dict:
+        return {'user': self.request.user} \
             if not self.request.user.is_guest \
             else {'guest': self.request.user}
 
-        payment_queryset = Payment.objects.only('id', 'order_id', 'payment_bool')
-        review_queryset = Review.objects.only('id', 'order_item_id', )
-        product_variation_queryset = ProductVariation.objects \
-            .select_related('size') \
-            .only('id', 'product_item_id', 'size_id', 'size__name')
-        product_item_queryset = ProductItem.objects.only('id', 'product_id', 'product_code', 'price')
-        image_queryset = Image.objects.filter(is_main=True)
-        product_queryset = Product.objects.only('id', 'slug', 'name', 'gender')
+    def get_object(self):
+        user_filter = self.get_user_filter()
+
+        # Order items contain snapshots of products, so the order is read with two queries
+        order_item_queryset = OrderItem.objects \
+            .select_related('review') \
+            .only('id', 'order_id', 'product_variation_id', 'quantity', 'price', 'review__id',
+                  *SNAPSHOT_FIELDS)
 
         obj = Order.objects \
-            .prefetch_related(
-                Prefetch('payment', queryset=payment_queryset),
-                Prefetch('order_item__review', queryset=review_queryset),
-                Prefetch('order_item__product_variation', queryset=product_variation_queryset),
-                Prefetch('order_item__product_variation__product_item', queryset=product_item_queryset),
-                Prefetch('order_item__product_variation__product_item__image', queryset=image_queryset),
-                Prefetch('order_item__product_variation__product_item__product', queryset=product_queryset)
-            ) \
+            .select_related('payment') \
+            .prefetch_related(Prefetch('order_item', queryset=order_item_queryset)) \
+            .defer('guest')
+
+        try:
+            return get_object_or_404(obj, pk=self.kwargs['pk'], **user_filter)
+        except Http404:
+            if get_archive_boundary() is None:
+                raise
+
+        return self.get_archived_object()
+
+    def get_archived_object(self) -> ArchivedOrder:
+        order_item_queryset = ArchivedOrderItem.objects \
+            .only('id', 'order_id', 'product_variation_id', 'quantity', 'price', *SNAPSHOT_FIELDS)
+
+        obj = ArchivedOrder.objects \
+            .prefetch_related(Prefetch('order_item', queryset=order_item_queryset)) \
             .defer('guest')
 
-        return get_object_or_404(obj, pk=self.kwargs['pk'], **user_filter)
+        order = get_object_or_404(obj, pk=self.kwargs['pk'], **self.get_user_filter())
+        self.attach_payments([order])
+
+        return order
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context['action'] = self.action  # Pass the current action to the context
         return context
 
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, *args, **kwargs):
+        """
+        Cancels a new (unpaid) order and returns its items to stock.
+        """
+        payment = get_object_or_404(
+            Payment.objects.only('id', 'order_id', 'stripe_session_id'),
+            order_id=self.kwargs['pk'],
+            **{f'order__{key}': value for key, value in self.get_user_filter().items()}
+        )
+
+        if not release_order_stock(payment.order_id, Order.OrderStatus.CANCELLED):
+            return Response('Only new orders can be cancelled', status=status.HTTP_400_BAD_REQUEST)
+
+        # Open checkout session must not accept a payment for the cancelled order
+        if payment.stripe_session_id:
+            try:
+                stripe.checkout.Session.expire(payment.stripe_session_id)
+            except stripe.error.InvalidRequestError:
+                pass  # session is already expired or completed
+
+            delete_checkout_session(payment.stripe_session_id)
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return OrderDetailSerializer
@@ -66,67 +217,59 @@ class OrderCreateAPIView(CreateAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        discount_queryset = Discount.objects.only('id', 'discount_rate')
-
         queryset = ShoppingCartItem.objects \
-            .select_related(
-                'cart__user',
-                'product_variation__product_item'
-            ) \
-            .prefetch_related(
-                Prefetch('product_variation__product_item__discount', discount_queryset),
-            ) \
             .filter(cart__user=self.request.user)
 
-        return queryset
+        # Products are copied to order items (see 'place_order')
+        return with_snapshot_relations(queryset)
 
-    def prepare_order_items(self) -> list[OrderItem]:
-        cart_items = self.get_queryset()
+    def set_user_in_context(self, serializer):
+        serializer.context['user'] = self.request.user
 
-        bulk_list = []
+    def transform_guest_to_user(self, email, validated_data):
+        pass
 
-        for cart_item in cart_items:
-            order_item_price = (cart_item.product_variation.product_item.get_discount_price() * cart_item.quantity)
-            bulk_list.append(
-                OrderItem(
-                    product_variation=cart_item.product_variation,
-                    quantity=cart_item.quantity,
-                    price=order_item_price,
-                )
-            )
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        if settings.ORDERS_ASYNC_INTAKE:
+            return self.enqueue_order()
 
-        return bulk_list
+        return self.create_order()
 
-    def create_order_items(self, order_id: int, bulk_list: list[OrderItem]):
-        for item in bulk_list:
-            item.order_id = order_id
+    def enqueue_order(self) -> Response:
+        """
+        Validates the request without touching the shopping cart and stock,
+        puts it in 'orders' Celery queue and responds with a ticket.
+        The order is placed by 'create_order' in the worker (see 'place_ticket_order').
+        """
+        serializer = self.get_serializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
 
-        OrderItem.objects.bulk_create(bulk_list)
+        if not self.get_queryset().exists():
+            return Response("Can't create the order because the shopping cart is empty", status=status.HTTP_400_BAD_REQUEST)
 
-    def empty_shopping_cart(self):
-        queryset = self.get_queryset()
-        queryset.delete()
+        ticket_id = create_ticket(self, self.request)
+        place_order_task.delay(ticket_id)
 
-    def set_user_in_context(self, serializer):
-        serializer.context['user'] = self.request.user
+        status_url = reverse('order_ticket', kwargs={'ticket_id': ticket_id}, request=self.request)
+        return Response({'id': ticket_id, 'status': TicketStatus.QUEUED.value, 'status_url': status_url},
+                        status=status.HTTP_202_ACCEPTED, headers={'Location': status_url})
 
-    def transform_guest_to_user(self, email, validated_data):
-        pass
-
-    def create(self, request, *args, **kwargs):
+    def create_order(self) -> Response:
         """
-        Test
+        Places the order from the shopping cart.
+        Uses only 'user' and 'data' of the request, so it can be called by the worker.
         """
 
-        serializer = self.get_serializer(data=request.data)
+        serializer = self.get_serializer(data=self.request.data)
 
-        order_items = self.prepare_order_items()
+        # Shopping cart is fetched once, order is placed from these items (see 'place_order')
+        cart_items = list(self.get_queryset())
 
-        if not order_items:
+        if not cart_items:
             return Response("Can't create the order because the shopping cart is empty", status=status.HTTP_400_BAD_REQUEST)
 
-        order_price = sum(map(lambda x: x.price, order_items))
-        serializer.context['order_price'] = order_price
+        serializer.context['cart_items'] = cart_items
 
         self.set_user_in_context(serializer)
 
@@ -136,13 +279,15 @@ class OrderCreateAPIView(CreateAPIView):
         if 'email' in serializer.validated_data:
             email = serializer.validated_data.pop('email', None)
 
-        self.perform_create(serializer)
-        headers = self.get_success_headers(serializer.data)
-
-        order_id = serializer.data['id']
-        self.create_order_items(order_id, order_items)
+        try:
+            with transaction.atomic():
+                self.perform_create(serializer)
+        except OutOfStockError as e:
+            return Response({'detail': str(e), 'lines': e.lines}, status=status.HTTP_409_CONFLICT)
+        except CartChangedError as e:
+            return Response(str(e), status=status.HTTP_409_CONFLICT)
 
-        self.empty_shopping_cart()
+        headers = self.get_success_headers(serializer.data)
 
         # If email exists that means that the guest created and order.
         # If user (not guest) creates order email will be automatically pulled from his UserProfile
@@ -153,6 +298,41 @@ class OrderCreateAPIView(CreateAPIView):
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
 
+class OrderTicketAPIView(APIView):
+    """
+    Reports status of an order accepted in async intake mode.
+    Once the order is placed 'response' contains the order.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, ticket_id, *args, **kwargs):
+        ticket = get_ticket(ticket_id)
+        if ticket is None or ticket['user_id'] != request.user.pk:
+            raise Http404
+
+        return Response(get_ticket_representation(ticket))
+
+
+class OrderExportAPIView(APIView):
+    """
+    Streams order items with their orders and shipping addresses for fulfillment and finance,
+    as CSV or NDJSON ('?file_format=ndjson'). Filters are described in 'OrderExportFilter'.
+    """
+    permission_classes = (IsAdminUser, )
+
+    def get(self, request, *args, **kwargs):
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in EXPORT_FORMATS:
+            return Response({'file_format': f'Must be one of: {", ".join(EXPORT_FORMATS)}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        filterset = OrderExportFilter(request.query_params, queryset=OrderItem.objects.all())
+        if not filterset.is_valid():
+            return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        return get_export_response(filterset.qs, file_format)
+
+
 class OrderUserCreateAPIView(OrderCreateAPIView):
     serializer_class = OrderUserCreateSerializer
 
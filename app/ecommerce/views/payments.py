@@ -1,19 +1,27 @@
 import stripe
+from asgiref.sync import sync_to_async
 
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework_simplejwt.authentication import JWTAuthentication
 
 from django.conf import settings
 from django.core.exceptions import BadRequest
+from django.http import JsonResponse
 
 from ecommerce.models import Order, OrderItem
 from ecommerce.models.payments import Payment
-from ecommerce.tasks.send_email import send_order_details_email
+from ecommerce.utils.idempotency.idempotency import idempotent
+from ecommerce.utils.payments.notifications import wait_for_payment
+from ecommerce.utils.payments.sessions import cache_checkout_session, get_checkout_session
+from ecommerce.utils.payments.webhooks import record_webhook_event
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
+stripe.api_base = settings.STRIPE_API_BASE
 
 
 class CreateCheckoutSessionAPIView(APIView):
@@ -61,6 +69,8 @@ class CreateCheckoutSessionAPIView(APIView):
 
         checkout_session = stripe.checkout.Session.create(
             payment_method_types=['card'],
+            # Webhook events of the session are processed in order per order (see 'get_ordering_key')
+            client_reference_id=str(order_id),
             line_items=line_items,
             mode='payment',
             success_url=success_link,
@@ -69,17 +79,31 @@ class CreateCheckoutSessionAPIView(APIView):
 
         return checkout_session
 
+    @idempotent
     def post(self, request, order_id, *args, **kwargs):
-        payment = get_object_or_404(Payment, order=order_id)
+        payment = get_object_or_404(Payment.objects.select_related('order'), order=order_id)
         if payment.payment_bool:
             return Response('Order is paid', status=status.HTTP_400_BAD_REQUEST)
 
+        # Items of cancelled and expired orders are returned to stock
+        if payment.order.order_status != Order.OrderStatus.NEW.value:
+            return Response('Order is cancelled or expired', status=status.HTTP_400_BAD_REQUEST)
+
         if payment.stripe_session_id:
             return Response('Checkout session already exists', status=status.HTTP_400_BAD_REQUEST)
 
         checkout_session = self.create_checkout_session(order_id)
-        payment.stripe_session_id = checkout_session.id
-        payment.save()
+
+        # Session is saved only if no other request has saved its session meanwhile
+        saved = Payment.objects \
+            .filter(pk=payment.pk, stripe_session_id='') \
+            .update(stripe_session_id=checkout_session.id)
+        if not saved:
+            stripe.checkout.Session.expire(checkout_session.id)
+            return Response('Checkout session already exists', status=status.HTTP_400_BAD_REQUEST)
+
+        cache_checkout_session(checkout_session.id, checkout_session.url, checkout_session.status,
+                               checkout_session.expires_at)
 
         return Response({'checkout_session_id': checkout_session.id,
                          'checkout_session_url': checkout_session.url},
@@ -93,39 +117,27 @@ class CreateCheckoutSessionAPIView(APIView):
         if not payment.stripe_session_id:
             return Response('Checkout session does not exists', status=status.HTTP_400_BAD_REQUEST)
 
-        checkout_session = stripe.checkout.Session.retrieve(payment.stripe_session_id)
-        if checkout_session.status == 'expired':
+        # Polling is served from the cache, Stripe is called only if the session isn't cached or is stale
+        checkout_session = get_checkout_session(payment.stripe_session_id)
+        if checkout_session['status'] == 'expired':
             return Response('Checkout session is expired', status=status.HTTP_400_BAD_REQUEST)
 
-        return Response({'checkout_session_id': checkout_session.id,
-                         'checkout_session_url': checkout_session.url},
+        return Response({'checkout_session_id': checkout_session['id'],
+                         'checkout_session_url': checkout_session['url']},
                         status=status.HTTP_200_OK)
 
 
 class StripeWebhookView(APIView):
-
-    def get_queryset(self, order_id):
-        queryset = OrderItem.objects \
-            .select_related(
-                'product_variation__product_item__product',
-                'order__shipping_address'
-            ) \
-            .filter(order_id=order_id) \
-            .only(
-                'id', 'order_id', 'product_variation_id', 'quantity', 'price',
-                'order__date_created', 'order__order_price', 'order__user_id', 'order__shipping_address',
-                'product_variation__product_item_id', 'product_variation__product_item__product_id',
-                'product_variation__product_item__price', 'product_variation__product_item__product__name',
-            )
-
-        return queryset
+    """
+    Verifies the signature and stores the event, Stripe gets a response without waiting for its processing.
+    Events are processed asynchronously by 'process_webhook_events'.
+    """
 
     def post(self, request, *args, **kwargs):
         payload = request.body
         sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
-        event = None
         try:
-            event = stripe.Webhook.construct_event(
+            stripe.Webhook.construct_event(
                 payload, sig_header, settings.STRIPE_WEBHOOK_SECRET
             )
         except ValueError as e:
@@ -135,81 +147,49 @@ class StripeWebhookView(APIView):
             # Invalid signature
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
-        # Handle the event
-        if event['type'] == 'checkout.session.completed':
-            session = event['data']['object']
-            self.handle_completed_session(session)
-        if event['type'] == 'checkout.session.expired':
-            session = event['data']['object']
-            self.handle_expired_session(session)
-            return Response('Checkout session is expired. Create a new one', status=status.HTTP_400_BAD_REQUEST)
-        # if event['type'] == 'payment_intent.succeeded':
-        #     session = event['data']['object']
-        #     self.handle_payment_intent(session)
+        record_webhook_event(payload)
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-    def handle_completed_session(self, session):
-
-        payment = get_object_or_404(
-            Payment.objects.select_related('order') \
-                .only('id', 'order_id', 'payment_bool', 'stripe_session_id', 'order__order_status'),
-            stripe_session_id=session.id
-        )
-
-        payment.payment_bool = True
-        payment.order.order_status = 2 # PAYED
-        payment.save()
-        payment.order.save()
-
-        context = self.get_order_email_context(payment.order.id)
-        user_email = context.pop('email', None)
-
-        send_order_details_email.delay(user_email, context)  # Celery task
-
-    def handle_expired_session(self, session):
-        payment = get_object_or_404(Payment, stripe_session_id=session.id)
-
-        payment.stripe_session_id = ''
-        payment.save()
-
-    def get_order_email_context(self, order_id) -> (str, list):
-        """
-
-        :return: email, context
-        """
-        queryset = self.get_queryset(order_id)
-
-        if not queryset:
-            return None
-
-        order_obj = queryset[0].order
-        order = {
-            'id': order_obj.pk,
-            'date_created': order_obj.date_created.date(),
-            'price': order_obj.order_price / 100,
-        }
-        shipping_address_obj = order_obj.shipping_address
-
-        shipping_address = {
-            'first_name': shipping_address_obj.first_name,
-            'last_name': shipping_address_obj.last_name,
-            'region': shipping_address_obj.region,
-            'street': shipping_address_obj.street,
-            'unit_number': shipping_address_obj.unit_number,
-            'city': shipping_address_obj.city,
-            'country': shipping_address_obj.country,
-            'phone_number': str(shipping_address_obj.phone_number),
-        }
-
-        order_items = [[x.product_variation.product_item.product.name, x.quantity, x.price / 100] for x in queryset]
-        email = order_obj.user.email
-
-        context = dict(
-            order=order,
-            order_items=order_items,
-            shipping_address=shipping_address,
-            email=email,
-        )
 
-        return context
+async def payment_status_view(request, order_id):
+    """
+    Long-polls the payment of the order: answers as soon as the order is paid
+    or after 'PAYMENTS_LONG_POLL_TIMEOUT' seconds (shorter with '?timeout='), the client repeats the request
+    if the order isn't paid. Waiting requests hold no thread only under an ASGI server ('app.asgi').
+
+    It's a plain async view, DRF views are sync, so the JWT is authenticated explicitly.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'},
+                            status=status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    try:
+        authenticated = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except AuthenticationFailed as e:
+        return JsonResponse({'detail': str(e.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+    if authenticated is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'},
+                            status=status.HTTP_401_UNAUTHORIZED)
+
+    user = authenticated[0]
+    user_filter = {'order__user': user} if not user.is_guest else {'order__guest': user}
+
+    payment = await Payment.objects \
+        .select_related('order') \
+        .only('id', 'payment_bool', 'order__order_status') \
+        .filter(**user_filter, order_id=order_id) \
+        .afirst()
+    if payment is None:
+        return JsonResponse({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+    timeout = settings.PAYMENTS_LONG_POLL_TIMEOUT
+    if request.GET.get('timeout', '').isdigit():
+        timeout = min(int(request.GET['timeout']), timeout)
+
+    paid = payment.payment_bool
+    # Cancelled and expired orders can't be paid
+    if not paid and payment.order.order_status == Order.OrderStatus.NEW.value:
+        paid = await wait_for_payment(order_id, timeout)
+
+    return JsonResponse({'order_id': order_id, 'paid': paid})
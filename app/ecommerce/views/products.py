@@ -1,19 +1,37 @@
-from django.db.models import Prefetch, Avg
+from django.core.cache import cache
+from django.db.models import Prefetch
+from django.http import Http404
 
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
 
-from ecommerce.models import Product, ProductVariation, Review, Image, OrderItem, UserProfile, ProductItem
+from ecommerce.models import Product, ProductVariation, Image, UserProfile, ProductItem
+from ecommerce.filters.products import ProductFilter
 from ecommerce.serializers.products import ProductSerializer, ProductDetailSerializer
+from ecommerce.serializers.products_flat import ProductFlatSerializer
+from ecommerce.utils.pagination.pagination import ProductPagination, ProductSearchPagination
+from ecommerce.utils.products.cache import is_cacheable, get_catalog_version, get_product_version, \
+    get_list_digest, get_list_cache_key, get_cached_product, get_cached_response, get_not_modified_response, \
+    get_held_stock, set_held_validators, cache_list_response, cache_product_response
+from ecommerce.utils.products.prices import get_active_discounts
+from ecommerce.utils.products.search import search_products
+from ecommerce.utils.shopping_carts.holds import get_stock_holds
 
 
 class ProductViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = ProductSerializer
+    # Builds the same output as 'serializer_class' for list and search without DRF fields
+    flat_serializer_class = ProductFlatSerializer
+    pagination_class = ProductPagination
+    filterset_class = ProductFilter
     lookup_field = 'slug'
+    # Cached responses are serialized without stock holds, holds are applied when they are returned
+    apply_stock_holds = True
 
     def get_queryset(self):
-        order_item_queryset = OrderItem.objects.only('id', 'product_variation_id')
-        review_queryset = Review.objects.only('id', 'order_item_id', 'rating')
         image_queryset = Image.objects.filter(is_main=True)
 
         queryset = Product.objects.select_related(
@@ -29,24 +47,19 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
                 'product_item__image',
                 queryset=image_queryset
             ),
-            'product_item__discount',
+            Prefetch(
+                'product_item__discount',
+                queryset=get_active_discounts()
+            ),
             Prefetch(
                 'product_item__product_variation',
                 queryset=ProductVariation.objects.filter(qty_in_stock__gt=0, is_active=True)
             ),
             'product_item__product_variation__size',
-            Prefetch(
-                'product_item__product_variation__order_item',
-                queryset=order_item_queryset
-            ),
-            Prefetch(
-                'product_item__product_variation__order_item__review',
-                queryset=review_queryset
-            ),
             'attribute_option',
             'attribute_option__attribute_type',
-        ).annotate(
-            product_rating=Avg('product_item__product_variation__order_item__review__rating')
+        ).defer(
+            'search_vector'
         ).filter(
             is_active=True
         )
@@ -66,7 +79,10 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
             ),
             'product_item__color',
             'product_item__image',
-            'product_item__discount',
+            Prefetch(
+                'product_item__discount',
+                queryset=get_active_discounts()
+            ),
             Prefetch(
                 'product_item__product_variation',
                 queryset=ProductVariation.objects.filter(qty_in_stock__gt=0, is_active=True)
@@ -79,6 +95,8 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
                 'review__user',
                 queryset=UserProfile.objects.only('id', 'first_name', 'last_name')
             ),
+        ).defer(
+            'search_vector'
         )
 
         return get_object_or_404(obj, is_active=True, **filter_kwargs)
@@ -87,5 +105,108 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
         serializer_class = self.serializer_class
         if self.action == 'retrieve':
             serializer_class = ProductDetailSerializer
+        elif self.action in ('list', 'search') and self.flat_serializer_class is not None:
+            # Schema generation needs a DRF serializer with fields
+            if not getattr(self, 'swagger_fake_view', False):
+                serializer_class = self.flat_serializer_class
 
         return serializer_class
+
+    def get_serializer(self, *args, **kwargs):
+        # Quantity held in shopping carts is fetched for every serialized variation with one cache round trip
+        if args and args[0] is not None and self.apply_stock_holds:
+            products = args[0] if kwargs.get('many') else [args[0]]
+            product_variation_ids = [
+                variation.pk
+                for product in products
+                for product_item in product.product_item.all()
+                for variation in product_item.product_variation.all()
+            ]
+            kwargs['context'] = {**self.get_serializer_context(), 'stock_holds': get_stock_holds(product_variation_ids)}
+
+        return super().get_serializer(*args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        # Rendered pages are cached and validated with the catalog version (see 'utils.products.cache')
+        if not is_cacheable(request):
+            return self.get_list_response(request, *args, **kwargs)
+
+        version, digest = get_catalog_version(), get_list_digest(request)
+
+        # Validators depend on stock holds of the page, so the cached page is read before they are checked
+        key = get_list_cache_key(version, digest)
+        entry = cache.get(key)
+        if entry is not None:
+            return get_cached_response(request, entry, version, digest, many=True)
+
+        self.apply_stock_holds = False
+        response = self.get_list_response(request, *args, **kwargs)
+        entry = cache_list_response(response, key)
+        set_held_validators(response, entry['stock'], version, digest, many=True)
+
+        return response
+
+    def get_list_response(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        response.data['facets'] = self.get_facet_counts()
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        # Rendered product is cached and validated with the product version (see 'utils.products.cache')
+        if not is_cacheable(request):
+            return super().retrieve(request, *args, **kwargs)
+
+        slug = self.kwargs[self.lookup_field]
+
+        entry = get_cached_product(slug)
+        if entry is not None:
+            return get_cached_response(request, entry, entry['version'])
+
+        # Version and variations are checked before the product is fetched with its prefetches
+        rows = Product.objects \
+            .filter(slug=slug, is_active=True) \
+            .values_list('id', 'product_item__product_variation__id')
+        if not rows:
+            raise Http404
+
+        product_id = rows[0][0]
+        version = get_product_version(product_id)
+
+        # Held responses have other validators, they are checked once the product is serialized
+        if not get_held_stock([pk for _, pk in rows if pk is not None]):
+            not_modified = get_not_modified_response(request, version)
+            if not_modified is not None:
+                return not_modified
+
+        self.apply_stock_holds = False
+        instance = self.get_object()
+        response = Response(self.get_serializer(instance).data)
+        entry = cache_product_response(response, instance.pk, version, slug)
+        set_held_validators(response, entry['stock'], version)
+
+        return response
+
+    def get_facet_counts(self) -> dict:
+        filterset = self.filterset_class(
+            self.request.query_params,
+            queryset=Product.objects.filter(is_active=True),
+            request=self.request,
+        )
+
+        return filterset.get_facet_counts()
+
+    @action(detail=False, methods=['get'], pagination_class=ProductSearchPagination)
+    def search(self, request, *args, **kwargs):
+        """
+        Full-text search over the catalog, e.g. '?q=running sneakers'.
+        Results are ranked by relevance and accept the same filters as the list.
+        """
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            raise ValidationError({'q': 'Search query is required.'})
+
+        queryset = search_products(self.filter_queryset(self.get_queryset()), text)
+
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
@@ -0,0 +1,27 @@
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from ecommerce.serializers.reports import SalesReportQuerySerializer
+from ecommerce.utils.reports.rollups import get_sales_report
+
+
+class SalesReportAPIView(APIView):
+    """
+    Sales per day, top products, sales per category and per brand for staff.
+    Only rollup tables are read (see 'rollup_sales'), sales of today aren't rolled up yet.
+    """
+    permission_classes = (IsAdminUser, )
+
+    def get(self, request, *args, **kwargs):
+        serializer = SalesReportQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        return Response(get_sales_report(
+            date_from=params['date_after'],
+            date_to=params['date_before'],
+            category_id=params.get('category'),
+            brand_id=params.get('brand'),
+            limit=params['limit'],
+        ))
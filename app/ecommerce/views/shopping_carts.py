@@ -3,7 +3,7 @@ from rest_framework.permissions import IsAuthenticated
 
 from ecommerce.models.shopping_carts import ShoppingCartItem, ShoppingCart
 from ecommerce.serializers.shopping_carts import ShoppingCartItemSerializer
-
+from ecommerce.utils.shopping_carts.holds import release_stock_holds
 
 
 class ShoppingCartItemViewSet(viewsets.ModelViewSet):
@@ -18,8 +18,8 @@ class ShoppingCartItemViewSet(viewsets.ModelViewSet):
                             'product_variation__size',
                             'product_variation__product_item__product',
                             ) \
-            .prefetch_related('product_variation__product_item__discount',) \
-            .filter(cart__user=self.request.user)
+            .filter(cart__user=self.request.user) \
+            .order_by('id')
 
         return queryset
 
@@ -33,3 +33,7 @@ class ShoppingCartItemViewSet(viewsets.ModelViewSet):
                 .get(user=self.request.user)
 
         return context
+
+    def perform_destroy(self, instance):
+        release_stock_holds([instance])
+        instance.delete()
@@ -4,7 +4,7 @@ const API_URL = 'http://localhost:8000/api/v1/products/';
 
 export const fetchProducts = async () => {
     const { data } = await axios.get(API_URL);
-    return data;
+    return data.results;
 };
 
 export default { fetchProducts };